@@ -19,6 +19,17 @@ from .user_routes import init_user_routes
 from .admin_routes import init_admin_routes
 from .decorators import login_required, admin_required
 from .database import conectar_db, crear_tablas, inicializar_datos_default, aplicar_migraciones
+from .eliminacion_usuarios import iniciar_trabajador_eliminaciones
+from .particiones import iniciar_mantenimiento_particiones
+from .cache import configurar_cache
+from .metricas import instrumentar
+from .auditoria import activar_auditoria
+from .contrasenas import HashSaturado, configurar_contrasenas
+from .intentos import configurar_intentos
+from .limites import configurar_limites
+from .sesiones import configurar_sesiones, iniciar_limpieza_sesiones
+from .permisos import configurar_permisos
+from .subidas import iniciar_limpieza_subidas
 from psycopg2.extras import RealDictCursor
 
 
@@ -38,6 +49,13 @@ def create_app():
     # configurar clave secreta desde variables de entorno
     app.secret_key = os.getenv("SECRET_KEY")
 
+    # sesiones en el servidor: postgres | memoria | redis://... (ver sesiones.py)
+    app.config["SESIONES_URL"] = os.getenv("SESIONES_URL", "postgres")
+    app.config["SESIONES_CACHE_TTL"] = float(os.getenv("SESIONES_CACHE_TTL", 5))
+    app.config["SESIONES_LIMPIEZA_INTERVALO"] = float(os.getenv("SESIONES_LIMPIEZA_INTERVALO", 600))
+    app.config["PERMANENT_SESSION_LIFETIME"] = int(os.getenv("SESION_DURACION", 7 * 24 * 60 * 60))
+    configurar_sesiones(app, conectar_db)
+
     # configurar carpeta de subidas
     app.config["UPLOAD_FOLDER"] = os.path.join(
         os.path.dirname(__file__), os.getenv("UPLOAD_FOLDER", "uploads")
@@ -51,9 +69,88 @@ def create_app():
     # limitar el tamano maximo de archivos a 16 mb
     app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
 
+    # adjuntos de mensajes por contenido, fuera de /uploads (ver adjuntos.py)
+    app.config["ADJUNTOS_FOLDER"] = os.path.join(
+        os.path.dirname(__file__), os.getenv("ADJUNTOS_FOLDER", "adjuntos")
+    )
+    app.config["ADJUNTOS_MAX_ARCHIVOS"] = int(os.getenv("ADJUNTOS_MAX_ARCHIVOS", 5))
+    app.config["ADJUNTOS_MAX_BYTES"] = int(os.getenv("ADJUNTOS_MAX_BYTES", 10 * 1024 * 1024))
+    app.config["ADJUNTOS_MAX_TOTAL"] = int(os.getenv("ADJUNTOS_MAX_TOTAL", 16 * 1024 * 1024))
+    # flask | x-accel (nginx con location interna en ADJUNTOS_ACCEL_PREFIJO)
+    app.config["ADJUNTOS_ENVIO"] = os.getenv("ADJUNTOS_ENVIO", "flask")
+    app.config["ADJUNTOS_ACCEL_PREFIJO"] = os.getenv("ADJUNTOS_ACCEL_PREFIJO", "/_adjuntos/")
+    app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") == "1"
+
+    # subidas por partes que se pueden retomar (ver subidas.py)
+    app.config["SUBIDAS_FOLDER"] = os.path.join(
+        os.path.dirname(__file__), os.getenv("SUBIDAS_FOLDER", "subidas")
+    )
+    app.config["SUBIDAS_MAX_BYTES"] = int(os.getenv("SUBIDAS_MAX_BYTES", 64 * 1024 * 1024))
+    app.config["SUBIDAS_MAX_ABIERTAS"] = int(os.getenv("SUBIDAS_MAX_ABIERTAS", 10))
+    app.config["SUBIDAS_VENCE_HORAS"] = int(os.getenv("SUBIDAS_VENCE_HORAS", 24))
+
+    # limpieza en segundo plano de usuarios eliminados
+    app.config["LIMPIEZA_TAMANO_LOTE"] = int(os.getenv("LIMPIEZA_TAMANO_LOTE", 500))
+    app.config["LIMPIEZA_INTERVALO"] = float(os.getenv("LIMPIEZA_INTERVALO", 5))
+
+    # particiones mensuales y archivo de reportes cerrados (ver particiones.py)
+    app.config["MANTENIMIENTO_INTERVALO"] = float(os.getenv("MANTENIMIENTO_INTERVALO", 6 * 60 * 60))
+    # 0 (por defecto) no archiva: las lecturas no consultan Reportes_archivados
+    app.config["ARCHIVO_MESES"] = int(os.getenv("ARCHIVO_MESES", 0))
+    # meses de notificaciones a conservar; 0 (por defecto) no borra ninguna
+    app.config["NOTIFICACIONES_RETENCION_MESES"] = int(os.getenv("NOTIFICACIONES_RETENCION_MESES", 0))
+
+    # caché de listados públicos: en memoria o compartida (CACHE_URL=redis://...)
+    app.config["CACHE_URL"] = os.getenv("CACHE_URL", "memoria")
+    app.config["CACHE_TTL"] = int(os.getenv("CACHE_TTL", 30))
+    configurar_cache(app, conectar_db)
+
+    # rol vigente para los decoradores; se invalida por versión al cambiar roles (ver permisos.py)
+    app.config["ROLES_TTL"] = int(os.getenv("ROLES_TTL", 30))
+    configurar_permisos(app)
+
+    # tiempos por petición, registro de consultas lentas y /metrics
+    app.config["CONSULTA_LENTA_MS"] = float(os.getenv("CONSULTA_LENTA_MS", 200))
+    app.config["SOLICITUD_LENTA_MS"] = float(os.getenv("SOLICITUD_LENTA_MS", 1000))
+    # sin token, /metrics solo responde desde la misma máquina
+    app.config["METRICAS_TOKEN"] = os.getenv("METRICAS_TOKEN")
+    instrumentar(app)
+
+    # auditoría de consultas para desarrollo y CI: registrar | estricto (ver auditoria.py)
+    app.config["AUDITAR_CONSULTAS"] = os.getenv("AUDITAR_CONSULTAS", "")
+    activar_auditoria(app)
+
+    # hash de contraseñas: scrypt | argon2id | pbkdf2 (ver contrasenas.py)
+    app.config["PASSWORD_HASH"] = os.getenv("PASSWORD_HASH", "scrypt")
+    app.config["HASH_SCRYPT_N"] = int(os.getenv("HASH_SCRYPT_N", 2**15))
+    app.config["HASH_ARGON2_TIEMPO"] = int(os.getenv("HASH_ARGON2_TIEMPO", 2))
+    app.config["HASH_ARGON2_MEMORIA"] = int(os.getenv("HASH_ARGON2_MEMORIA", 19 * 1024))
+    app.config["HASH_HILOS"] = int(os.getenv("HASH_HILOS", 0)) or None
+    configurar_contrasenas(app)
+
+    @app.errorhandler(HashSaturado)
+    def hash_saturado(e):
+        return {"ok": False, "mensaje": "Servidor ocupado, intenta de nuevo"}, 503
+
+    # límites de intentos por IP y por cuenta (ver limites.py); formato capacidad/por_minuto
+    app.config["LIMITES_ACTIVOS"] = os.getenv("LIMITES_ACTIVOS", "1") == "1"
+    app.config["LIMITES_URL"] = os.getenv("LIMITES_URL")
+    for nombre in ("LOGIN_IP", "LOGIN_CUENTA", "REGISTRO_IP", "RECUPERAR_IP"):
+        app.config[f"LIMITE_{nombre}"] = os.getenv(f"LIMITE_{nombre}")
+    configurar_limites(app)
+
+    # fallos de login/recuperación: memoria, redis://... o "postgres" (tabla UNLOGGED);
+    # sin INTENTOS_URL, el Redis de CACHE_URL o "postgres"
+    app.config["INTENTOS_URL"] = os.getenv("INTENTOS_URL")
+    for tipo in ("LOGIN", "RECUPERACION"):
+        app.config[f"INTENTOS_{tipo}"] = os.getenv(f"INTENTOS_{tipo}")
+    configurar_intentos(app, conectar_db)
+
     # asegurar que las carpetas existan
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
     os.makedirs(app.config["STATIC_IMG_FOLDER"], exist_ok=True)
+    os.makedirs(app.config["ADJUNTOS_FOLDER"], exist_ok=True)
+    os.makedirs(app.config["SUBIDAS_FOLDER"], exist_ok=True)
 
     # registrar todas las rutas del sistema
     init_user_routes(app)
@@ -90,5 +187,17 @@ def create_app():
         aplicar_migraciones()
         inicializar_datos_default()
 
+    # retomar eliminaciones pendientes (también las que quedaron a medias)
+    iniciar_trabajador_eliminaciones(app)
+
+    # crear particiones de los próximos meses y archivar reportes viejos
+    iniciar_mantenimiento_particiones(app, conectar_db)
+
+    # borrar por lotes las sesiones vencidas
+    iniciar_limpieza_sesiones(app)
+
+    # borrar subidas por partes vencidas y archivos .part huérfanos
+    iniciar_limpieza_subidas(app, conectar_db)
+
     # devolver la aplicacion configurada
     return app
\ No newline at end of file
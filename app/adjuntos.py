@@ -0,0 +1,266 @@
+"""
+Adjuntos de mensajes.
+
+Antes cada archivo se guardaba con f.save() dentro de la transacción del
+mensaje, sin límites propios, y /mensaje/adjunto/<id> lo entregaba a
+cualquier usuario con sesión. Ahora el envío tiene tres pasos:
+
+- recibir(): antes de abrir la transacción copia cada archivo por bloques
+  a ADJUNTOS_FOLDER/tmp calculando su SHA-256 y su tamaño sobre la marcha,
+  y corta en cuanto se pasa un límite (archivos por mensaje, bytes por
+  archivo, bytes por mensaje) o el contenido no coincide con su tipo.
+- registrar(): dentro de la transacción anota el contenido en
+  Archivos_adjuntos (uno por hash) y la fila en Adjuntos_mensajes. Los
+  disparadores de database.REFERENCIAS_ADJUNTOS llevan el conteo de
+  referencias.
+- colocar(): después del commit mueve el temporal a su ruta definitiva
+  ADJUNTOS_FOLDER/ab/abcdef...; si el contenido ya estaba, lo descarta.
+
+Cuando un contenido se queda sin referencias el disparador lo anota en
+Eliminaciones_archivos como /adjuntos/<hash>, y el trabajador de
+eliminacion_usuarios.py lo borra solo si sigue en cero (ver
+borrar_sin_referencias). Si mientras tanto otro mensaje subió el mismo
+archivo, el conteo ya no es cero y el archivo se queda.
+
+La descarga (enviar()) comprueba que quien pide sea remitente o
+destinatario y deja el envío al servidor web si ADJUNTOS_ENVIO lo indica
+("x-accel" para nginx; USE_X_SENDFILE de Flask para X-Sendfile). Si no,
+Flask responde con rangos y ETag. Como la ruta depende del contenido, la
+respuesta se puede cachear sin vencimiento (en privado).
+"""
+
+import hashlib
+import os
+import uuid
+from typing import NamedTuple
+
+from flask import current_app, send_file, send_from_directory
+from psycopg2.extras import execute_values
+from werkzeug.utils import secure_filename
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+TAMANO_BLOQUE = 64 * 1024
+MAX_ARCHIVOS_DEFECTO = 5
+MAX_BYTES_DEFECTO = 10 * 1024 * 1024  # por archivo
+MAX_TOTAL_DEFECTO = 16 * 1024 * 1024  # por mensaje
+PREFIJO_RUTA = "/adjuntos/"
+UN_ANIO = 365 * 24 * 60 * 60
+
+# extensión -> (tipo MIME, primeros bytes válidos o None si es texto)
+TIPOS = {
+    "png": ("image/png", (b"\x89PNG\r\n\x1a\n",)),
+    "jpg": ("image/jpeg", (b"\xff\xd8\xff",)),
+    "jpeg": ("image/jpeg", (b"\xff\xd8\xff",)),
+    "gif": ("image/gif", (b"GIF87a", b"GIF89a")),
+    "webp": ("image/webp", (b"RIFF",)),
+    "pdf": ("application/pdf", (b"%PDF-",)),
+    "txt": ("text/plain", None),
+}
+
+
+class AdjuntoRechazado(Exception):
+    """Un adjunto no cumple los límites; lleva el código HTTP a responder."""
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.estado = estado
+
+
+class AdjuntoRecibido(NamedTuple):
+    hash: str
+    tamano: int
+    tipo: str
+    nombre: str
+    temporal: str
+
+
+def ruta_archivo(carpeta, hash_contenido):
+    """Ruta definitiva de un contenido: carpeta/ab/abcdef..."""
+    return os.path.join(carpeta, hash_contenido[:2], hash_contenido)
+
+
+def detectar_tipo(nombre, cabecera):
+    """Tipo MIME según la extensión, si los primeros bytes coinciden; si no, AdjuntoRechazado."""
+    extension = nombre.rsplit(".", 1)[-1].lower() if "." in nombre else ""
+    if extension not in TIPOS:
+        raise AdjuntoRechazado(f"Tipo de archivo no permitido: {nombre}", 415)
+    tipo, firmas = TIPOS[extension]
+    if firmas is None:
+        if b"\x00" in cabecera:
+            raise AdjuntoRechazado(f"{nombre} no es un archivo de texto", 415)
+    elif not cabecera.startswith(firmas):
+        raise AdjuntoRechazado(f"El contenido de {nombre} no corresponde a su tipo", 415)
+    return tipo
+
+
+def _limites():
+    c = current_app.config
+    return (
+        c.get("ADJUNTOS_MAX_ARCHIVOS", MAX_ARCHIVOS_DEFECTO),
+        c.get("ADJUNTOS_MAX_BYTES", MAX_BYTES_DEFECTO),
+        c.get("ADJUNTOS_MAX_TOTAL", MAX_TOTAL_DEFECTO),
+    )
+
+
+def recibir(archivos, carpeta):
+    """
+    Copia los archivos a temporales con su hash, validando límites y tipo.
+
+    Args:
+        archivos (list): FileStorage de request.files
+        carpeta (str): ADJUNTOS_FOLDER
+
+    Returns:
+        list[AdjuntoRecibido]
+
+    Raises:
+        AdjuntoRechazado: Sin dejar temporales
+    """
+    max_archivos, max_bytes, max_total = _limites()
+    archivos = [f for f in archivos if f and f.filename]
+    if len(archivos) > max_archivos:
+        raise AdjuntoRechazado(f"Máximo {max_archivos} adjuntos por mensaje", 413)
+
+    temporales = os.path.join(carpeta, "tmp")
+    os.makedirs(temporales, exist_ok=True)
+    recibidos = []
+    total = 0
+    try:
+        for f in archivos:
+            nombre = secure_filename(f.filename) or "adjunto"
+            temporal = os.path.join(temporales, uuid.uuid4().hex)
+            digesto = hashlib.sha256()
+            tamano = 0
+            tipo = None
+            with open(temporal, "wb") as destino:
+                recibidos.append(AdjuntoRecibido(None, 0, None, nombre, temporal))
+                while True:
+                    bloque = f.stream.read(TAMANO_BLOQUE)
+                    if not bloque:
+                        break
+                    if tipo is None:
+                        tipo = detectar_tipo(nombre, bloque)
+                    tamano += len(bloque)
+                    total += len(bloque)
+                    if tamano > max_bytes:
+                        raise AdjuntoRechazado(f"{nombre} supera {max_bytes // (1024 * 1024)} MB", 413)
+                    if total > max_total:
+                        raise AdjuntoRechazado(
+                            f"Los adjuntos superan {max_total // (1024 * 1024)} MB por mensaje", 413
+                        )
+                    digesto.update(bloque)
+                    destino.write(bloque)
+            if tipo is None:
+                raise AdjuntoRechazado(f"{nombre} está vacío")
+            recibidos[-1] = AdjuntoRecibido(digesto.hexdigest(), tamano, tipo, nombre, temporal)
+    except BaseException:
+        descartar(recibidos)
+        raise
+    return recibidos
+
+
+def registrar(cursor, id_mensaje, recibidos):
+    """Anota los contenidos y los adjuntos del mensaje (dos sentencias)."""
+    if not recibidos:
+        return
+    contenidos = {r.hash: (r.hash, r.tamano, r.tipo) for r in recibidos}
+    execute_values(
+        cursor,
+        'INSERT INTO public."Archivos_adjuntos" ("HASH", "TAMANO", "TIPO") VALUES %s ON CONFLICT ("HASH") DO NOTHING',
+        list(contenidos.values()),
+    )
+    execute_values(
+        cursor,
+        'INSERT INTO public."Adjuntos_mensajes" ("ID_MENSAJE", "RUTA", "NOMBRE_ORIGINAL", "TIPO", "HASH", "TAMANO") VALUES %s',
+        [(id_mensaje, PREFIJO_RUTA + r.hash, r.nombre, r.tipo, r.hash, r.tamano) for r in recibidos],
+    )
+
+
+def colocar(carpeta, recibidos):
+    """Después del commit: mueve cada temporal a su ruta o lo descarta si ya existía."""
+    for r in recibidos:
+        destino = ruta_archivo(carpeta, r.hash)
+        if os.path.exists(destino):
+            os.remove(r.temporal)
+            continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # os.replace es atómico: dos subidas del mismo contenido dejan el mismo archivo
+        os.replace(r.temporal, destino)
+
+
+def descartar(recibidos):
+    """Borra los temporales (envío rechazado o transacción fallida)."""
+    for r in recibidos:
+        try:
+            os.remove(r.temporal)
+        except FileNotFoundError:
+            pass
+
+
+def borrar_sin_referencias(cursor, carpeta, rutas):
+    """
+    Borra del disco los contenidos anotados como /adjuntos/<hash> que
+    siguen sin referencias. El DELETE bloquea la fila, así que una subida
+    concurrente del mismo contenido espera y luego vuelve a crearla.
+    """
+    hashes = [ruta[len(PREFIJO_RUTA):] for ruta in rutas if ruta.startswith(PREFIJO_RUTA)]
+    if not hashes:
+        return
+    cursor.execute(
+        """
+        DELETE FROM public."Archivos_adjuntos"
+        WHERE "HASH" = ANY(%s) AND "REFERENCIAS" <= 0
+        RETURNING "HASH"
+        """,
+        (hashes,),
+    )
+    for (hash_contenido,) in cursor.fetchall():
+        try:
+            os.remove(ruta_archivo(carpeta, hash_contenido))
+        except FileNotFoundError:
+            pass
+
+
+def enviar(fila):
+    """
+    Respuesta de descarga para una fila (RUTA, HASH, NOMBRE_ORIGINAL, TIPO)
+    ya autorizada.
+    """
+    ruta, hash_contenido, nombre, tipo = fila
+    config = current_app.config
+
+    if not hash_contenido:
+        # adjuntos anteriores, guardados en la carpeta de subidas
+        return send_from_directory(
+            config["UPLOAD_FOLDER"], os.path.basename(ruta), as_attachment=True, download_name=nombre
+        )
+
+    carpeta = config["ADJUNTOS_FOLDER"]
+    if config.get("ADJUNTOS_ENVIO") == "x-accel":
+        respuesta = current_app.response_class(mimetype=tipo)
+        respuesta.headers["X-Accel-Redirect"] = (
+            config.get("ADJUNTOS_ACCEL_PREFIJO", "/_adjuntos/") + f"{hash_contenido[:2]}/{hash_contenido}"
+        )
+        respuesta.headers["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        respuesta.set_etag(hash_contenido)
+    else:
+        # con USE_X_SENDFILE send_file delega en el servidor web; si no, atiende Range y If-None-Match
+        respuesta = send_file(
+            ruta_archivo(carpeta, hash_contenido),
+            mimetype=tipo,
+            as_attachment=True,
+            download_name=nombre,
+            conditional=True,
+            etag=hash_contenido,
+            max_age=UN_ANIO,
+        )
+    respuesta.cache_control.public = False
+    respuesta.cache_control.private = True
+    respuesta.cache_control.max_age = UN_ANIO
+    respuesta.cache_control.immutable = True
+    respuesta.vary.add("Cookie")
+    return respuesta
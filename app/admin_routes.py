@@ -11,7 +11,7 @@ import uuid
 import random
 import re
 from io import BytesIO
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from flask import (
     render_template,
@@ -32,8 +32,18 @@ from psycopg2.extras import RealDictCursor
 # COMPONENTES INTERNOS
 # ===========================
 
-from .database import conectar_db
+from .database import conectar_db, ROLES_DEFAULT
 from .decorators import login_required, admin_required
+from .paginacion import codificar_cursor, decodificar_cursor, leer_limite, contar_estimado
+from .eliminacion_usuarios import solicitar_eliminacion
+from .sesiones import revocar_sesiones
+from .permisos import invalidar_roles
+from .coincidencias import ESTADOS_COINCIDENCIA, listar_coincidencias_admin
+from .huellas_imagen import listar_pares_duplicados, calcular_huellas_pendientes
+from .cache import cache_consultas, invalidar_reportes
+from .feed import quitar_reportes
+from .consulta_reportes import ConsultaReportes, COLUMNAS_ADMIN, ORDENES, TIPOS
+from .serializacion import respuesta_json
 
 # Si tienes funciones auxiliares
 # from .utils import allowed_file, guardar_imagen
@@ -57,37 +67,84 @@ def init_admin_routes(app):
     #------------------------------
     # CONSULTAR USUARIOS
     # -----------------------------
+
+    GENEROS_USUARIO = ("masculino", "femenino", "otro")
+
+    def _escapar_like(texto):
+        """Escapa los comodines de LIKE para buscar el texto literal."""
+        return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
     @app.route("/api/usuarios", methods=["GET"])
     @admin_required
     def obtener_usuarios():
+        """Devuelve una página del directorio de usuarios
+
+        Parámetros GET opcionales:
+        - q: texto a buscar en usuario, nombre, género o rol
+        - limite: tamaño de página (máximo 100)
+        - cursor: valor "siguiente" devuelto por la página anterior
+
+        Con menos de 3 caracteres se busca por prefijo (índices text_pattern_ops),
+        desde 3 caracteres se busca por contenido (índices de trigramas).
+        """
         try:
             q = request.args.get("q", "").strip()
+            limite = leer_limite(request.args.get("limite"))
+            cursor_param = request.args.get("cursor", "").strip()
+
+            llave = decodificar_cursor(cursor_param)
+            if cursor_param and (not llave or len(llave) != 1):
+                return jsonify({"mensaje": "Cursor no válido"}), 400
+
             conexion = conectar_db()
             if conexion is None:
                 return jsonify({"mensaje": "Error de conexión a la base de datos"}), 500
 
             cursor = conexion.cursor(cursor_factory=RealDictCursor)
-            filtro = ""
+            # los usuarios eliminados desaparecen del directorio aunque su limpieza siga en curso
+            condiciones = ['u."ELIMINADO_EN" IS NULL']
             params = []
 
             if q:
-                filtro = """
-                WHERE u."ID_USUARIO" ILIKE %s
-                OR u."NOMBRE" ILIKE %s
-                OR u."GENERO" ILIKE %s
-                OR r."NOMBRE" ILIKE %s
-                """
-                params = [f"%{q}%", f"%{q}%", f"%{q}%", f"%{q}%"]
+                texto = q.lower()
+                if len(texto) < 3:
+                    # los trigramas no sirven con menos de 3 letras: buscar por prefijo
+                    patron = _escapar_like(texto) + "%"
+                    coincidencia = 'lower(u."ID_USUARIO") LIKE %s OR lower(u."NOMBRE") LIKE %s'
+                else:
+                    patron = "%" + _escapar_like(texto) + "%"
+                    coincidencia = 'u."ID_USUARIO" ILIKE %s OR u."NOMBRE" ILIKE %s'
+                params.extend([patron, patron])
+
+                # género y rol tienen pocos valores: se resuelven aquí y se filtran por igualdad
+                generos = [g for g in GENEROS_USUARIO if texto in g]
+                roles = [id_rol for id_rol, nombre in ROLES_DEFAULT if texto in nombre.lower()]
+                if generos:
+                    coincidencia += ' OR u."GENERO" = ANY(%s)'
+                    params.append(generos)
+                if roles:
+                    coincidencia += ' OR u."ID_ROL" = ANY(%s)'
+                    params.append(roles)
+
+                condiciones.append(f"({coincidencia})")
+
+            if llave:
+                condiciones.append('u."ID_USUARIO" < %s')
+                params.append(llave[0])
+
+            # pedir una fila extra para saber si existe otra página
+            params.append(limite + 1)
 
             cursor.execute(
             f"""
-                SELECT u."ID_USUARIO", u."NOMBRE", u."GENERO", u."ID_ROL", r."NOMBRE" as "ROL_NOMBRE", p."FOTO_PERFIL"
+                SELECT u."ID_USUARIO", u."NOMBRE", u."GENERO", r."NOMBRE" as "ROL_NOMBRE", p."FOTO_PERFIL"
                 FROM public."Usuarios" u
                 LEFT JOIN public."Roles" r ON u."ID_ROL" = r."ID_ROL"
                 LEFT JOIN public."Perfiles" p ON u."ID_USUARIO" = p."ID_USUARIO"
-                {filtro}
-                ORDER BY u."ID_USUARIO" DESC;   
-            """,  
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY u."ID_USUARIO" DESC
+                LIMIT %s
+            """,
             params,
             )
             usuarios = cursor.fetchall()
@@ -95,7 +152,12 @@ def init_admin_routes(app):
             cursor.close()
             conexion.close()
 
-            return jsonify(usuarios), 200
+            siguiente = None
+            if len(usuarios) > limite:
+                usuarios = usuarios[:limite]
+                siguiente = codificar_cursor([usuarios[-1]["ID_USUARIO"]])
+
+            return jsonify({"ok": True, "datos": usuarios, "siguiente": siguiente}), 200
 
         except Exception as e:
             return (
@@ -126,35 +188,16 @@ def init_admin_routes(app):
             db = conectar_db()
             cursor = db.cursor(cursor_factory=RealDictCursor)
 
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_encontrados" WHERE "STATUS" = %s', ('pendiente',))
-            encontrados = cursor.fetchone()["total"]
-
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_perdidos" WHERE "STATUS" = %s', ('pendiente',))
-            perdidos = cursor.fetchone()["total"]
-
-            reportes_pendientes = encontrados + perdidos
-
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_encontrados" WHERE "STATUS" = %s', ('encontrado',))
-            encontrados_recuperados = cursor.fetchone()["total"]
-
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_perdidos" WHERE "STATUS" = %s', ('encontrado',))
-            perdidos_recuperados = cursor.fetchone()["total"]
+            cursor.execute('SELECT "STATUS", COUNT(*) AS total FROM "Reportes" GROUP BY "STATUS"')
+            por_estado = {fila["STATUS"]: fila["total"] for fila in cursor.fetchall()}
 
-            reportes_encontrados = encontrados_recuperados + perdidos_recuperados
-
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_encontrados" WHERE "STATUS" = %s', ('falso',))
-            encontrados_falsos = cursor.fetchone()["total"]
-
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_perdidos" WHERE "STATUS" = %s', ('falso',))
-            perdidos_falsos = cursor.fetchone()["total"]
-
-            reportes_falsos = encontrados_falsos + perdidos_falsos
-
-            reportes_pendientes = encontrados + perdidos
+            reportes_pendientes = por_estado.get("pendiente", 0)
+            reportes_encontrados = por_estado.get("encontrado", 0)
+            reportes_falsos = por_estado.get("falso", 0)
 
             reportes_totales = reportes_pendientes + reportes_encontrados + reportes_falsos
 
-            cursor.execute('SELECT COUNT(*) as usuarios FROM "Usuarios"')
+            cursor.execute('SELECT COUNT(*) as usuarios FROM "Usuarios" WHERE "ELIMINADO_EN" IS NULL')
             usuarios = cursor.fetchone()["usuarios"]
 
             cursor.close()
@@ -197,29 +240,18 @@ def init_admin_routes(app):
             db = conectar_db()
             cursor = db.cursor(cursor_factory=RealDictCursor)
 
-            # Reportes encontrados
+            # Reportes encontrados y perdidos
             cursor.execute("""
-                SELECT DATE("FECHA") AS fecha, COUNT(*) AS total
-                FROM "Reportes_encontrados"
+                SELECT "TIPO" AS tipo, DATE("FECHA") AS fecha, COUNT(*) AS total
+                FROM "Reportes"
                 WHERE "FECHA" >= CURRENT_DATE - INTERVAL '6 days'
-                GROUP BY DATE("FECHA")
+                GROUP BY "TIPO", DATE("FECHA")
             """)
-            encontrados = {
-                fila["fecha"]: fila["total"]
-                for fila in cursor.fetchall()
-            }
-
-            # Reportes perdidos 
-            cursor.execute("""
-                SELECT DATE("FECHA") AS fecha, COUNT(*) AS total
-                FROM "Reportes_perdidos"
-                WHERE "FECHA" >= CURRENT_DATE - INTERVAL '6 days'
-                GROUP BY DATE("FECHA")
-            """)
-            perdidos = {
-                fila["fecha"]: fila["total"]
-                for fila in cursor.fetchall()
-            }
+            encontrados = {}
+            perdidos = {}
+            for fila in cursor.fetchall():
+                destino = encontrados if fila["tipo"] == "encontrado" else perdidos
+                destino[fila["fecha"]] = fila["total"]
 
             # Usuarios
             cursor.execute("""
@@ -295,6 +327,9 @@ def init_admin_routes(app):
             conexion.commit()
             cursor.close()
             conexion.close()
+            # el rol va en la sesión: se cierra para que entre con el nuevo
+            revocar_sesiones(id_usuario)
+            invalidar_roles()
             
             return jsonify({
                 "ok": True, 
@@ -334,6 +369,9 @@ def init_admin_routes(app):
             conexion.commit()
             cursor.close()
             conexion.close()
+            # el rol va en la sesión: se cierra para que entre con el nuevo
+            revocar_sesiones(id_usuario)
+            invalidar_roles()
             
             return jsonify({
                 "ok": True, 
@@ -403,8 +441,11 @@ def init_admin_routes(app):
 
                 cursor.execute('DELETE FROM "Reportes_encontrados" WHERE "ID_REPORTE_ENC" = %s', (id_reporte,))
 
-            db.commit()
             afectadas = cursor.rowcount if hasattr(cursor, 'rowcount') else None
+            quitar_reportes(cursor, tipo, [id_reporte])
+
+            db.commit()
+            invalidar_reportes()
             cursor.close()
             db.close()
 
@@ -427,59 +468,76 @@ def init_admin_routes(app):
     @login_required
     @admin_required
     def api_admin_reportes():
-
+        """Devuelve una página de reportes filtrada y ordenada en el servidor
+
+        Parámetros GET opcionales:
+        - categoria, status, tipo ('perdido' o 'encontrado'), q (nombre o color)
+        - fecha_inicio / fecha_fin: rango de fechas (YYYY-MM-DD)
+        - orden: fecha_desc (defecto), fecha_asc, nombre_asc, nombre_desc
+        - limite: tamaño de página (máximo 100)
+        - cursor: valor "siguiente" devuelto por la página anterior
+        """
         try:
-            id_usuario = session["id_usuario"]
-            categoria = request.args.get("categoria", "").strip() or None
-            fecha_inicio = request.args.get("fecha_inicio", "").strip() or None
-            fecha_fin = request.args.get("fecha_fin", "").strip() or None
-            
+            filtros = {
+                "categoria": request.args.get("categoria", "").strip() or None,
+                "status": request.args.get("status", "").strip() or None,
+                "tipo": request.args.get("tipo", "").strip() or None,
+                "q": request.args.get("q", "").strip() or None,
+                "fecha_inicio": request.args.get("fecha_inicio", "").strip() or None,
+                "fecha_fin": request.args.get("fecha_fin", "").strip() or None,
+            }
+            orden = request.args.get("orden", "fecha_desc").strip()
+            limite = leer_limite(request.args.get("limite"))
+            cursor_param = request.args.get("cursor", "").strip()
+
+            if orden not in ORDENES:
+                return jsonify({"ok": False, "error": "Orden no válido"}), 400
+            if filtros["tipo"] not in (None, "perdido", "encontrado"):
+                return jsonify({"ok": False, "error": "Tipo no válido"}), 400
+            if filtros["status"] not in (None, "pendiente", "encontrado", "falso"):
+                return jsonify({"ok": False, "error": "Estado no válido"}), 400
+
+            llave = decodificar_cursor(cursor_param)
+            if cursor_param and (not llave or len(llave) != 3):
+                return jsonify({"ok": False, "error": "Cursor no válido"}), 400
+
             db = conectar_db()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor()
 
-            params_p = [id_usuario]
-            
-            if categoria:
-                params_p.append(categoria)
-            
-            if fecha_inicio:
-                params_p.append(fecha_inicio)
-            
-            if fecha_fin:
-                params_p.append(fecha_fin)
-            
-            params_e = [id_usuario]
-            
-            if categoria:
-                params_e.append(categoria)
-            
-            if fecha_inicio:
-                params_e.append(fecha_inicio)
-            
-            if fecha_fin:
-                params_e.append(fecha_fin)
-            
+            # pedir una fila extra para saber si existe otra página
+            consulta = (
+                ConsultaReportes(COLUMNAS_ADMIN)
+                .categoria(filtros["categoria"])
+                .status(filtros["status"])
+                .solo_tipo(filtros["tipo"])
+                .texto(filtros["q"])
+                .rango_fechas(filtros["fecha_inicio"], filtros["fecha_fin"])
+                .ordenar(orden, llave)
+                .limitar(limite + 1)
+            )
+            reportes = consulta.dicts(cursor)
 
-            
-            query = f"""
-                SELECT r."ID_REPORTE" as id_reporte, 'perdido' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_perdidos" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                UNION ALL
-                SELECT r."ID_REPORTE_ENC" as id_reporte, 'encontrado' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_encontrados" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                ORDER BY "FECHA" DESC
-            """
+            siguiente = None
+            if len(reportes) > limite:
+                reportes = reportes[:limite]
+                siguiente = codificar_cursor(consulta.llave_de(reportes[-1]))
+
+            # el total solo se estima en la primera página; el resto reutiliza el del cliente
+            total_estimado = None
+            if not llave:
+                total_estimado = contar_estimado(cursor, *consulta.sql(paginado=False))
 
-            cursor.execute(query)
-            reportes = cursor.fetchall()
             cursor.close()
             db.close()
 
-            return jsonify({"ok": True, "datos": reportes})
+            return respuesta_json({
+                "ok": True,
+                "datos": reportes,
+                "siguiente": siguiente,
+                "total_estimado": total_estimado,
+            })
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -489,10 +547,10 @@ def init_admin_routes(app):
     # RUTA PARA QUE EL ADMIN DESCARGUE LOS REPORTES
     #----------------------------------------------
     @app.route('/api/admin_descargar_reportes', methods=['POST'])
+    @login_required
     @admin_required
     def api_admin_descargar_reportes():
         try:
-            id_usuario = session["id_usuario"]
             payload = request.get_json() or {}
             
             categoria = (payload.get("categoria") or "").strip() or None
@@ -501,74 +559,43 @@ def init_admin_routes(app):
 
             tipo = (payload.get("tipo") or "").strip() or None
             busqueda = (payload.get("busqueda") or "").strip() or None
+
+            if tipo not in (None, "perdido", "encontrado"):
+                return jsonify({"ok": False, "error": "Tipo no válido"}), 400
                         
             db = conectar_db()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
-
-            # Construir condiciones para PERDIDOS
-            params_p = [id_usuario]
-            
-            if categoria:
-                params_p.append(categoria)
-
-            if busqueda:
-                params_p.extend([f"%{busqueda}%", f"%{busqueda}%"])
-
-            if fecha_inicio:
-                params_p.append(fecha_inicio)
-            
-            if fecha_fin:
-                params_p.append(fecha_fin)
-            params_e = [id_usuario]
-            
-            if categoria:
-                params_e.append(categoria)
-            
-            if fecha_inicio:
-                params_e.append(fecha_inicio)
-            
-            if fecha_fin:
-                params_e.append(fecha_fin)
-            
-            
-            query = f"""
-                SELECT r."ID_REPORTE" as id_reporte, 'perdido' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_perdidos" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                UNION ALL
-                SELECT r."ID_REPORTE_ENC" as id_reporte, 'encontrado' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_encontrados" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                ORDER BY "FECHA" DESC
-            """
+            cursor = db.cursor()
 
-            cursor.execute(query)
-            reportes = cursor.fetchall()
+            reportes = (
+                ConsultaReportes()
+                .solo_tipo(tipo)
+                .categoria(categoria)
+                .texto(busqueda)
+                .rango_fechas(fecha_inicio, fecha_fin)
+                .modelos(cursor)
+            )
             cursor.close()
             db.close()
 
             # Generar HTML para el PDF
             filas_tabla = ""
             for idx, r in enumerate(reportes, 1):
-                fecha = r.get('FECHA')
-                if isinstance(fecha, datetime):
-                    fecha_str = fecha.strftime('%d/%m/%Y')
+                if isinstance(r.fecha, date):
+                    fecha_str = r.fecha.strftime('%d/%m/%Y')
                 else:
-                    fecha_str = str(fecha) if fecha else 'N/A'
+                    fecha_str = str(r.fecha) if r.fecha else 'N/A'
                 
-                tipoLabel = 'Perdido' if r['tipo'] == 'perdido' else 'Encontrado'
+                tipoLabel = 'Perdido' if r.tipo == 'perdido' else 'Encontrado'
                 
                 filas_tabla += f"""
                 <tr>
                     <td>{idx}</td>
-                    <td>{r.get('NOMBRE', 'N/A')}</td>
-                    <td>{r.get('COLOR', 'N/A')}</td>
-                    <td>{r.get('nombre_categoria', 'N/A')}</td>
+                    <td>{r.nombre or 'N/A'}</td>
+                    <td>{r.color or 'N/A'}</td>
+                    <td>{r.nombre_categoria or 'N/A'}</td>
                     <td>{tipoLabel}</td>
                     <td>{fecha_str}</td>
-                    <td>{(r.get('OBSERVACIONES') or '')[:100]}</td>
+                    <td>{(r.observaciones or '')[:100]}</td>
                 </tr>
                 """
 
@@ -788,45 +815,27 @@ def init_admin_routes(app):
 
             cursor = db.cursor()
 
-            # Verificar que exista el usuario
-            cursor.execute(
-                'SELECT 1 FROM "Usuarios" WHERE "ID_USUARIO" = %s',
-                (id_usuario_borrar,)
-            )
+            # Marcar el usuario como eliminado; reportes, objetos y archivos
+            # se borran por lotes en segundo plano (eliminacion_usuarios)
+            marcados = solicitar_eliminacion(cursor, [id_usuario_borrar], session.get("id_usuario"))
 
-            if cursor.fetchone() is None:
+            if not marcados:
+                db.rollback()
                 cursor.close()
                 db.close()
                 return jsonify({'ok': False, 'error': 'Usuario no encontrado'}), 404
 
-            # Eliminar reportes encontrados del usuario
-            cursor.execute(
-                'DELETE FROM "Reportes_encontrados" WHERE "ID_USUARIO" = %s',
-                (id_usuario_borrar,)
-            )
-
-            # Eliminar reportes perdidos del usuario
-            cursor.execute(
-                'DELETE FROM "Reportes_perdidos" WHERE "ID_USUARIO" = %s',
-                (id_usuario_borrar,)
-            )
-
-            # Eliminar el usuario
-            cursor.execute(
-                'DELETE FROM "Usuarios" WHERE "ID_USUARIO" = %s',
-                (id_usuario_borrar,)
-            )
-
-            afectadas = cursor.rowcount
-
             db.commit()
+            invalidar_reportes()
+            revocar_sesiones(*marcados)
+            invalidar_roles()
 
             cursor.close()
             db.close()
 
             return jsonify({
                 'ok': True,
-                'deleted': afectadas > 0
+                'deleted': True
             }), 200
 
         except Exception as e:
@@ -876,6 +885,7 @@ def init_admin_routes(app):
                 )
 
             db.commit()
+            invalidar_reportes()
             afectadas = cursor.rowcount if hasattr(cursor, "rowcount") else None
             cursor.close()
             db.close()
@@ -890,6 +900,392 @@ def init_admin_routes(app):
                 pass
             return jsonify({"ok": False, "error": str(e)}), 500
 
+    #-------------------------------------
+    # ACCIONES DE MODERACIÓN EN LOTE
+    #-------------------------------------
+
+    LOTE_MAXIMO = 500
+
+    ACCIONES_LOTE_REPORTES = {
+        "encontrado": "encontrado",
+        "falso": "falso",
+        "pendiente": "pendiente",
+        "borrar": None,
+    }
+
+    ACCIONES_LOTE_USUARIOS = {
+        "admin": 2,
+        "usuario": 1,
+        "borrar": None,
+    }
+
+    def _ids_unicos(valores):
+        """Limpia una lista de ids recibida por JSON conservando el orden."""
+        limpios = (str(valor).strip() for valor in valores or [] if valor is not None)
+        return list(dict.fromkeys(valor for valor in limpios if valor))
+
+    @app.route("/api/admin/reportes/lote", methods=["POST"])
+    @admin_required
+    def api_admin_reportes_lote():
+        """Aplica una acción a varios reportes en una sola transacción.
+
+        Body JSON:
+        { "accion": "encontrado"|"falso"|"pendiente"|"borrar",
+          "reportes": [{"id_reporte": "<id>", "tipo": "perdido"|"encontrado"}, ...] }
+        """
+        db = None
+        cursor = None
+        try:
+            payload = request.get_json() or {}
+            accion = payload.get("accion")
+            reportes = payload.get("reportes") or []
+
+            if accion not in ACCIONES_LOTE_REPORTES or not isinstance(reportes, list):
+                return jsonify({"ok": False, "error": "Parámetros inválidos"}), 400
+            if len(reportes) > LOTE_MAXIMO:
+                return jsonify({"ok": False, "error": f"Máximo {LOTE_MAXIMO} reportes por lote"}), 400
+
+            ids_por_tipo = {"perdido": [], "encontrado": []}
+            resultados = []
+            for item in reportes:
+                item = item if isinstance(item, dict) else {}
+                tipo = item.get("tipo")
+                id_reporte = str(item.get("id_reporte") or "").strip()
+                if not id_reporte or tipo not in ids_por_tipo:
+                    resultados.append({"id_reporte": id_reporte or None, "tipo": tipo, "ok": False, "error": "Parámetros inválidos"})
+                    continue
+                ids_por_tipo[tipo].append(id_reporte)
+                resultados.append({"id_reporte": id_reporte, "tipo": tipo})
+
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor()
+
+            afectados = {"perdido": set(), "encontrado": set()}
+            for tipo in TIPOS:
+                ids = _ids_unicos(ids_por_tipo[tipo])
+                if not ids:
+                    continue
+                if accion == "borrar":
+                    cursor.execute(
+                        'DELETE FROM "Reportes" WHERE "TIPO" = %s AND "ID_REPORTE" = ANY(%s) RETURNING "ID_REPORTE"',
+                        (tipo, ids),
+                    )
+                else:
+                    cursor.execute(
+                        'UPDATE "Reportes" SET "STATUS" = %s WHERE "TIPO" = %s AND "ID_REPORTE" = ANY(%s) RETURNING "ID_REPORTE"',
+                        (ACCIONES_LOTE_REPORTES[accion], tipo, ids),
+                    )
+                afectados[tipo] = {fila[0] for fila in cursor.fetchall()}
+                if accion == "borrar":
+                    quitar_reportes(cursor, tipo, afectados[tipo])
+
+            db.commit()
+            invalidar_reportes()
+            cursor.close()
+            db.close()
+
+            for resultado in resultados:
+                if "ok" in resultado:
+                    continue
+                resultado["ok"] = resultado["id_reporte"] in afectados[resultado["tipo"]]
+                if not resultado["ok"]:
+                    resultado["error"] = "Reporte no encontrado"
+
+            return jsonify({
+                "ok": True,
+                "procesados": sum(1 for r in resultados if r["ok"]),
+                "resultados": resultados,
+            }), 200
+
+        except Exception as e:
+            if db:
+                db.rollback()
+            try:
+                if cursor:
+                    cursor.close()
+                if db:
+                    db.close()
+            except:
+                pass
+            return jsonify({"ok": False, "error": str(e)}), 500
+
+    @app.route("/api/admin/usuarios/lote", methods=["POST"])
+    @admin_required
+    def api_admin_usuarios_lote():
+        """Cambia el rol o elimina varios usuarios en una sola transacción.
+
+        Body JSON: { "accion": "admin"|"usuario"|"borrar", "ids": ["<id_usuario>", ...] }
+        """
+        db = None
+        cursor = None
+        try:
+            payload = request.get_json() or {}
+            accion = payload.get("accion")
+            ids_recibidos = payload.get("ids") or []
+
+            if accion not in ACCIONES_LOTE_USUARIOS or not isinstance(ids_recibidos, list):
+                return jsonify({"ok": False, "error": "Parámetros inválidos"}), 400
+            if len(ids_recibidos) > LOTE_MAXIMO:
+                return jsonify({"ok": False, "error": f"Máximo {LOTE_MAXIMO} usuarios por lote"}), 400
+
+            ids = _ids_unicos(ids_recibidos)
+            propio = session.get("id_usuario")
+            errores = {}
+
+            # el admin no puede eliminarse ni quitarse el rol a sí mismo desde esta vista
+            if accion in ("borrar", "usuario") and propio in ids:
+                ids.remove(propio)
+                errores[propio] = "No puedes aplicar esta acción a tu propio usuario"
+
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor()
+
+            afectados = set()
+            if ids:
+                if accion == "borrar":
+                    afectados = solicitar_eliminacion(cursor, ids, propio)
+                else:
+                    cursor.execute(
+                        'UPDATE public."Usuarios" SET "ID_ROL" = %s WHERE "ID_USUARIO" = ANY(%s) RETURNING "ID_USUARIO"',
+                        (ACCIONES_LOTE_USUARIOS[accion], ids),
+                    )
+                    afectados = {fila[0] for fila in cursor.fetchall()}
+
+            db.commit()
+            if accion == "borrar" and afectados:
+                invalidar_reportes()
+            if afectados:
+                revocar_sesiones(*afectados)
+                invalidar_roles()
+            cursor.close()
+            db.close()
+
+            resultados = []
+            for id_usuario in _ids_unicos(ids_recibidos):
+                if id_usuario in errores:
+                    resultados.append({"id_usuario": id_usuario, "ok": False, "error": errores[id_usuario]})
+                elif id_usuario in afectados:
+                    resultados.append({"id_usuario": id_usuario, "ok": True})
+                else:
+                    resultados.append({"id_usuario": id_usuario, "ok": False, "error": "Usuario no encontrado"})
+
+            return jsonify({
+                "ok": True,
+                "procesados": len(afectados),
+                "resultados": resultados,
+            }), 200
+
+        except Exception as e:
+            if db:
+                db.rollback()
+            try:
+                if cursor:
+                    cursor.close()
+                if db:
+                    db.close()
+            except:
+                pass
+            return jsonify({"ok": False, "error": str(e)}), 500
+
+    @app.route("/api/admin/eliminaciones", methods=["GET"])
+    @admin_required
+    def api_admin_eliminaciones():
+        """Avance de las eliminaciones de usuarios que siguen en segundo plano."""
+        try:
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(
+                """
+                SELECT "ID_USUARIO", "SOLICITADO_POR", "FASE", "REPORTES_BORRADOS",
+                       "OBJETOS_BORRADOS", "MENSAJES_BORRADOS", "ERROR", "INTENTOS", "CREADO", "ACTUALIZADO"
+                FROM public."Eliminaciones_usuarios"
+                WHERE "FASE" <> 'completado' OR "ACTUALIZADO" >= CURRENT_TIMESTAMP - INTERVAL '1 day'
+                ORDER BY "CREADO" DESC
+                LIMIT 100
+                """
+            )
+            datos = cursor.fetchall()
+            cursor.close()
+            db.close()
+            return jsonify({"ok": True, "datos": datos}), 200
+        except Exception as e:
+            return jsonify({"ok": False, "error": str(e)}), 500
+
+    #-------------------------------------
+    #ADMIN COINCIDENCIAS PERDIDO/ENCONTRADO
+    #-------------------------------------
+
+    @app.route("/api/admin/coincidencias", methods=["GET"])
+    @admin_required
+    def api_admin_coincidencias():
+        """Página de coincidencias propuestas por el motor, mayor puntaje primero.
+
+        Parámetros GET opcionales: estado, limite, cursor
+        """
+        try:
+            estado = request.args.get("estado", "").strip() or None
+            limite = leer_limite(request.args.get("limite"))
+            cursor_param = request.args.get("cursor", "").strip()
+
+            if estado and estado not in ESTADOS_COINCIDENCIA:
+                return jsonify({"ok": False, "error": "Estado inválido"}), 400
+
+            llave = decodificar_cursor(cursor_param)
+            if cursor_param and (not llave or len(llave) != 3):
+                return jsonify({"ok": False, "error": "Cursor no válido"}), 400
+
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor(cursor_factory=RealDictCursor)
+            datos = listar_coincidencias_admin(cursor, estado, llave, limite + 1)
+            cursor.close()
+            db.close()
+
+            siguiente = None
+            if len(datos) > limite:
+                datos = datos[:limite]
+                ultimo = datos[-1]
+                siguiente = codificar_cursor(
+                    [ultimo["puntaje"], ultimo["id_reporte_perdido"], ultimo["id_reporte_encontrado"]]
+                )
+
+            return jsonify({"ok": True, "datos": datos, "siguiente": siguiente}), 200
+        except Exception as e:
+            return jsonify({"ok": False, "error": str(e)}), 500
+
+    @app.route("/api/admin/coincidencias/estado", methods=["POST"])
+    @admin_required
+    def api_admin_estado_coincidencia():
+        """Confirma o descarta una coincidencia.
+
+        Body JSON: { "id_reporte_perdido", "id_reporte_encontrado", "estado" }
+        Al confirmar, ambos reportes pasan a STATUS 'encontrado' y las demás
+        sugerencias de cualquiera de los dos quedan descartadas.
+        """
+        db = None
+        cursor = None
+        try:
+            payload = request.get_json() or {}
+            id_perdido = payload.get("id_reporte_perdido")
+            id_encontrado = payload.get("id_reporte_encontrado")
+            estado = payload.get("estado")
+
+            if not id_perdido or not id_encontrado or estado not in ESTADOS_COINCIDENCIA:
+                return jsonify({"ok": False, "error": "Parámetros inválidos"}), 400
+
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor()
+
+            cursor.execute(
+                """
+                UPDATE public."Coincidencias" SET "ESTADO" = %s
+                WHERE "ID_REPORTE_PERDIDO" = %s AND "ID_REPORTE_ENCONTRADO" = %s
+                """,
+                (estado, id_perdido, id_encontrado),
+            )
+            if cursor.rowcount == 0:
+                db.rollback()
+                cursor.close()
+                db.close()
+                return jsonify({"ok": False, "error": "Coincidencia no encontrada"}), 404
+
+            if estado == "confirmada":
+                cursor.execute(
+                    """
+                    UPDATE public."Coincidencias" SET "ESTADO" = 'descartada'
+                    WHERE "ESTADO" = 'sugerida'
+                      AND ("ID_REPORTE_PERDIDO" = %s OR "ID_REPORTE_ENCONTRADO" = %s)
+                    """,
+                    (id_perdido, id_encontrado),
+                )
+                cursor.execute(
+                    '''UPDATE public."Reportes_perdidos" SET "STATUS" = 'encontrado' WHERE "ID_REPORTE" = %s''',
+                    (id_perdido,),
+                )
+                cursor.execute(
+                    '''UPDATE public."Reportes_encontrados" SET "STATUS" = 'encontrado' WHERE "ID_REPORTE_ENC" = %s''',
+                    (id_encontrado,),
+                )
+
+            db.commit()
+            if estado == "confirmada":
+                invalidar_reportes()
+            cursor.close()
+            db.close()
+            return jsonify({"ok": True}), 200
+
+        except Exception as e:
+            if db:
+                db.rollback()
+            try:
+                if cursor:
+                    cursor.close()
+                if db:
+                    db.close()
+            except:
+                pass
+            return jsonify({"ok": False, "error": str(e)}), 500
+
+    #-------------------------------------
+    #ADMIN POSIBLES DUPLICADOS (IMÁGENES)
+    #-------------------------------------
+
+    @app.route("/api/admin/posibles_duplicados", methods=["GET"])
+    @admin_required
+    def api_admin_posibles_duplicados():
+        """Pares de objetos cuyas fotos son casi idénticas según su huella perceptual.
+
+        Parámetros GET opcionales: limite, cursor
+        """
+        try:
+            limite = leer_limite(request.args.get("limite"))
+            cursor_param = request.args.get("cursor", "").strip()
+            llave = decodificar_cursor(cursor_param)
+            if cursor_param and (not llave or len(llave) != 2):
+                return jsonify({"ok": False, "error": "Cursor no válido"}), 400
+
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            cursor = db.cursor(cursor_factory=RealDictCursor)
+            datos, llave_siguiente = listar_pares_duplicados(cursor, llave=llave, limite=limite)
+            cursor.close()
+            db.close()
+
+            siguiente = codificar_cursor(llave_siguiente) if llave_siguiente else None
+            return jsonify({"ok": True, "datos": datos, "siguiente": siguiente}), 200
+        except Exception as e:
+            return jsonify({"ok": False, "error": str(e)}), 500
+
+    @app.route("/api/admin/cache", methods=["GET"])
+    @admin_required
+    def api_admin_cache():
+        """Aciertos, fallos y esperas de la caché de listados públicos."""
+        return jsonify({"ok": True, "datos": cache_consultas.metricas()}), 200
+
+    @app.route("/api/admin/huellas/recalcular", methods=["POST"])
+    @admin_required
+    def api_admin_recalcular_huellas():
+        """Calcula huellas de un lote de imágenes subidas antes de existir el índice."""
+        try:
+            db = conectar_db()
+            if db is None:
+                return jsonify({"ok": False, "error": "Error de conexión a la base de datos"}), 500
+            guardadas = calcular_huellas_pendientes(db, app.config["UPLOAD_FOLDER"])
+            db.close()
+            return jsonify({"ok": True, "procesadas": guardadas}), 200
+        except Exception as e:
+            return jsonify({"ok": False, "error": str(e)}), 500
+
     #--------------------------
     #ADMIN BUZON
     #---------------------------
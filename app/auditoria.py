@@ -0,0 +1,154 @@
+"""
+Auditoría de consultas por petición, para desarrollo y CI.
+
+Con AUDITAR_CONSULTAS activo, cada petición guarda sus consultas (ver
+metricas.py) y al terminar se revisa:
+
+- sentencias repetidas: mismo SQL con los mismos parámetros más de una vez,
+- consultas N+1: el mismo SQL normalizado, devolviendo una fila o
+  ninguna, UMBRAL_REPETICIONES veces o más (típico de un for que consulta
+  fila por fila),
+- presupuesto: las rutas marcadas con @presupuesto_consultas(n) no pueden
+  pasar de n consultas.
+
+AUDITAR_CONSULTAS=registrar imprime los hallazgos; estricto además lanza
+PresupuestoConsultasExcedido cuando una ruta pasa su presupuesto, y con
+app.testing la excepción llega al cliente de pruebas y falla el test.
+
+Para medir un bloque de código sin petición (o varias peticiones del
+cliente de pruebas):
+
+    with auditar_consultas(maximo=3) as auditoria:
+        client.get("/api/mensajes")
+    auditoria.hallazgos
+"""
+
+from collections import Counter
+
+from flask import current_app, g, request
+
+from .metricas import capturar_peticiones, iniciar_captura, terminar_captura
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+UMBRAL_REPETICIONES = 3
+MODOS = ("registrar", "estricto")
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Una ruta o bloque ejecutó más consultas que su presupuesto."""
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara cuántas consultas puede hacer una ruta. Va debajo de @app.route
+    (functools.wraps de los otros decoradores conserva la marca).
+    """
+
+    def decorador(f):
+        f.presupuesto_consultas = maximo
+        return f
+
+    return decorador
+
+
+# ========================
+# ANÁLISIS
+# ========================
+
+
+def analizar(sentencias, maximo=None):
+    """
+    Busca sentencias repetidas, consultas N+1 y exceso de presupuesto.
+
+    Args:
+        sentencias (list[Sentencia]): Consultas capturadas, en orden
+        maximo (int): Presupuesto o None
+
+    Returns:
+        list[str]: Hallazgos, vacía si no hay nada que señalar
+    """
+    hallazgos = []
+
+    repetidas = Counter(s.huella for s in sentencias)
+    vistas = set()
+    for s in sentencias:
+        veces = repetidas[s.huella]
+        if veces > 1 and s.huella not in vistas:
+            vistas.add(s.huella)
+            hallazgos.append(f"repetida {veces} veces con los mismos parámetros: {s.sql}")
+
+    por_sql = Counter(s.sql for s in sentencias if s.filas <= 1)
+    for sql, veces in por_sql.items():
+        if veces >= UMBRAL_REPETICIONES:
+            hallazgos.append(f"posible N+1, {veces} consultas de una fila: {sql}")
+
+    if maximo is not None and len(sentencias) > maximo:
+        hallazgos.append(f"{len(sentencias)} consultas, el presupuesto es {maximo}")
+    return hallazgos
+
+
+class auditar_consultas:
+    """
+    Context manager que captura las consultas del hilo y las analiza al salir.
+
+    Lanza PresupuestoConsultasExcedido si se pasó de `maximo`.
+    """
+
+    def __init__(self, maximo=None):
+        self.maximo = maximo
+        self.sentencias = []
+        self.hallazgos = []
+
+    def __enter__(self):
+        iniciar_captura()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.sentencias = terminar_captura()
+        self.hallazgos = analizar(self.sentencias, self.maximo)
+        if tipo is None and self.maximo is not None and len(self.sentencias) > self.maximo:
+            raise PresupuestoConsultasExcedido(
+                f"{len(self.sentencias)} consultas, el presupuesto es {self.maximo}:\n"
+                + "\n".join(f"  {s.sql}" for s in self.sentencias)
+            )
+        return False
+
+
+# ========================
+# HOOK DE FLASK
+# ========================
+
+
+def activar_auditoria(app):
+    """
+    Revisa las consultas de cada petición según AUDITAR_CONSULTAS.
+
+    Se registra después de metricas.instrumentar(app): Flask corre los
+    after_request en orden inverso, así que este ve g.medicion completo.
+    """
+    modo = app.config.get("AUDITAR_CONSULTAS")
+    if modo not in MODOS:
+        return
+    capturar_peticiones(True)
+
+    @app.after_request
+    def revisar_consultas(response):
+        medicion = g.get("medicion")
+        if not medicion or medicion["sentencias"] is None:
+            return response
+
+        vista = current_app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, "presupuesto_consultas", None)
+        sentencias = medicion["sentencias"]
+        hallazgos = analizar(sentencias, maximo)
+        for hallazgo in hallazgos:
+            print(f"[AUDITORIA] {request.method} {request.path}: {hallazgo}")
+
+        if modo == "estricto" and maximo is not None and len(sentencias) > maximo:
+            raise PresupuestoConsultasExcedido(
+                f"{request.endpoint}: {len(sentencias)} consultas, el presupuesto es {maximo}"
+            )
+        return response
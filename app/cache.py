@@ -0,0 +1,343 @@
+"""
+Caché de resultados de consultas.
+
+Pensada para datos baratos de recalcular pero consultados muy seguido
+(conteos de facetas, listados públicos). Tiene tres piezas:
+
+- CacheTTL: diccionario LRU acotado con vencimiento por entrada.
+- Backends intercambiables: BackendMemoria (por proceso, usa CacheTTL) y
+  BackendRedis (compartido entre procesos, opcional).
+- CacheConsultas: agrupa las entradas por espacio, evita que varias
+  peticiones recalculen la misma clave a la vez (single-flight) y lleva
+  métricas de aciertos.
+
+La invalidación es por versión: cada espacio tiene un contador que forma
+parte de la clave, e invalidar() solo lo incrementa. Las entradas viejas
+dejan de encontrarse y el LRU o el TTL las descartan solas.
+
+El contador tiene que ser el mismo para todos los procesos del servidor.
+Con Redis vive en Redis. Con BackendMemoria vive en la tabla Versiones
+(igual que la versión de roles de permisos.py) y cada proceso la relee
+como mucho cada INTERVALO_VERSION segundos, así que una invalidación
+llega a todos en ese intervalo y no al vencer el TTL.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+TTL_POR_DEFECTO = 30  # segundos
+ESPERA_MAXIMA = 5  # segundos que una petición espera el cálculo de otra
+INTERVALO_VERSION = 1.0  # segundos entre lecturas de Versiones por proceso
+
+# espacio de las entradas que dependen de los reportes
+ESPACIO_REPORTES = "reportes"
+
+
+class CacheTTL:
+    """
+    Diccionario acotado con vencimiento por entrada.
+
+    Cuando se llena descarta primero las entradas usadas hace más tiempo.
+    Es segura para usar desde varios hilos del servidor.
+    """
+
+    def __init__(self, ttl, max_entradas=1000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Devuelve el valor guardado o None si no existe o ya venció."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        """Guarda un valor durante ttl segundos (por defecto el de la caché)."""
+        vence = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (vence, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        """Descarta todas las entradas."""
+        with self._lock:
+            self._datos.clear()
+
+
+# ========================
+# BACKENDS
+# ========================
+
+
+class BackendMemoria:
+    """
+    Backend en memoria del proceso. Cada proceso del servidor tiene sus
+    entradas, pero las versiones se comparten por la tabla Versiones.
+
+    Sin conectar (o si la base no responde) las versiones son solo del
+    proceso, como antes.
+    """
+
+    nombre = "memoria"
+
+    def __init__(self, max_entradas=2000, conectar=None):
+        self._entradas = CacheTTL(TTL_POR_DEFECTO, max_entradas)
+        self._conectar = conectar
+        self._versiones = {}  # espacio -> (versión, momento de la lectura)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        return self._entradas.obtener(clave)
+
+    def guardar(self, clave, valor, ttl):
+        self._entradas.guardar(clave, valor, ttl)
+
+    def _recordar(self, espacio, version):
+        with self._lock:
+            self._versiones[espacio] = (version, time.monotonic())
+
+    def _local(self, espacio):
+        with self._lock:
+            return self._versiones.get(espacio, (0, 0.0))
+
+    def _sql(self, sql, espacio):
+        """Ejecuta sql sobre Versiones; None si no hay base o falla."""
+        conexion = self._conectar() if self._conectar else None
+        if not conexion:
+            return None
+        try:
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute(sql, (espacio,))
+                fila = cursor.fetchone()
+                return fila[0] if fila else 0
+        except Exception as e:
+            print(f"Error con la versión de caché en Versiones: {e}")
+            return None
+        finally:
+            conexion.close()
+
+    def version(self, espacio):
+        version, leida = self._local(espacio)
+        if self._conectar is None or time.monotonic() - leida < INTERVALO_VERSION:
+            return version
+        compartida = self._sql(
+            'SELECT "VERSION" FROM public."Versiones" WHERE "ESPACIO" = %s', espacio
+        )
+        # sin base se sigue con la versión del proceso hasta el próximo intervalo
+        self._recordar(espacio, version if compartida is None else compartida)
+        return version if compartida is None else compartida
+
+    def incrementar_version(self, espacio):
+        compartida = self._sql(
+            """
+            INSERT INTO public."Versiones" ("ESPACIO", "VERSION") VALUES (%s, 1)
+            ON CONFLICT ("ESPACIO") DO UPDATE SET "VERSION" = public."Versiones"."VERSION" + 1
+            RETURNING "VERSION"
+            """,
+            espacio,
+        )
+        if compartida is None:
+            if self._conectar is not None:
+                print("✗ Sin base para invalidar la caché; los demás procesos lo verán al vencer CACHE_TTL")
+            compartida = self._local(espacio)[0] + 1
+        self._recordar(espacio, compartida)
+
+
+class BackendRedis:
+    """
+    Backend compartido en Redis: todos los procesos ven las mismas entradas
+    y las mismas versiones, así que una invalidación llega a todos.
+
+    Los valores se guardan como bytes tal cual o como JSON.
+    """
+
+    nombre = "redis"
+
+    def __init__(self, url):
+        import redis  # dependencia opcional
+
+        self._cliente = redis.Redis.from_url(url)
+        self._cliente.ping()  # from_url no conecta; así crear_backend puede caer a memoria
+
+    def obtener(self, clave):
+        crudo = self._cliente.get("orio:" + clave)
+        if crudo is None:
+            return None
+        if crudo[:1] == b"B":
+            return crudo[1:]
+        return json.loads(crudo[1:])
+
+    def guardar(self, clave, valor, ttl):
+        if isinstance(valor, bytes):
+            crudo = b"B" + valor
+        else:
+            crudo = b"J" + json.dumps(valor, default=str).encode("utf-8")
+        self._cliente.set("orio:" + clave, crudo, ex=max(1, int(ttl)))
+
+    def version(self, espacio):
+        return int(self._cliente.get("orio:version:" + espacio) or 0)
+
+    def incrementar_version(self, espacio):
+        self._cliente.incr("orio:version:" + espacio)
+
+
+def crear_backend(url=None, conectar=None):
+    """
+    Crea el backend según CACHE_URL: vacío o "memoria" usa el proceso,
+    "redis://..." usa Redis. Si Redis no está disponible se usa memoria.
+
+    Args:
+        conectar: Función que abre una conexión a la base, para compartir
+            las versiones de BackendMemoria por la tabla Versiones
+    """
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            return BackendRedis(url)
+        except Exception as e:
+            print(f"⚠ Caché Redis no disponible, se usa memoria: {e}")
+    return BackendMemoria(conectar=conectar)
+
+
+# ========================
+# CACHÉ DE CONSULTAS
+# ========================
+
+
+def _clave_parametros(parametros):
+    """Clave corta y estable para cualquier combinación de parámetros."""
+    crudo = json.dumps(parametros, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(crudo.encode("utf-8")).hexdigest()
+
+
+class CacheConsultas:
+    """
+    Caché de resultados por espacio con single-flight y métricas.
+
+    El single-flight es por proceso: si 100 peticiones piden la misma clave
+    vencida, una sola ejecuta la consulta y las demás esperan su resultado.
+    """
+
+    def __init__(self, backend=None, ttl=TTL_POR_DEFECTO):
+        self.backend = backend or BackendMemoria()
+        self.ttl = ttl
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self._metricas = {"aciertos": 0, "fallos": 0, "esperas": 0, "invalidaciones": 0, "errores": 0}
+
+    def _contar(self, metrica):
+        with self._lock:
+            self._metricas[metrica] += 1
+
+    def _leer(self, clave):
+        try:
+            return self.backend.obtener(clave)
+        except Exception as e:
+            self._contar("errores")
+            print(f"Error leyendo caché: {e}")
+            return None
+
+    def obtener_o_calcular(self, espacio, parametros, calcular, ttl=None):
+        """
+        Devuelve el valor en caché o lo calcula con calcular() y lo guarda.
+
+        Args:
+            espacio (str): Grupo de entradas que se invalida junto
+            parametros: Parámetros ya normalizados (serializables a JSON)
+            calcular: Función sin argumentos que produce el valor
+            ttl (int): Segundos de vida (por defecto el de la caché)
+        """
+        try:
+            version = self.backend.version(espacio)
+        except Exception as e:
+            self._contar("errores")
+            print(f"Error leyendo versión de caché: {e}")
+            return calcular()
+
+        clave = f"{espacio}:{version}:{_clave_parametros(parametros)}"
+
+        valor = self._leer(clave)
+        if valor is not None:
+            self._contar("aciertos")
+            return valor
+
+        with self._lock:
+            evento = self._en_vuelo.get(clave)
+            lider = evento is None
+            if lider:
+                evento = self._en_vuelo[clave] = threading.Event()
+
+        if not lider:
+            # otra petición ya está calculando esta clave: esperar su resultado
+            self._contar("esperas")
+            evento.wait(ESPERA_MAXIMA)
+            valor = self._leer(clave)
+            if valor is not None:
+                self._contar("aciertos")
+                return valor
+            self._contar("fallos")
+            return calcular()
+
+        self._contar("fallos")
+        try:
+            valor = calcular()
+            try:
+                self.backend.guardar(clave, valor, self.ttl if ttl is None else ttl)
+            except Exception as e:
+                self._contar("errores")
+                print(f"Error guardando en caché: {e}")
+            return valor
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+            evento.set()
+
+    def invalidar(self, espacio):
+        """Descarta todas las entradas de un espacio incrementando su versión."""
+        try:
+            self.backend.incrementar_version(espacio)
+            self._contar("invalidaciones")
+        except Exception as e:
+            self._contar("errores")
+            print(f"Error invalidando caché: {e}")
+
+    def metricas(self):
+        """Contadores de uso y tasa de aciertos desde que arrancó el proceso."""
+        with self._lock:
+            datos = dict(self._metricas)
+        consultas = datos["aciertos"] + datos["fallos"]
+        datos["tasa_aciertos"] = round(datos["aciertos"] / consultas, 4) if consultas else None
+        datos["backend"] = self.backend.nombre
+        return datos
+
+
+# instancia compartida por las rutas; configurar_cache() elige el backend
+cache_consultas = CacheConsultas()
+
+
+def configurar_cache(app, conectar=None):
+    """Configura la caché compartida según CACHE_URL y CACHE_TTL."""
+    cache_consultas.backend = crear_backend(app.config.get("CACHE_URL"), conectar)
+    cache_consultas.ttl = app.config.get("CACHE_TTL", TTL_POR_DEFECTO)
+
+
+def invalidar_reportes():
+    """Avisa que se creó, borró o cambió de estado algún reporte."""
+    cache_consultas.invalidar(ESPACIO_REPORTES)
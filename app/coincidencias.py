@@ -0,0 +1,364 @@
+"""
+Motor de coincidencias entre reportes perdidos y encontrados.
+
+Cuando se envía un reporte se buscan candidatos del tipo contrario y se
+guardan los mejores en la tabla Coincidencias. Para no comparar contra toda
+la tabla se usa bloqueo: solo se puntúan reportes de la misma categoría cuya
+fecha cae dentro de una ventana de días alrededor de la del reporte nuevo.
+
+El puntaje combina:
+- similitud de nombre (trigramas, igual que pg_trgm)
+- similitud de color
+- similitud del lugar (LUGAR_ENCONTRADO)
+- cercanía de fechas
+"""
+
+import json
+import re
+import unicodedata
+from datetime import date, datetime
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+PESOS = {
+    "nombre": 0.4,
+    "color": 0.2,
+    "lugar": 0.2,
+    "fecha": 0.2,
+}
+
+VENTANA_DIAS = 30  # bloqueo por fecha: solo se comparan reportes a +-30 días
+MAX_CANDIDATOS = 300  # tope de candidatos puntuados por reporte nuevo
+TOP_K = 5  # coincidencias guardadas por reporte
+PUNTAJE_MINIMO = 0.35
+
+ESTADOS_COINCIDENCIA = ("sugerida", "confirmada", "descartada")
+
+# tipo del reporte -> (tabla, columna id) del propio y del contrario
+TIPOS = {
+    "perdido": {
+        "tabla": "Reportes_perdidos",
+        "id": "ID_REPORTE",
+        "columna": "ID_REPORTE_PERDIDO",
+        "contrario": "encontrado",
+    },
+    "encontrado": {
+        "tabla": "Reportes_encontrados",
+        "id": "ID_REPORTE_ENC",
+        "columna": "ID_REPORTE_ENCONTRADO",
+        "contrario": "perdido",
+    },
+}
+
+
+# ========================
+# SIMILITUD DE TEXTO
+# ========================
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y solo letras/números separados por un espacio."""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9]+", texto.lower()))
+
+
+def trigramas(texto):
+    """
+    Conjunto de trigramas de un texto, con el mismo relleno que pg_trgm
+    (dos espacios al inicio y uno al final de cada palabra).
+    """
+    resultado = set()
+    for palabra in normalizar_texto(texto).split():
+        relleno = f"  {palabra} "
+        for i in range(len(relleno) - 2):
+            resultado.add(relleno[i : i + 3])
+    return resultado
+
+
+def similitud(a, b):
+    """Índice de Jaccard entre los trigramas de dos textos (0 a 1)."""
+    ta = a if isinstance(a, set) else trigramas(a)
+    tb = b if isinstance(b, set) else trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def _como_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return None
+
+
+def _similitud_color(reporte, candidato):
+    """Compara por color de la paleta; si alguno no lo tiene, por el texto."""
+    id_a, id_b = reporte.get("ID_COLOR"), candidato.get("ID_COLOR")
+    if id_a and id_b:
+        if id_a == id_b:
+            return 1.0
+        return 0.5 if "multicolor" in (id_a, id_b) else 0.0
+    return similitud(reporte["_tri_color"], candidato["COLOR"])
+
+
+def puntuar(reporte, candidato):
+    """
+    Calcula el puntaje de un par de reportes.
+
+    Args:
+        reporte (dict): NOMBRE, COLOR, ID_COLOR, LUGAR_ENCONTRADO y FECHA del reporte nuevo
+        candidato (dict): Mismas llaves para el reporte del tipo contrario
+
+    Returns:
+        tuple: (puntaje total, detalle por componente)
+    """
+    detalle = {
+        "nombre": similitud(reporte["_tri_nombre"], candidato["NOMBRE"]),
+        "color": _similitud_color(reporte, candidato),
+        "lugar": similitud(reporte["_tri_lugar"], candidato["LUGAR_ENCONTRADO"]),
+        "fecha": 0.0,
+    }
+
+    fecha_a = _como_fecha(reporte["FECHA"])
+    fecha_b = _como_fecha(candidato["FECHA"])
+    if fecha_a and fecha_b:
+        dias = abs((fecha_a - fecha_b).days)
+        detalle["fecha"] = max(0.0, 1 - dias / VENTANA_DIAS)
+
+    total = sum(PESOS[k] * v for k, v in detalle.items())
+    return round(total, 4), {k: round(v, 3) for k, v in detalle.items()}
+
+
+# ========================
+# CÁLCULO INCREMENTAL
+# ========================
+
+
+def _datos_reporte(cursor, tipo, id_reporte):
+    t = TIPOS[tipo]
+    cursor.execute(
+        f"""
+        SELECT r."{t['id']}" AS id_reporte, r."ID_USUARIO", r."ID_CATEGORIA", r."FECHA",
+               o."NOMBRE", o."COLOR", o."ID_COLOR", o."LUGAR_ENCONTRADO"
+        FROM public."{t['tabla']}" r
+        JOIN public."Objetos" o ON o."ID_OBJETO" = r."ID_OBJETO"
+        WHERE r."{t['id']}" = %s
+        """,
+        (id_reporte,),
+    )
+    return cursor.fetchone()
+
+
+def _candidatos(cursor, tipo_contrario, reporte):
+    """Candidatos bloqueados por categoría y ventana de fechas."""
+    t = TIPOS[tipo_contrario]
+    cursor.execute(
+        f"""
+        SELECT r."{t['id']}" AS id_reporte, r."FECHA",
+               o."NOMBRE", o."COLOR", o."ID_COLOR", o."LUGAR_ENCONTRADO"
+        FROM public."{t['tabla']}" r
+        JOIN public."Objetos" o ON o."ID_OBJETO" = r."ID_OBJETO"
+        WHERE r."ID_CATEGORIA" = %s
+          AND r."FECHA" >= %s::DATE - %s
+          AND r."FECHA" < %s::DATE + %s + 1
+          AND r."ID_USUARIO" <> %s
+          AND r."STATUS" <> 'falso'
+        ORDER BY abs(r."FECHA"::DATE - %s::DATE)
+        LIMIT %s
+        """,
+        (
+            reporte["ID_CATEGORIA"],
+            reporte["FECHA"], VENTANA_DIAS,
+            reporte["FECHA"], VENTANA_DIAS,
+            reporte["ID_USUARIO"],
+            reporte["FECHA"],
+            MAX_CANDIDATOS,
+        ),
+    )
+    return cursor.fetchall()
+
+
+def calcular_coincidencias(conexion, tipo, id_reporte):
+    """
+    Puntúa un reporte contra los del tipo contrario y guarda sus TOP_K mejores.
+
+    Las coincidencias ya confirmadas o descartadas por un admin no se tocan.
+    También recorta las sugerencias de los reportes contrarios afectados para
+    que cada uno conserve solo sus TOP_K mejores. No hace commit.
+
+    Args:
+        conexion: Conexión abierta de psycopg2
+        tipo (str): "perdido" o "encontrado"
+        id_reporte (str): ID del reporte recién creado o modificado
+
+    Returns:
+        list: Coincidencias guardadas [{id_reporte, puntaje, detalle}]
+    """
+    if tipo not in TIPOS:
+        return []
+
+    propio = TIPOS[tipo]
+    contrario = TIPOS[propio["contrario"]]
+
+    cursor = conexion.cursor(cursor_factory=RealDictCursor)
+    try:
+        reporte = _datos_reporte(cursor, tipo, id_reporte)
+        if not reporte or not reporte["FECHA"]:
+            return []
+
+        # los trigramas del reporte nuevo se calculan una sola vez
+        reporte["_tri_nombre"] = trigramas(reporte["NOMBRE"])
+        reporte["_tri_color"] = trigramas(reporte["COLOR"])
+        reporte["_tri_lugar"] = trigramas(reporte["LUGAR_ENCONTRADO"])
+
+        puntuados = []
+        for candidato in _candidatos(cursor, propio["contrario"], reporte):
+            puntaje, detalle = puntuar(reporte, candidato)
+            if puntaje >= PUNTAJE_MINIMO:
+                puntuados.append((puntaje, candidato["id_reporte"], detalle))
+
+        puntuados.sort(key=lambda p: p[0], reverse=True)
+        mejores = puntuados[:TOP_K]
+
+        # reemplazar las sugerencias anteriores de este reporte
+        cursor.execute(
+            f"""
+            DELETE FROM public."Coincidencias"
+            WHERE "{propio['columna']}" = %s AND "ESTADO" = 'sugerida'
+            """,
+            (id_reporte,),
+        )
+
+        if not mejores:
+            return []
+
+        filas = []
+        for puntaje, id_otro, detalle in mejores:
+            par = {propio["columna"]: id_reporte, contrario["columna"]: id_otro}
+            filas.append(
+                (par["ID_REPORTE_PERDIDO"], par["ID_REPORTE_ENCONTRADO"], puntaje, json.dumps(detalle))
+            )
+
+        execute_values(
+            cursor,
+            """
+            INSERT INTO public."Coincidencias"
+                ("ID_REPORTE_PERDIDO", "ID_REPORTE_ENCONTRADO", "PUNTAJE", "DETALLE")
+            VALUES %s
+            ON CONFLICT ("ID_REPORTE_PERDIDO", "ID_REPORTE_ENCONTRADO") DO NOTHING
+            """,
+            filas,
+        )
+
+        # cada reporte contrario conserva solo sus TOP_K sugerencias
+        otros = [id_otro for _, id_otro, _ in mejores]
+        cursor.execute(
+            f"""
+            DELETE FROM public."Coincidencias" c
+            USING (
+                SELECT "ID_REPORTE_PERDIDO", "ID_REPORTE_ENCONTRADO",
+                       row_number() OVER (
+                           PARTITION BY "{contrario['columna']}" ORDER BY "PUNTAJE" DESC
+                       ) AS posicion
+                FROM public."Coincidencias"
+                WHERE "{contrario['columna']}" = ANY(%s) AND "ESTADO" = 'sugerida'
+            ) x
+            WHERE c."ID_REPORTE_PERDIDO" = x."ID_REPORTE_PERDIDO"
+              AND c."ID_REPORTE_ENCONTRADO" = x."ID_REPORTE_ENCONTRADO"
+              AND x.posicion > %s
+            """,
+            (otros, TOP_K),
+        )
+
+        return [
+            {"id_reporte": id_otro, "puntaje": puntaje, "detalle": detalle}
+            for puntaje, id_otro, detalle in mejores
+        ]
+    finally:
+        cursor.close()
+
+
+# ========================
+# CONSULTAS
+# ========================
+
+# columnas de la tarjeta del reporte contrario en los listados
+_SELECT_PAR = """
+    c."PUNTAJE" AS puntaje, c."ESTADO" AS estado, c."DETALLE" AS detalle,
+    rp."ID_REPORTE" AS id_reporte_perdido, op."ID_OBJETO" AS id_objeto_perdido,
+    op."NOMBRE" AS nombre_perdido, op."IMAGEN" AS imagen_perdido,
+    rp."FECHA" AS fecha_perdido, rp."ID_USUARIO" AS usuario_perdido,
+    re."ID_REPORTE_ENC" AS id_reporte_encontrado, oe."ID_OBJETO" AS id_objeto_encontrado,
+    oe."NOMBRE" AS nombre_encontrado, oe."IMAGEN" AS imagen_encontrado,
+    re."FECHA" AS fecha_encontrado, re."ID_USUARIO" AS usuario_encontrado
+"""
+
+_FROM_PAR = """
+    FROM public."Coincidencias" c
+    JOIN public."Reportes_perdidos" rp ON rp."ID_REPORTE" = c."ID_REPORTE_PERDIDO"
+    JOIN public."Objetos" op ON op."ID_OBJETO" = rp."ID_OBJETO"
+    JOIN public."Reportes_encontrados" re ON re."ID_REPORTE_ENC" = c."ID_REPORTE_ENCONTRADO"
+    JOIN public."Objetos" oe ON oe."ID_OBJETO" = re."ID_OBJETO"
+"""
+
+
+def listar_coincidencias_usuario(cursor, id_usuario, limite=50):
+    """
+    Coincidencias no descartadas de los reportes de un usuario, mejores primero.
+
+    Cada rama usa el índice de su lado de la tabla en lugar de un OR.
+    """
+    cursor.execute(
+        f"""
+        SELECT * FROM (
+            SELECT 'perdido' AS tipo_propio, {_SELECT_PAR} {_FROM_PAR}
+            WHERE rp."ID_USUARIO" = %s AND c."ESTADO" <> 'descartada'
+            UNION ALL
+            SELECT 'encontrado' AS tipo_propio, {_SELECT_PAR} {_FROM_PAR}
+            WHERE re."ID_USUARIO" = %s AND c."ESTADO" <> 'descartada'
+        ) t
+        ORDER BY puntaje DESC
+        LIMIT %s
+        """,
+        (id_usuario, id_usuario, limite),
+    )
+    return cursor.fetchall()
+
+
+def listar_coincidencias_admin(cursor, estado=None, llave=None, limite=50):
+    """
+    Página de coincidencias para moderación, ordenada por puntaje.
+
+    Args:
+        estado (str): Filtra por ESTADO si se indica
+        llave (list): [puntaje, id_perdido, id_encontrado] de la última fila vista
+    """
+    condiciones = ["1=1"]
+    params = []
+    if estado:
+        condiciones.append('c."ESTADO" = %s')
+        params.append(estado)
+    if llave:
+        # PUNTAJE es REAL: sin el cast la comparación se hace en float8 y la fila límite se repite o se salta
+        condiciones.append('(c."PUNTAJE", c."ID_REPORTE_PERDIDO", c."ID_REPORTE_ENCONTRADO") < (%s::real, %s, %s)')
+        params.extend(llave)
+    params.append(limite)
+
+    cursor.execute(
+        f"""
+        SELECT {_SELECT_PAR} {_FROM_PAR}
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY c."PUNTAJE" DESC, c."ID_REPORTE_PERDIDO" DESC, c."ID_REPORTE_ENCONTRADO" DESC
+        LIMIT %s
+        """,
+        params,
+    )
+    return cursor.fetchall()
@@ -0,0 +1,136 @@
+"""
+Normalización de colores de los objetos.
+
+El campo COLOR es texto libre ("Negro", "negro mate", "black"...). Aquí se
+traduce a un identificador de una paleta fija que se guarda en
+Objetos.ID_COLOR, con índice, para poder filtrar por igualdad y agrupar en
+las facetas de búsqueda.
+
+Si el texto no corresponde a ningún color conocido se puede usar el color
+dominante de la foto subida.
+"""
+
+import re
+import unicodedata
+
+# ========================
+# PALETA
+# ========================
+
+# id -> (nombre visible, RGB de referencia para el color de la imagen)
+PALETA = {
+    "negro": ("Negro", (20, 20, 20)),
+    "blanco": ("Blanco", (240, 240, 240)),
+    "gris": ("Gris", (128, 128, 128)),
+    "plateado": ("Plateado", (192, 192, 192)),
+    "dorado": ("Dorado", (212, 175, 55)),
+    "rojo": ("Rojo", (200, 30, 30)),
+    "rosado": ("Rosado", (240, 150, 180)),
+    "naranja": ("Naranja", (240, 130, 20)),
+    "amarillo": ("Amarillo", (240, 220, 40)),
+    "verde": ("Verde", (40, 150, 60)),
+    "azul": ("Azul", (30, 70, 180)),
+    "morado": ("Morado", (120, 50, 150)),
+    "marron": ("Marrón", (110, 70, 40)),
+    "beige": ("Beige", (220, 200, 160)),
+    "multicolor": ("Multicolor", None),
+    "transparente": ("Transparente", None),
+}
+
+# palabras (ya sin tildes y en minúscula) que apuntan a cada color
+SINONIMOS = {
+    "negro": ["negro", "negra", "black", "azabache"],
+    "blanco": ["blanco", "blanca", "white", "crema", "hueso", "marfil"],
+    "gris": ["gris", "grey", "gray", "grafito", "plomo"],
+    "plateado": ["plateado", "plateada", "plata", "silver", "metalico", "aluminio"],
+    "dorado": ["dorado", "dorada", "oro", "gold"],
+    "rojo": ["rojo", "roja", "red", "vinotinto", "vino", "granate", "carmesi"],
+    "rosado": ["rosado", "rosada", "rosa", "pink", "fucsia", "magenta"],
+    "naranja": ["naranja", "anaranjado", "anaranjada", "orange", "salmon"],
+    "amarillo": ["amarillo", "amarilla", "yellow", "mostaza"],
+    "verde": ["verde", "green", "oliva", "militar", "menta"],
+    "azul": ["azul", "blue", "celeste", "turquesa", "navy", "marino", "cian"],
+    "morado": ["morado", "morada", "purpura", "violeta", "lila", "purple"],
+    "marron": ["marron", "cafe", "brown", "chocolate", "caramelo"],
+    "beige": ["beige", "arena", "caqui", "khaki", "nude"],
+    "multicolor": ["multicolor", "estampado", "estampada", "rayas", "cuadros", "varios"],
+    "transparente": ["transparente", "traslucido", "clear"],
+}
+
+_PALABRA_A_COLOR = {palabra: id_color for id_color, palabras in SINONIMOS.items() for palabra in palabras}
+
+
+# ========================
+# NORMALIZACIÓN
+# ========================
+
+
+def _palabras(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"[a-z]+", texto.lower())
+
+
+def normalizar_color(texto):
+    """
+    Traduce un color escrito libremente a un id de la PALETA.
+
+    Se toma la primera palabra reconocida ("negro mate" -> negro,
+    "azul con blanco" -> azul). Si se reconocen colores distintos unidos por
+    "y" o "," se considera multicolor.
+
+    Returns:
+        str: Id de la paleta o None si no se reconoce ningún color
+    """
+    if not texto:
+        return None
+    encontrados = []
+    for palabra in _palabras(texto):
+        id_color = _PALABRA_A_COLOR.get(palabra)
+        if id_color and id_color not in encontrados:
+            encontrados.append(id_color)
+    if not encontrados:
+        return None
+    if len(encontrados) > 1 and re.search(r"\by\b|,|/", str(texto).lower()):
+        return "multicolor"
+    return encontrados[0]
+
+
+def nombre_color(id_color):
+    """Nombre visible de un id de la paleta (o el propio id si no existe)."""
+    return PALETA.get(id_color, (id_color,))[0]
+
+
+def color_dominante_imagen(ruta):
+    """
+    Color de la PALETA más cercano al color promedio del centro de la imagen.
+
+    Se usa el recuadro central porque el objeto suele estar en el medio de la
+    foto y el fondo sesga el promedio. Requiere Pillow; sin él devuelve None.
+    """
+    try:
+        from PIL import Image
+    except Exception:
+        return None
+
+    try:
+        with Image.open(ruta) as imagen:
+            imagen.draft("RGB", (64, 64))
+            imagen = imagen.convert("RGB").resize((32, 32))
+            centro = imagen.crop((8, 8, 24, 24))
+            pixeles = list(centro.getdata())
+    except Exception as e:
+        print(f"Error leyendo color de la imagen: {e}")
+        return None
+
+    total = len(pixeles)
+    promedio = tuple(sum(p[i] for p in pixeles) / total for i in range(3))
+
+    mejor, distancia_mejor = None, None
+    for id_color, (_, rgb) in PALETA.items():
+        if rgb is None:
+            continue
+        distancia = sum((a - b) ** 2 for a, b in zip(promedio, rgb))
+        if distancia_mejor is None or distancia < distancia_mejor:
+            mejor, distancia_mejor = id_color, distancia
+    return mejor
@@ -0,0 +1,344 @@
+"""
+Constructor de consultas de reportes.
+
+Búsqueda, mis reportes, panel de administración, PDFs, actividad y detalle
+listan lo mismo: la tabla Reportes (perdidos y encontrados, particionada por
+TIPO) unida a Objetos, y a Categorias o Usuarios cuando hace falta. Esta
+clase arma esa consulta en un solo lugar:
+
+- filtros encadenables que ignoran valores vacíos,
+- proyección elegida por nombre de columna, con alias opcional,
+- orden con paginación por llave; ordenado por fecha, PostgreSQL mezcla el
+  índice idx_reportes_fecha de cada partición y corta en el LIMIT,
+- joins a Categorias y Usuarios solo si alguna columna o filtro los usa.
+
+Los valores siempre van como parámetros y el texto SQL solo depende de qué
+filtros se usaron, así que la misma forma de consulta genera siempre el
+mismo SQL.
+
+Ejemplo:
+    consulta = ConsultaReportes().del_usuario(id_usuario).solo_tipo("perdido")
+    reportes = consulta.modelos(cursor)
+"""
+
+import re
+
+from .colores import PALETA, normalizar_color
+from .modelos import Reporte
+from .serializacion import filas_como_dicts
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+TIPOS = ("perdido", "encontrado")
+
+# nombre -> expresión SQL
+COLUMNAS = {
+    "tipo": 'r."TIPO"',
+    "id_reporte": 'r."ID_REPORTE"',
+    "ID_OBJETO": 'o."ID_OBJETO"',
+    "NOMBRE": 'o."NOMBRE"',
+    "COLOR": 'o."COLOR"',
+    "ID_COLOR": 'o."ID_COLOR"',
+    "IMAGEN": 'o."IMAGEN"',
+    "LUGAR": 'o."LUGAR_ENCONTRADO"',
+    "categoria": 'o."ID_CATEGORIA"',
+    "nombre_categoria": 'c."NOMBRE"',
+    "FECHA": 'r."FECHA"',
+    "OBSERVACIONES": 'r."OBSERVACIONES"',
+    "STATUS": 'r."STATUS"',
+    "ID_USUARIO": 'r."ID_USUARIO"',
+    "NOMBRE_USUARIO": 'u."NOMBRE"',
+}
+
+# mismo orden que los __slots__ de modelos.Reporte
+COLUMNAS_REPORTE = (
+    "tipo", "id_reporte", "ID_OBJETO", "NOMBRE", "COLOR", "IMAGEN",
+    "FECHA", "OBSERVACIONES", "categoria", "nombre_categoria",
+)
+
+# tarjetas del motor de búsqueda
+COLUMNAS_BUSQUEDA = (
+    "NOMBRE", "ID_OBJETO", "COLOR", "ID_COLOR", "IMAGEN", "categoria", "nombre_categoria",
+    "LUGAR", "FECHA", "STATUS", "tipo", "id_reporte",
+)
+
+# panel de administración
+COLUMNAS_ADMIN = COLUMNAS_REPORTE + ("STATUS",)
+
+# página de detalle (la categoría se muestra por nombre)
+COLUMNAS_DETALLE = (
+    "NOMBRE", "ID_OBJETO", "COLOR", "IMAGEN", "LUGAR", ("categoria", "nombre_categoria"),
+    "FECHA", "OBSERVACIONES", "ID_USUARIO", "NOMBRE_USUARIO", "tipo",
+)
+
+# orden -> (columna, dirección, tipo SQL de la llave)
+ORDENES = {
+    "fecha_desc": ("FECHA", "DESC", "timestamp"),
+    "fecha_asc": ("FECHA", "ASC", "timestamp"),
+    "nombre_asc": ("NOMBRE", "ASC", "text"),
+    "nombre_desc": ("NOMBRE", "DESC", "text"),
+}
+
+# filtros que el motor de búsqueda cuenta como facetas
+DIMENSIONES_FACETA = ("categoria", "tipo", "status", "mes", "color")
+
+# alias c. y u. sueltos (no el final de public.)
+_USA_CATEGORIAS = re.compile(r'\bc\."')
+_USA_USUARIOS = re.compile(r'\bu\."')
+
+
+class ConsultaReportes:
+    """
+    Reportes perdidos y encontrados con filtros encadenables.
+
+    Args:
+        columnas: Nombres de COLUMNAS o pares (alias, nombre) a devolver
+    """
+
+    def __init__(self, columnas=COLUMNAS_REPORTE):
+        self.proyeccion = [c if isinstance(c, tuple) else (c, c) for c in columnas]
+        self.orden = "fecha_desc"
+        self.llave = None
+        self.limite = None
+        # (dimensión, sql, params)
+        self._condiciones = []
+
+    def _agregar(self, dimension, sql, params=()):
+        self._condiciones.append((dimension, sql, list(params)))
+        return self
+
+    # ========================
+    # FILTROS
+    # ========================
+
+    def solo_tipo(self, tipo):
+        """Limita a "perdido" o "encontrado"; vacío deja ambos."""
+        if tipo:
+            if tipo not in TIPOS:
+                raise ValueError(f"Tipo de reporte no válido: {tipo}")
+            # con el valor literal el planificador descarta la otra partición
+            self._agregar("tipo", f"""r."TIPO" = '{tipo}'""")
+        return self
+
+    def del_usuario(self, id_usuario):
+        """Reportes creados por un usuario."""
+        if id_usuario:
+            self._agregar("usuario", 'r."ID_USUARIO" = %s', [id_usuario])
+        return self
+
+    def publicos(self):
+        """Oculta reportes marcados como falsos y los de usuarios eliminados."""
+        self._agregar("publico", """r."STATUS" <> 'falso'""")
+        return self._agregar(
+            "publico",
+            'NOT EXISTS (SELECT 1 FROM public."Usuarios" ue '
+            'WHERE ue."ID_USUARIO" = r."ID_USUARIO" AND ue."ELIMINADO_EN" IS NOT NULL)',
+        )
+
+    def texto(self, q):
+        """Texto en nombre, color o categoría; "negra" o "black" también buscan el color."""
+        if not q:
+            return self
+        patron = f"%{q}%"
+        sql = 'o."NOMBRE" ILIKE %s OR o."COLOR" ILIKE %s OR c."NOMBRE" ILIKE %s'
+        params = [patron] * 3
+        id_color = normalizar_color(q)
+        if id_color:
+            sql += ' OR o."ID_COLOR" = %s'
+            params.append(id_color)
+        return self._agregar("texto", f"({sql})", params)
+
+    def categoria(self, valor):
+        """ID de categoría exacto o parte de su nombre."""
+        if valor:
+            self._agregar(
+                "categoria",
+                '(o."ID_CATEGORIA" = %s OR c."NOMBRE" ILIKE %s)',
+                [valor, f"%{valor}%"],
+            )
+        return self
+
+    def status(self, valor):
+        if valor:
+            self._agregar("status", 'r."STATUS" = %s', [valor])
+        return self
+
+    def rango_fechas(self, inicio=None, fin=None):
+        """Rango YYYY-MM-DD con ambos días completos aunque FECHA tenga hora."""
+        if inicio:
+            self._agregar("mes", 'r."FECHA" >= %s::DATE', [inicio])
+        if fin:
+            self._agregar("mes", 'r."FECHA" < %s::DATE + 1', [fin])
+        return self
+
+    def color(self, valor):
+        """ID de la paleta, nombre reconocible por normalizar_color o texto libre."""
+        if not valor:
+            return self
+        id_color = valor if valor in PALETA else normalizar_color(valor)
+        if id_color:
+            return self._agregar("color", 'o."ID_COLOR" = %s', [id_color])
+        return self._agregar("color", 'o."COLOR" ILIKE %s', [f"%{valor}%"])
+
+    def objeto_o_reporte(self, identificador):
+        """Reportes de un objeto, o el reporte con ese ID."""
+        return self._agregar(
+            "objeto",
+            '(o."ID_OBJETO" = %s OR r."ID_REPORTE" = %s)',
+            [identificador, identificador],
+        )
+
+    # ========================
+    # ORDEN Y PÁGINAS
+    # ========================
+
+    def ordenar(self, orden, llave=None):
+        """
+        Args:
+            orden (str): Clave de ORDENES
+            llave (list): [valor, id_reporte, tipo] de la última fila vista
+        """
+        if orden not in ORDENES:
+            raise ValueError(f"Orden no válido: {orden}")
+        self.orden = orden
+        self.llave = llave
+        return self
+
+    def limitar(self, limite):
+        self.limite = int(limite) if limite else None
+        return self
+
+    def llave_de(self, fila):
+        """Llave de paginación de una fila devuelta por dicts()."""
+        columna = ORDENES[self.orden][0]
+        return [fila[self._alias(columna)], fila[self._alias("id_reporte")], fila[self._alias("tipo")]]
+
+    # ========================
+    # SQL
+    # ========================
+
+    def _alias(self, nombre):
+        for alias, columna in self.proyeccion:
+            if columna == nombre:
+                return alias
+        return nombre
+
+    def _columnas_finales(self):
+        """Proyección más las columnas que necesita llave_de()."""
+        proyeccion = list(self.proyeccion)
+        for necesaria in (ORDENES[self.orden][0], "id_reporte", "tipo"):
+            if not any(columna == necesaria for _, columna in proyeccion):
+                proyeccion.append((necesaria, necesaria))
+        return proyeccion
+
+    def condicion(self, excluir=()):
+        """
+        WHERE de la consulta sin las dimensiones indicadas.
+
+        Returns:
+            tuple: (sql, params)
+        """
+        partes = ["TRUE"]
+        params = []
+        for dimension, sql, valores in self._condiciones:
+            if dimension in excluir:
+                continue
+            partes.append(sql)
+            params.extend(valores)
+        return " AND ".join(partes), params
+
+    def filtros_faceta(self):
+        """Filtros activos de cada dimensión de faceta: dimensión -> (sql, params)."""
+        filtros = {}
+        for dimension in DIMENSIONES_FACETA:
+            partes = []
+            params = []
+            for dim, sql, valores in self._condiciones:
+                if dim == dimension:
+                    partes.append(sql)
+                    params.extend(valores)
+            if partes:
+                filtros[dimension] = (" AND ".join(partes), params)
+        return filtros
+
+    def sql(self, paginado=True):
+        """
+        Arma la consulta.
+
+        Args:
+            paginado (bool): False omite llave, orden y límite (para contar)
+
+        Returns:
+            tuple: (sql, params)
+        """
+        columna, direccion, tipo_sql = ORDENES[self.orden]
+        comparador = "<" if direccion == "DESC" else ">"
+        expresion_orden = COLUMNAS[columna]
+        proyeccion = self._columnas_finales()
+
+        where, params = self.condicion()
+        if paginado and self.llave:
+            valor, id_llave, tipo_llave = self.llave
+            if valor is None:
+                # la página anterior terminó dentro de las filas sin valor (van al final)
+                where += (
+                    f' AND ({expresion_orden} IS NULL'
+                    f' AND (r."ID_REPORTE", r."TIPO") {comparador} (%s, %s))'
+                )
+                params.extend([id_llave, tipo_llave])
+            else:
+                where += (
+                    f' AND ({expresion_orden} IS NULL OR ({expresion_orden}, r."ID_REPORTE", r."TIPO") '
+                    f'{comparador} (%s::{tipo_sql}, %s, %s))'
+                )
+                params.extend([valor, id_llave, tipo_llave])
+                if columna == "FECHA":
+                    # cota simple sobre FECHA para que PostgreSQL descarte
+                    # particiones mensuales (la comparación de filas no lo permite)
+                    where += f' AND r."FECHA" {comparador}= %s::timestamp'
+                    params.append(valor)
+
+        select = ", ".join(f'{COLUMNAS[c]} AS "{alias}"' for alias, c in proyeccion)
+        query = f"""
+            SELECT {select}
+            FROM public."Reportes" r
+            JOIN public."Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
+        """
+        texto = select + where
+        if _USA_CATEGORIAS.search(texto):
+            query += ' LEFT JOIN public."Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"'
+        if _USA_USUARIOS.search(texto):
+            query += ' LEFT JOIN public."Usuarios" u ON r."ID_USUARIO" = u."ID_USUARIO"'
+        query += f" WHERE {where}"
+
+        if paginado:
+            query += (
+                f' ORDER BY {expresion_orden} {direccion} NULLS LAST,'
+                f' r."ID_REPORTE" {direccion}, r."TIPO" {direccion}'
+            )
+            if self.limite:
+                query += " LIMIT %s"
+                params.append(self.limite)
+        return query, params
+
+    # ========================
+    # EJECUCIÓN
+    # ========================
+
+    def ejecutar(self, cursor):
+        """Ejecuta la consulta en un cursor de tuplas y devuelve fetchall()."""
+        cursor.execute(*self.sql())
+        return cursor.fetchall()
+
+    def dicts(self, cursor):
+        """Filas como diccionarios con los alias de la proyección como claves."""
+        cursor.execute(*self.sql())
+        return filas_como_dicts(cursor)
+
+    def modelos(self, cursor):
+        """Filas como modelos.Reporte (requiere la proyección COLUMNAS_REPORTE)."""
+        if [c for _, c in self._columnas_finales()] != list(COLUMNAS_REPORTE):
+            raise ValueError("modelos() requiere la proyección COLUMNAS_REPORTE")
+        return Reporte.desde_filas(self.ejecutar(cursor))
@@ -0,0 +1,197 @@
+"""
+Hash de contraseñas y respuestas de seguridad.
+
+El algoritmo se elige con PASSWORD_HASH:
+
+- "argon2id" (requiere argon2-cffi; si no está se usa scrypt),
+- "scrypt" (hashlib, formato de werkzeug "scrypt:n:r:p$sal$hash"),
+- "pbkdf2" (formato de werkzeug, para equipos sin memoria para scrypt).
+
+Los parámetros salen de la configuración (HASH_SCRYPT_N, HASH_ARGON2_*)
+para poder ajustarlos a la máquina. verificar() acepta cualquier hash
+anterior de werkzeug o argon2, y necesita_rehash() dice si un hash se
+hizo con otro algoritmo o con parámetros más débiles que los actuales: el
+login lo rehace con la contraseña en claro que acaba de comprobar. Un
+hash más fuerte que la configuración se deja como está.
+
+Todo el cálculo corre en un ThreadPoolExecutor acotado (HASH_HILOS
+hilos, HASH_COLA en espera). scrypt, pbkdf2 y argon2 sueltan el GIL, así
+que los hashes usan como mucho HASH_HILOS núcleos y el resto de las
+peticiones sigue avanzando; si la cola está llena se lanza
+HashSaturado y la ruta responde 503 en vez de acumular hilos.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+ALGORITMO_DEFECTO = "scrypt"
+SCRYPT_N_DEFECTO = 2**15  # 32 MiB por hash con r=8, el de werkzeug
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERACIONES_DEFECTO = 600_000
+ARGON2_TIEMPO_DEFECTO = 2
+ARGON2_MEMORIA_DEFECTO = 19 * 1024  # KiB
+ARGON2_PARALELISMO_DEFECTO = 1
+ESPERA_COLA = 5  # segundos que una petición espera un lugar en la cola
+
+
+class HashSaturado(Exception):
+    """La cola de hashes está llena; conviene responder 503."""
+
+
+class _Hasher:
+    """Algoritmo configurado y ejecutor donde corre."""
+
+    def __init__(self):
+        self.configurar()
+
+    def configurar(
+        self,
+        algoritmo=ALGORITMO_DEFECTO,
+        scrypt_n=SCRYPT_N_DEFECTO,
+        pbkdf2_iteraciones=PBKDF2_ITERACIONES_DEFECTO,
+        argon2_tiempo=ARGON2_TIEMPO_DEFECTO,
+        argon2_memoria=ARGON2_MEMORIA_DEFECTO,
+        argon2_paralelismo=ARGON2_PARALELISMO_DEFECTO,
+        hilos=None,
+        cola=None,
+    ):
+        self._argon2 = None
+        if algoritmo == "argon2id":
+            try:
+                from argon2 import PasswordHasher  # dependencia opcional
+
+                self._argon2 = PasswordHasher(
+                    time_cost=argon2_tiempo, memory_cost=argon2_memoria, parallelism=argon2_paralelismo
+                )
+            except ImportError as e:
+                print(f"⚠ argon2-cffi no disponible, se usa scrypt: {e}")
+                algoritmo = "scrypt"
+
+        self.algoritmo = algoritmo
+        if algoritmo == "pbkdf2":
+            self.metodo = f"pbkdf2:sha256:{pbkdf2_iteraciones}"
+        else:
+            self.metodo = f"scrypt:{scrypt_n}:{SCRYPT_R}:{SCRYPT_P}"
+
+        hilos = hilos or os.cpu_count() or 2
+        cola = hilos * 4 if cola is None else cola
+        anterior = getattr(self, "_ejecutor", None)
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="hash")
+        if anterior:
+            anterior.shutdown(wait=False)
+        self._cupos = threading.BoundedSemaphore(hilos + cola)
+
+    def _ejecutar(self, funcion, *args):
+        if not self._cupos.acquire(timeout=ESPERA_COLA):
+            raise HashSaturado("demasiados hashes en espera")
+        try:
+            return self._ejecutor.submit(funcion, *args).result()
+        finally:
+            self._cupos.release()
+
+    # --- cálculo, dentro del ejecutor ---
+
+    def _hashear(self, texto):
+        if self._argon2:
+            return self._argon2.hash(texto)
+        return generate_password_hash(texto, method=self.metodo)
+
+    def _verificar(self, hash_guardado, texto):
+        if hash_guardado.startswith("$argon2"):
+            try:
+                from argon2 import PasswordHasher
+                from argon2.exceptions import InvalidHashError, VerificationError
+
+                return (self._argon2 or PasswordHasher()).verify(hash_guardado, texto)
+            except (ImportError, InvalidHashError, VerificationError):
+                return False
+        return check_password_hash(hash_guardado, texto)
+
+    # --- API ---
+
+    def hashear(self, texto):
+        return self._ejecutar(self._hashear, texto)
+
+    def verificar(self, hash_guardado, texto):
+        if not hash_guardado or texto is None:
+            return False
+        return self._ejecutar(self._verificar, hash_guardado, texto)
+
+    def necesita_rehash(self, hash_guardado):
+        if self._argon2:
+            if not hash_guardado.startswith("$argon2id$"):
+                return True
+            from argon2 import extract_parameters
+            from argon2.exceptions import InvalidHashError
+
+            try:
+                guardado = extract_parameters(hash_guardado)
+            except InvalidHashError:
+                return True
+            actual = self._argon2
+            return (
+                guardado.time_cost < actual.time_cost
+                or guardado.memory_cost < actual.memory_cost
+                or guardado.parallelism < actual.parallelism
+            )
+        return _mas_debil(hash_guardado.split("$", 1)[0], self.metodo)
+
+
+def _mas_debil(metodo_guardado, metodo):
+    """
+    True si el método de werkzeug guardado es de otro algoritmo o tiene
+    menos trabajo que `metodo` ("scrypt:n:r:p" o "pbkdf2:hash:iteraciones").
+    """
+    guardado = metodo_guardado.split(":")
+    actual = metodo.split(":")
+    if guardado[0] != actual[0] or len(guardado) != len(actual):
+        return True
+    try:
+        if actual[0] == "scrypt":
+            return any(int(g) < int(a) for g, a in zip(guardado[1:], actual[1:]))
+        if actual[0] == "pbkdf2":
+            return guardado[1] != actual[1] or int(guardado[2]) < int(actual[2])
+    except ValueError:
+        return True
+    return metodo_guardado != metodo
+
+
+_hasher = _Hasher()
+
+
+def configurar_contrasenas(app):
+    """Aplica PASSWORD_HASH y los parámetros HASH_* de la configuración."""
+    c = app.config
+    _hasher.configurar(
+        algoritmo=c.get("PASSWORD_HASH", ALGORITMO_DEFECTO),
+        scrypt_n=c.get("HASH_SCRYPT_N", SCRYPT_N_DEFECTO),
+        pbkdf2_iteraciones=c.get("HASH_PBKDF2_ITERACIONES", PBKDF2_ITERACIONES_DEFECTO),
+        argon2_tiempo=c.get("HASH_ARGON2_TIEMPO", ARGON2_TIEMPO_DEFECTO),
+        argon2_memoria=c.get("HASH_ARGON2_MEMORIA", ARGON2_MEMORIA_DEFECTO),
+        argon2_paralelismo=c.get("HASH_ARGON2_PARALELISMO", ARGON2_PARALELISMO_DEFECTO),
+        hilos=c.get("HASH_HILOS"),
+        cola=c.get("HASH_COLA"),
+    )
+
+
+def hashear(texto):
+    """Hash con el algoritmo configurado. Puede lanzar HashSaturado."""
+    return _hasher.hashear(texto)
+
+
+def verificar(hash_guardado, texto):
+    """True si `texto` corresponde al hash. Puede lanzar HashSaturado."""
+    return _hasher.verificar(hash_guardado, texto)
+
+
+def necesita_rehash(hash_guardado):
+    """True si el hash se hizo con otro algoritmo o con parámetros más débiles."""
+    return _hasher.necesita_rehash(hash_guardado)
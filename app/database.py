@@ -16,6 +16,11 @@ import time
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
+from .colores import normalizar_color
+from .feed import reconstruir_feed
+from .metricas import ConexionMedida
+from .particiones import asegurar_particiones
+
 load_dotenv()
 
 
@@ -134,12 +139,15 @@ def conectar_db():
 
     for intento in range(intentos):
         try:
+            # ConexionMedida: tiempo y filas de cada consulta (ver metricas.py)
             conexion = psycopg2.connect(
                 options="-c client_encoding=UTF8",
+                connection_factory=ConexionMedida,
                 **DB_CONFIG
             )
 
-            print("✓ Conectado a PostgreSQL")
+            if intento:
+                print("✓ Conectado a PostgreSQL")
             return conexion
 
         except psycopg2.Error as e:
@@ -235,8 +243,6 @@ TABLAS = {
             "PREGUNTA_2" TEXT NOT NULL,
             "RESPUESTA_1" TEXT NOT NULL,
             "RESPUESTA_2" TEXT NOT NULL,
-            "INTENTOS_RECUPERACION" INTEGER DEFAULT 0,
-            "BLOQUEADO_HASTA" TIMESTAMP,
             "TEMA_PREFERENCIA" TEXT DEFAULT 'claro',
             "ID_ROL" INTEGER NOT NULL,
             "TELEFONO" TEXT, 
@@ -257,20 +263,6 @@ TABLAS = {
             FOREIGN KEY ("ID_ESTADO") REFERENCES public."Estados" ("ID_ESTADO")
         );
     """,
-    "Reportes_encontrados": """
-        CREATE TABLE IF NOT EXISTS public."Reportes_encontrados"(
-            "ID_REPORTE_ENC" TEXT PRIMARY KEY,
-            "FECHA" DATE,
-            "OBSERVACIONES" TEXT,
-            "ID_OBJETO" TEXT NOT NULL,
-            "ID_USUARIO" TEXT NOT NULL,
-            "FICHA" INTEGER,
-            "ID_CATEGORIA" TEXT NOT NULL,
-            "FECHA" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            "STATUS" TEXT DEFAULT 'pendiente' CHECK ("STATUS" IN ('pendiente', 'encontrado', 'falso')),
-            FOREIGN KEY ("ID_OBJETO") REFERENCES public."Objetos" ("ID_OBJETO")
-        );
-    """,
     "Perfiles": """
         CREATE TABLE IF NOT EXISTS public."Perfiles"(
             "ID_PERFIL" SERIAL PRIMARY KEY,
@@ -284,18 +276,51 @@ TABLAS = {
             FOREIGN KEY ("ID_USUARIO") REFERENCES public."Usuarios" ("ID_USUARIO") ON DELETE CASCADE
         );
     """,
-    "Reportes_perdidos": """
-        CREATE TABLE IF NOT EXISTS public."Reportes_perdidos"(
-            "ID_REPORTE" TEXT PRIMARY KEY,
-            "FECHA" DATE,
+    # Reportes perdidos y encontrados en una sola tabla, con una partición por
+    # tipo y dentro de cada una una partición por mes de FECHA (las crea
+    # particiones.py). Reportes_perdidos y Reportes_encontrados quedan como
+    # vistas (VISTAS_REPORTES).
+    "Reportes": """
+        CREATE TABLE IF NOT EXISTS public."Reportes"(
+            "TIPO" TEXT NOT NULL CHECK ("TIPO" IN ('perdido', 'encontrado')),
+            "ID_REPORTE" TEXT NOT NULL,
+            "FECHA" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
             "OBSERVACIONES" TEXT,
             "ID_OBJETO" TEXT NOT NULL,
             "ID_USUARIO" TEXT NOT NULL,
             "FICHA" INTEGER,
             "ID_CATEGORIA" TEXT NOT NULL,
-            "FECHA" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             "STATUS" TEXT DEFAULT 'pendiente' CHECK ("STATUS" IN ('pendiente', 'encontrado', 'falso')),
+            PRIMARY KEY ("TIPO", "ID_REPORTE", "FECHA"),
             FOREIGN KEY ("ID_OBJETO") REFERENCES public."Objetos" ("ID_OBJETO")
+        ) PARTITION BY LIST ("TIPO");
+
+        CREATE TABLE IF NOT EXISTS public."Reportes_tipo_perdido"
+            PARTITION OF public."Reportes" FOR VALUES IN ('perdido')
+            PARTITION BY RANGE ("FECHA");
+        CREATE TABLE IF NOT EXISTS public."Reportes_tipo_encontrado"
+            PARTITION OF public."Reportes" FOR VALUES IN ('encontrado')
+            PARTITION BY RANGE ("FECHA");
+
+        -- las vistas de compatibilidad insertan directo en la partición
+        ALTER TABLE public."Reportes_tipo_perdido" ALTER COLUMN "TIPO" SET DEFAULT 'perdido';
+        ALTER TABLE public."Reportes_tipo_encontrado" ALTER COLUMN "TIPO" SET DEFAULT 'encontrado';
+    """,
+
+    # Reportes cerrados y viejos que archivar_reportes() saca de Reportes
+    "Reportes_archivados": """
+        CREATE TABLE IF NOT EXISTS public."Reportes_archivados"(
+            "TIPO" TEXT NOT NULL,
+            "ID_REPORTE" TEXT NOT NULL,
+            "FECHA" TIMESTAMP NOT NULL,
+            "OBSERVACIONES" TEXT,
+            "ID_OBJETO" TEXT,
+            "ID_USUARIO" TEXT,
+            "FICHA" INTEGER,
+            "ID_CATEGORIA" TEXT,
+            "STATUS" TEXT,
+            "ARCHIVADO_EN" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY ("TIPO", "ID_REPORTE", "FECHA")
         );
     """,
 
@@ -375,25 +400,282 @@ CREATE TABLE IF NOT EXISTS public."Metodos_pago"
                 "RUTA" TEXT NOT NULL,
                 "NOMBRE_ORIGINAL" TEXT,
                 "TIPO" TEXT,
+                "HASH" TEXT,
+                "TAMANO" BIGINT,
                 FOREIGN KEY ("ID_MENSAJE") REFERENCES public."Mensajes" ("ID_MENSAJE") ON DELETE CASCADE
             );
         """,
 
+        # Un registro por contenido de adjunto (ver adjuntos.py); REFERENCIAS lo
+        # llevan los disparadores de REFERENCIAS_ADJUNTOS
+        "Archivos_adjuntos": """
+            CREATE TABLE IF NOT EXISTS public."Archivos_adjuntos"(
+                "HASH" TEXT PRIMARY KEY,
+                "TAMANO" BIGINT NOT NULL,
+                "TIPO" TEXT,
+                "REFERENCIAS" INTEGER NOT NULL DEFAULT 0,
+                "CREADO" TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """,
+
+        # Subidas por partes (ver subidas.py); el avance es el tamaño del .part
+        "Subidas": """
+            CREATE TABLE IF NOT EXISTS public."Subidas"(
+                "ID_SUBIDA" TEXT PRIMARY KEY,
+                "ID_USUARIO" TEXT NOT NULL,
+                "NOMBRE" TEXT NOT NULL,
+                "TAMANO" BIGINT NOT NULL,
+                "TIPO" TEXT,
+                "COMPLETA" BOOLEAN NOT NULL DEFAULT FALSE,
+                "CREADO" TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """,
+
+        # Particionada por mes de FECHA (ver particiones.py)
         "Notificaciones": """
             CREATE TABLE IF NOT EXISTS public."Notificaciones"(
-                "ID_NOTIF" SERIAL PRIMARY KEY,
+                "ID_NOTIF" SERIAL,
                 "ID_USUARIO" TEXT NOT NULL,
                 "TIPO" TEXT NOT NULL,
                 "MENSAJE" TEXT,
                 "LEIDO" BOOLEAN DEFAULT FALSE,
-                "FECHA" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                "FECHA" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY ("ID_NOTIF", "FECHA"),
                 FOREIGN KEY ("ID_USUARIO") REFERENCES public."Usuarios" ("ID_USUARIO") ON DELETE CASCADE
+            ) PARTITION BY RANGE ("FECHA");
+        """,
+
+        # Pares perdido/encontrado propuestos por el motor de coincidencias.
+        # Sin claves foráneas: la llave de Reportes incluye FECHA y el borrado
+        # en cascada lo hace BORRADO_COINCIDENCIAS.
+        "Coincidencias": """
+            CREATE TABLE IF NOT EXISTS public."Coincidencias"(
+                "ID_REPORTE_PERDIDO" TEXT NOT NULL,
+                "ID_REPORTE_ENCONTRADO" TEXT NOT NULL,
+                "PUNTAJE" REAL NOT NULL,
+                "DETALLE" JSONB,
+                "ESTADO" TEXT DEFAULT 'sugerida' CHECK ("ESTADO" IN ('sugerida', 'confirmada', 'descartada')),
+                "FECHA" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY ("ID_REPORTE_PERDIDO", "ID_REPORTE_ENCONTRADO")
+            );
+        """,
+
+        # Huellas perceptuales (dHash) de las imágenes de Objetos
+        "Huellas_imagenes": """
+            CREATE TABLE IF NOT EXISTS public."Huellas_imagenes"(
+                "ID_OBJETO" TEXT PRIMARY KEY,
+                "HASH" BIGINT,
+                "BANDAS" INTEGER[],
+                "FECHA" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY ("ID_OBJETO") REFERENCES public."Objetos" ("ID_OBJETO") ON DELETE CASCADE
+            );
+        """,
+
+        # Trabajos de eliminación de usuarios (sin FK: sobreviven al borrado del usuario)
+        "Eliminaciones_usuarios": """
+            CREATE TABLE IF NOT EXISTS public."Eliminaciones_usuarios"(
+                "ID_USUARIO" TEXT PRIMARY KEY,
+                "SOLICITADO_POR" TEXT,
+                "FASE" TEXT DEFAULT 'reportes' CHECK ("FASE" IN ('reportes', 'mensajes', 'usuario', 'completado')),
+                "REPORTES_BORRADOS" INTEGER DEFAULT 0,
+                "OBJETOS_BORRADOS" INTEGER DEFAULT 0,
+                "MENSAJES_BORRADOS" INTEGER DEFAULT 0,
+                "ERROR" TEXT,
+                "INTENTOS" INTEGER NOT NULL DEFAULT 0,
+                "CREADO" TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                "ACTUALIZADO" TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """,
+
+        "Eliminaciones_archivos": """
+            CREATE TABLE IF NOT EXISTS public."Eliminaciones_archivos"(
+                "RUTA" TEXT PRIMARY KEY,
+                "CREADO" TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """,
+
+        # Tarjetas ya armadas de los reportes más nuevos (ver feed.py)
+        "Feed_reportes": """
+            CREATE TABLE IF NOT EXISTS public."Feed_reportes"(
+                "TIPO" TEXT NOT NULL CHECK ("TIPO" IN ('perdido', 'encontrado')),
+                "ID_REPORTE" TEXT NOT NULL,
+                "ID_USUARIO" TEXT,
+                "FECHA" TIMESTAMP,
+                "TARJETA" JSONB NOT NULL,
+                PRIMARY KEY ("TIPO", "ID_REPORTE")
+            );
+        """,
+
+        # Fallos de login y recuperación (ver intentos.py). UNLOGGED: no pasa
+        # por el WAL y si se pierde tras una caída solo se olvidan contadores.
+        "Intentos": """
+            CREATE UNLOGGED TABLE IF NOT EXISTS public."Intentos"(
+                "CLAVE" TEXT PRIMARY KEY,
+                "INDICE" BIGINT NOT NULL,
+                "ACTUAL" INTEGER NOT NULL DEFAULT 0,
+                "ANTERIOR" INTEGER NOT NULL DEFAULT 0,
+                "BLOQUEADO_HASTA" DOUBLE PRECISION NOT NULL DEFAULT 0,
+                "VENCE" DOUBLE PRECISION NOT NULL
+            );
+        """,
+
+        # Sesiones del servidor (ver sesiones.py); la cookie solo lleva el ID.
+        # Sin FK a Usuarios: revocar_sesiones() las borra al cambiar rol o eliminar.
+        "Sesiones": """
+            CREATE UNLOGGED TABLE IF NOT EXISTS public."Sesiones"(
+                "ID_SESION" TEXT PRIMARY KEY,
+                "ID_USUARIO" TEXT,
+                "DATOS" TEXT NOT NULL,
+                "VENCE" DOUBLE PRECISION NOT NULL
+            );
+        """,
+
+        # Versiones compartidas por todos los procesos cuando no hay Redis
+        # (ver permisos.py)
+        "Versiones": """
+            CREATE TABLE IF NOT EXISTS public."Versiones"(
+                "ESPACIO" TEXT PRIMARY KEY,
+                "VERSION" BIGINT NOT NULL DEFAULT 0
             );
         """,
     
 }
 
 
+# Nombres anteriores de las tablas de reportes, ahora vistas sobre cada
+# partición de Reportes. Son actualizables: los INSERT, UPDATE y DELETE que
+# todavía usan estos nombres llegan a la partición correcta.
+VISTAS_REPORTES = """
+    CREATE OR REPLACE VIEW public."Reportes_perdidos" AS
+    SELECT "ID_REPORTE", "FECHA", "OBSERVACIONES", "ID_OBJETO", "ID_USUARIO",
+           "FICHA", "ID_CATEGORIA", "STATUS"
+    FROM public."Reportes_tipo_perdido";
+
+    CREATE OR REPLACE VIEW public."Reportes_encontrados" AS
+    SELECT "ID_REPORTE" AS "ID_REPORTE_ENC", "FECHA", "OBSERVACIONES", "ID_OBJETO",
+           "ID_USUARIO", "FICHA", "ID_CATEGORIA", "STATUS"
+    FROM public."Reportes_tipo_encontrado";
+"""
+
+# IDs de objetos y reportes. Con FECHA en la llave de Reportes, ID_REPORTE
+# ya no tiene restricción única; la secuencia lo hace único sin consultar.
+# Empieza en 1000000 para no chocar con los IDs aleatorios de 6 dígitos.
+SECUENCIA_IDS = """
+    CREATE SEQUENCE IF NOT EXISTS public."Ids_reportes" START 1000000;
+"""
+
+# Hace el ON DELETE CASCADE de Coincidencias hacia Reportes. No borra nada
+# cuando la fila solo cambia de partición o pasa a Reportes_archivados
+# (particiones.py marca esos casos con orio.moviendo_reportes).
+BORRADO_COINCIDENCIAS = """
+    CREATE OR REPLACE FUNCTION public.borrar_coincidencias_reporte() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('orio.moviendo_reportes', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF OLD."TIPO" = 'perdido' THEN
+            DELETE FROM public."Coincidencias" WHERE "ID_REPORTE_PERDIDO" = OLD."ID_REPORTE";
+        ELSE
+            DELETE FROM public."Coincidencias" WHERE "ID_REPORTE_ENCONTRADO" = OLD."ID_REPORTE";
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS "trg_reportes_coincidencias" ON public."Reportes";
+    CREATE TRIGGER "trg_reportes_coincidencias"
+    AFTER DELETE ON public."Reportes"
+    FOR EACH ROW EXECUTE FUNCTION public.borrar_coincidencias_reporte();
+"""
+
+# Registra un fallo con la misma ventana deslizante que IntentosMemoria en
+# una sola llamada. Una vez de cada cien purga las claves vencidas.
+REGISTRAR_INTENTO = """
+    CREATE OR REPLACE FUNCTION public.registrar_intento(
+        p_clave TEXT, p_maximo INTEGER, p_ventana INTEGER, p_bloqueo INTEGER,
+        OUT intentos INTEGER, OUT espera DOUBLE PRECISION
+    ) AS $$
+    DECLARE
+        ahora DOUBLE PRECISION := extract(epoch FROM clock_timestamp());
+        indice BIGINT := floor(ahora / p_ventana);
+        r public."Intentos"%ROWTYPE;
+        estimado DOUBLE PRECISION;
+    BEGIN
+        SELECT * INTO r FROM public."Intentos" WHERE "CLAVE" = p_clave FOR UPDATE;
+        IF NOT FOUND OR r."VENCE" < ahora THEN
+            r := ROW(p_clave, indice, 0, 0, 0, 0);
+        ELSIF r."INDICE" <> indice THEN
+            r."ANTERIOR" := CASE WHEN r."INDICE" = indice - 1 THEN r."ACTUAL" ELSE 0 END;
+            r."ACTUAL" := 0;
+            r."INDICE" := indice;
+        END IF;
+        r."ACTUAL" := r."ACTUAL" + 1;
+        estimado := r."ANTERIOR" * (1 - (ahora - indice * p_ventana) / p_ventana) + r."ACTUAL";
+        IF estimado >= p_maximo THEN
+            r."ACTUAL" := 0;
+            r."ANTERIOR" := 0;
+            r."BLOQUEADO_HASTA" := ahora + p_bloqueo;
+        END IF;
+        r."VENCE" := GREATEST(r."BLOQUEADO_HASTA", (indice + 2) * p_ventana);
+        INSERT INTO public."Intentos" VALUES (r.*)
+        ON CONFLICT ("CLAVE") DO UPDATE SET
+            "INDICE" = EXCLUDED."INDICE", "ACTUAL" = EXCLUDED."ACTUAL",
+            "ANTERIOR" = EXCLUDED."ANTERIOR", "BLOQUEADO_HASTA" = EXCLUDED."BLOQUEADO_HASTA",
+            "VENCE" = EXCLUDED."VENCE";
+        IF random() < 0.01 THEN
+            DELETE FROM public."Intentos" WHERE "VENCE" < ahora;
+        END IF;
+        intentos := ceil(estimado);
+        espera := GREATEST(0, r."BLOQUEADO_HASTA" - ahora);
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# Conteo de referencias de Archivos_adjuntos. Al llegar a cero el contenido
+# se anota en Eliminaciones_archivos; el trabajador de eliminacion_usuarios
+# lo borra del disco solo si el conteo sigue en cero.
+REFERENCIAS_ADJUNTOS = """
+    CREATE OR REPLACE FUNCTION public.referencias_adjuntos() RETURNS trigger AS $$
+    DECLARE
+        restantes INTEGER;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE public."Archivos_adjuntos" SET "REFERENCIAS" = "REFERENCIAS" + 1
+            WHERE "HASH" = NEW."HASH";
+        ELSE
+            UPDATE public."Archivos_adjuntos" SET "REFERENCIAS" = "REFERENCIAS" - 1
+            WHERE "HASH" = OLD."HASH"
+            RETURNING "REFERENCIAS" INTO restantes;
+            IF restantes <= 0 THEN
+                INSERT INTO public."Eliminaciones_archivos" ("RUTA")
+                VALUES ('/adjuntos/' || OLD."HASH")
+                ON CONFLICT ("RUTA") DO NOTHING;
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS "trg_adjuntos_alta" ON public."Adjuntos_mensajes";
+    CREATE TRIGGER "trg_adjuntos_alta"
+    AFTER INSERT ON public."Adjuntos_mensajes"
+    FOR EACH ROW WHEN (NEW."HASH" IS NOT NULL)
+    EXECUTE FUNCTION public.referencias_adjuntos();
+
+    DROP TRIGGER IF EXISTS "trg_adjuntos_baja" ON public."Adjuntos_mensajes";
+    CREATE TRIGGER "trg_adjuntos_baja"
+    AFTER DELETE ON public."Adjuntos_mensajes"
+    FOR EACH ROW WHEN (OLD."HASH" IS NOT NULL)
+    EXECUTE FUNCTION public.referencias_adjuntos();
+"""
+
+# tipo -> (tabla anterior, columna de ID)
+TABLAS_REPORTES_ANTERIORES = {
+    "perdido": ("Reportes_perdidos", "ID_REPORTE"),
+    "encontrado": ("Reportes_encontrados", "ID_REPORTE_ENC"),
+}
+
+
 # ========================
 # FUNCIONES DE CREACIÓN DE TABLAS
 # ========================
@@ -447,16 +729,16 @@ def crear_tabla_Perfiles():
 def crear_tabla_Objetos():
     """Crea la tabla Objetos."""
     ejecutar_sql(TABLAS["Objetos"], "Tabla Objetos")
+    ejecutar_sql(SECUENCIA_IDS, "Secuencia Ids_reportes")
 
 
-def crear_tabla_Reportes_encontrados():
-    """Crea la tabla Reportes_encontrados."""
-    ejecutar_sql(TABLAS["Reportes_encontrados"], "Tabla Reportes_encontrados")
+def crear_tabla_Reportes():
+    """Crea la tabla Reportes con sus particiones por tipo."""
+    ejecutar_sql(TABLAS["Reportes"], "Tabla Reportes")
 
-
-def crear_tabla_Reportes_perdidos():
-    """Crea la tabla Reportes_perdidos."""
-    ejecutar_sql(TABLAS["Reportes_perdidos"], "Tabla Reportes_perdidos")
+def crear_tabla_Reportes_archivados():
+    """Crea la tabla Reportes_archivados."""
+    ejecutar_sql(TABLAS["Reportes_archivados"], "Tabla Reportes_archivados")
 
 def crear_tabla_Mensajes():
     """Crea la tabla Mensajes."""
@@ -468,10 +750,53 @@ def crear_tabla_Adjuntos_mensajes():
     ejecutar_sql(TABLAS["Adjuntos_mensajes"], "Tabla Adjuntos_mensajes")
 
 
+def crear_tabla_Archivos_adjuntos():
+    """Crea la tabla Archivos_adjuntos."""
+    ejecutar_sql(TABLAS["Archivos_adjuntos"], "Tabla Archivos_adjuntos")
+
+
+def crear_tabla_Subidas():
+    """Crea la tabla Subidas."""
+    ejecutar_sql(TABLAS["Subidas"], "Tabla Subidas")
+
+
 def crear_tabla_Notificaciones():
     """Crea la tabla Notificaciones."""
     ejecutar_sql(TABLAS["Notificaciones"], "Tabla Notificaciones")
 
+def crear_tabla_Coincidencias():
+    """Crea la tabla Coincidencias."""
+    ejecutar_sql(TABLAS["Coincidencias"], "Tabla Coincidencias")
+
+def crear_tabla_Huellas_imagenes():
+    """Crea la tabla Huellas_imagenes."""
+    ejecutar_sql(TABLAS["Huellas_imagenes"], "Tabla Huellas_imagenes")
+
+def crear_tabla_Eliminaciones_usuarios():
+    """Crea la tabla Eliminaciones_usuarios."""
+    ejecutar_sql(TABLAS["Eliminaciones_usuarios"], "Tabla Eliminaciones_usuarios")
+
+def crear_tabla_Eliminaciones_archivos():
+    """Crea la tabla Eliminaciones_archivos."""
+    ejecutar_sql(TABLAS["Eliminaciones_archivos"], "Tabla Eliminaciones_archivos")
+
+def crear_tabla_Feed_reportes():
+    """Crea la tabla Feed_reportes."""
+    ejecutar_sql(TABLAS["Feed_reportes"], "Tabla Feed_reportes")
+
+def crear_tabla_Intentos():
+    """Crea la tabla Intentos."""
+    ejecutar_sql(TABLAS["Intentos"], "Tabla Intentos")
+
+def crear_tabla_Sesiones():
+    """Crea la tabla Sesiones."""
+    ejecutar_sql(TABLAS["Sesiones"], "Tabla Sesiones")
+
+
+def crear_tabla_Versiones():
+    """Crea la tabla Versiones."""
+    ejecutar_sql(TABLAS["Versiones"], "Tabla Versiones")
+
 def crear_tabla_Planes():
     """Crea la tabla Planes."""
     ejecutar_sql(TABLAS["Planes"], "Tabla Planes")
@@ -486,6 +811,89 @@ def crear_tabla_Facturas():
 
 
 
+def _tipo_relacion(cursor, nombre):
+    """relkind de una tabla o vista ('r' tabla, 'p' particionada, 'v' vista) o None."""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (f'public."{nombre}"',))
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+
+def _unificar_reportes(cursor):
+    """
+    Pasa a Reportes (particionada por tipo y mes) los reportes guardados con
+    estructuras anteriores:
+
+    - Reportes_perdidos y Reportes_encontrados como tablas separadas,
+    - Reportes con una partición por tipo y sin particiones por mes.
+
+    Los reportes se copian a una tabla temporal, las tablas viejas se borran
+    junto con las vistas y claves de Coincidencias que dependían de ellas, y
+    se vuelven a insertar en la estructura nueva. No confirma: corre dentro
+    de la transacción de aplicar_migraciones().
+    """
+    columnas = '"FECHA", "OBSERVACIONES", "ID_OBJETO", "ID_USUARIO", "FICHA", "ID_CATEGORIA", "STATUS"'
+    origenes = []
+    tablas = []
+    if _tipo_relacion(cursor, "Reportes_tipo_perdido") == "r":
+        origenes.append(f'SELECT "TIPO", "ID_REPORTE", {columnas} FROM public."Reportes"')
+        tablas.append("Reportes")
+    for tipo, (tabla, id_col) in TABLAS_REPORTES_ANTERIORES.items():
+        if _tipo_relacion(cursor, tabla) == "r":
+            origenes.append(
+                f'''SELECT '{tipo}'::text AS "TIPO", "{id_col}" AS "ID_REPORTE", {columnas} FROM public."{tabla}"'''
+            )
+            tablas.append(tabla)
+
+    if origenes:
+        cursor.execute(
+            f"CREATE TEMP TABLE reportes_anteriores ON COMMIT DROP AS {' UNION ALL '.join(origenes)}"
+        )
+        for tabla in tablas:
+            cursor.execute(f'DROP TABLE public."{tabla}" CASCADE')
+        cursor.execute(TABLAS["Reportes"])
+        asegurar_particiones(cursor, ("Reportes_tipo_perdido", "Reportes_tipo_encontrado"))
+        # FECHA es parte de la llave de partición y ya no admite NULL
+        cursor.execute(
+            f'''
+            INSERT INTO public."Reportes" ("TIPO", "ID_REPORTE", {columnas})
+            SELECT "TIPO", "ID_REPORTE", COALESCE("FECHA", CURRENT_TIMESTAMP), "OBSERVACIONES",
+                   "ID_OBJETO", "ID_USUARIO", "FICHA", "ID_CATEGORIA", "STATUS"
+            FROM reportes_anteriores
+            ON CONFLICT DO NOTHING
+            '''
+        )
+        print(f"✓ {cursor.rowcount} reportes pasados a Reportes")
+
+    cursor.execute(VISTAS_REPORTES)
+    cursor.execute(BORRADO_COINCIDENCIAS)
+
+
+def _particionar_notificaciones(cursor):
+    """Pasa una tabla Notificaciones sin particiones a la particionada por mes."""
+    if _tipo_relacion(cursor, "Notificaciones") != "r":
+        return
+    cursor.execute(
+        'CREATE TEMP TABLE notificaciones_anteriores ON COMMIT DROP AS SELECT * FROM public."Notificaciones"'
+    )
+    cursor.execute('DROP TABLE public."Notificaciones"')
+    cursor.execute(TABLAS["Notificaciones"])
+    asegurar_particiones(cursor, ("Notificaciones",))
+    cursor.execute(
+        '''
+        INSERT INTO public."Notificaciones" ("ID_NOTIF", "ID_USUARIO", "TIPO", "MENSAJE", "LEIDO", "FECHA")
+        SELECT "ID_NOTIF", "ID_USUARIO", "TIPO", "MENSAJE", "LEIDO", COALESCE("FECHA", CURRENT_TIMESTAMP)
+        FROM notificaciones_anteriores
+        '''
+    )
+    cursor.execute(
+        """
+        SELECT setval(pg_get_serial_sequence('public."Notificaciones"', 'ID_NOTIF'),
+                      COALESCE(MAX("ID_NOTIF"), 0) + 1, false)
+        FROM public."Notificaciones"
+        """
+    )
+
+
 def aplicar_migraciones():
     """Aplica migraciones a la base de datos para versiones nuevas."""
     conexion = conectar_db()
@@ -496,6 +904,12 @@ def aplicar_migraciones():
     
     cursor = conexion.cursor()
     try:
+        # Reportes y Notificaciones particionadas por mes (ver particiones.py);
+        # la segunda pasada de asegurar_particiones reparte lo que quedó en DEFAULT
+        _unificar_reportes(cursor)
+        cursor.execute(SECUENCIA_IDS)
+        _particionar_notificaciones(cursor)
+        asegurar_particiones(cursor)
         # Migración: Agregar columna TEMA_PREFERENCIA si no existe
         cursor.execute("""
             ALTER TABLE public."Usuarios"
@@ -513,6 +927,168 @@ def aplicar_migraciones():
             ALTER TABLE public."Mensajes"
             ADD COLUMN IF NOT EXISTS "ID_RESPUESTA" INTEGER
         """)
+        # Borrado lógico de usuarios: la limpieza real la hace eliminacion_usuarios
+        cursor.execute("""
+            ALTER TABLE public."Usuarios"
+            ADD COLUMN IF NOT EXISTS "ELIMINADO_EN" TIMESTAMP
+        """)
+        # Fallos seguidos de cada trabajo de eliminación (espera y aparcado)
+        cursor.execute("""
+            ALTER TABLE public."Eliminaciones_usuarios"
+            ADD COLUMN IF NOT EXISTS "INTENTOS" INTEGER NOT NULL DEFAULT 0
+        """)
+        # Los fallos de recuperación viven en "Intentos" (ver intentos.py)
+        cursor.execute("""
+            ALTER TABLE public."Usuarios"
+            DROP COLUMN IF EXISTS "INTENTOS_RECUPERACION",
+            DROP COLUMN IF EXISTS "BLOQUEADO_HASTA"
+        """)
+        cursor.execute(TABLAS["Intentos"])
+        cursor.execute(REGISTRAR_INTENTO)
+        cursor.execute(TABLAS["Sesiones"])
+        cursor.execute(TABLAS["Versiones"])
+        # Adjuntos por contenido (ver adjuntos.py); las filas anteriores quedan con HASH nulo
+        cursor.execute("""
+            ALTER TABLE public."Adjuntos_mensajes"
+            ADD COLUMN IF NOT EXISTS "HASH" TEXT,
+            ADD COLUMN IF NOT EXISTS "TAMANO" BIGINT
+        """)
+        cursor.execute(TABLAS["Archivos_adjuntos"])
+        cursor.execute(REFERENCIAS_ADJUNTOS)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_adjuntos_mensaje"
+            ON public."Adjuntos_mensajes" ("ID_MENSAJE")
+        """)
+        cursor.execute(TABLAS["Subidas"])
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_subidas_usuario"
+            ON public."Subidas" ("ID_USUARIO", "COMPLETA")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_sesiones_usuario"
+            ON public."Sesiones" ("ID_USUARIO")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_sesiones_vence"
+            ON public."Sesiones" ("VENCE")
+        """)
+        # Los índices de Reportes se crean en cada partición
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_reportes_usuario"
+            ON public."Reportes" ("ID_USUARIO")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_reportes_objeto"
+            ON public."Reportes" ("ID_OBJETO")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_mensajes_remitente"
+            ON public."Mensajes" ("ID_REMITENTE")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_mensajes_destinatario"
+            ON public."Mensajes" ("ID_DESTINATARIO")
+        """)
+        # Bloqueo del motor de coincidencias: misma categoría y ventana de fechas
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_reportes_categoria_fecha"
+            ON public."Reportes" ("ID_CATEGORIA", "FECHA")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_coincidencias_encontrado"
+            ON public."Coincidencias" ("ID_REPORTE_ENCONTRADO", "PUNTAJE" DESC)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_coincidencias_puntaje"
+            ON public."Coincidencias" ("PUNTAJE" DESC, "ID_REPORTE_PERDIDO" DESC, "ID_REPORTE_ENCONTRADO" DESC)
+        """)
+        # Color normalizado a la paleta de colores.py para filtros y facetas
+        cursor.execute("""
+            ALTER TABLE public."Objetos"
+            ADD COLUMN IF NOT EXISTS "ID_COLOR" TEXT
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_objetos_color"
+            ON public."Objetos" ("ID_COLOR")
+        """)
+        cursor.execute("""
+            SELECT DISTINCT "COLOR" FROM public."Objetos"
+            WHERE "ID_COLOR" IS NULL AND "COLOR" IS NOT NULL
+        """)
+        colores = {}
+        for (texto,) in cursor.fetchall():
+            id_color = normalizar_color(texto)
+            if id_color:
+                colores[texto] = id_color
+        if colores:
+            cursor.execute(
+                """
+                UPDATE public."Objetos" o SET "ID_COLOR" = m.id_color
+                FROM unnest(%s::text[], %s::text[]) AS m(texto, id_color)
+                WHERE o."COLOR" = m.texto AND o."ID_COLOR" IS NULL
+                """,
+                (list(colores.keys()), list(colores.values())),
+            )
+        # Búsqueda de imágenes parecidas por bandas del hash
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_huellas_bandas"
+            ON public."Huellas_imagenes" USING gin ("BANDAS")
+        """)
+        # Páginas de posibles duplicados, de las huellas más nuevas hacia atrás
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_huellas_fecha"
+            ON public."Huellas_imagenes" ("FECHA" DESC, "ID_OBJETO" DESC)
+        """)
+        # Índice para listar reportes por fecha con paginación por llave: las
+        # dos particiones se leen en orden y se mezclan (Merge Append)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_reportes_fecha"
+            ON public."Reportes" ("FECHA" DESC NULLS LAST, "ID_REPORTE" DESC, "TIPO" DESC)
+        """)
+        # Feed de recientes: se arma la primera vez desde los reportes existentes
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_feed_reportes_fecha"
+            ON public."Feed_reportes" ("FECHA" DESC NULLS LAST, "ID_REPORTE" DESC)
+        """)
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM public."Feed_reportes")')
+        if not cursor.fetchone()[0]:
+            reconstruir_feed(cursor)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_reportes_status"
+            ON public."Reportes" ("STATUS")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_reportes_archivados_usuario"
+            ON public."Reportes_archivados" ("ID_USUARIO")
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_notificaciones_usuario_fecha"
+            ON public."Notificaciones" ("ID_USUARIO", "FECHA" DESC)
+        """)
+        # Búsqueda de usuarios: prefijos con text_pattern_ops y contenido con trigramas
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_usuarios_id_prefijo"
+            ON public."Usuarios" (lower("ID_USUARIO") text_pattern_ops)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS "idx_usuarios_nombre_prefijo"
+            ON public."Usuarios" (lower("NOMBRE") text_pattern_ops)
+        """)
+        cursor.execute("SAVEPOINT trigramas")
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS "idx_usuarios_id_trgm"
+                ON public."Usuarios" USING gin ("ID_USUARIO" gin_trgm_ops)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS "idx_usuarios_nombre_trgm"
+                ON public."Usuarios" USING gin ("NOMBRE" gin_trgm_ops)
+            """)
+        except psycopg2.Error as e:
+            # sin permisos para la extensión la búsqueda sigue funcionando, solo más lenta
+            cursor.execute("ROLLBACK TO SAVEPOINT trigramas")
+            print(f"⚠ Índices de trigramas no disponibles: {e}")
         conexion.commit()
         print("✓ Migraciones aplicadas correctamente")
     except Exception as e:
@@ -537,12 +1113,22 @@ def crear_tablas():
     crear_tabla_Usuario()
     crear_tabla_Perfiles()
     crear_tabla_Objetos()
-    crear_tabla_Reportes_encontrados()
-    crear_tabla_Reportes_perdidos()
+    crear_tabla_Reportes()
+    crear_tabla_Reportes_archivados()
     # tablas de mensajería y notificaciones
     crear_tabla_Mensajes()
     crear_tabla_Adjuntos_mensajes()
+    crear_tabla_Archivos_adjuntos()
+    crear_tabla_Subidas()
     crear_tabla_Notificaciones()
+    crear_tabla_Coincidencias()
+    crear_tabla_Huellas_imagenes()
+    crear_tabla_Eliminaciones_usuarios()
+    crear_tabla_Eliminaciones_archivos()
+    crear_tabla_Feed_reportes()
+    crear_tabla_Intentos()
+    crear_tabla_Sesiones()
+    crear_tabla_Versiones()
     crear_tabla_Planes()
     crear_tabla_Metodos_pago()
     crear_tabla_Facturas()
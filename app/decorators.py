@@ -1,10 +1,32 @@
 from functools import wraps
 from flask import session, request, jsonify, redirect, url_for
 
+from .permisos import rol_actual
+
+
+def _rol_de_sesion():
+    """
+    Rol vigente del usuario de la sesión (ver permisos.py). Corrige
+    session["id_rol"] si cambió y cierra la sesión si el usuario ya no existe.
+    Si la base no responde se queda con el rol de la sesión.
+
+    Returns:
+        int | None: ID_ROL, o None si no hay sesión válida
+    """
+    if "id_usuario" not in session:
+        return None
+    id_rol = rol_actual(session["id_usuario"], respaldo=session.get("id_rol"))
+    if id_rol is None:
+        session.clear()
+    elif session.get("id_rol") != id_rol:
+        session["id_rol"] = id_rol
+    return id_rol
+
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if "id_usuario" not in session:
+        if _rol_de_sesion() is None:
             if request.path.startswith("/api/"):
                 return jsonify({"ok": False, "error": "No autenticado"}), 401
             return redirect("/inicio")
@@ -15,10 +37,11 @@ def login_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if "id_usuario" not in session:
+        id_rol = _rol_de_sesion()
+        if id_rol is None:
             return redirect("/inicio")
 
-        if session.get("id_rol") != 2:
+        if id_rol != 2:
             return redirect("/menu")
 
         return f(*args, **kwargs)
@@ -28,9 +51,10 @@ def admin_required(f):
 def guest_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if "id_usuario" in session:
-            if session.get("id_rol") == 2:
+        id_rol = _rol_de_sesion()
+        if id_rol is not None:
+            if id_rol == 2:
                 return redirect(url_for("admin_inicio"))
             return redirect(url_for("menu"))
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,379 @@
+"""
+Eliminación de usuarios en segundo plano.
+
+Borrar un usuario con muchos reportes en una sola petición bloquea las tablas
+mucho tiempo y deja huérfanos los Objetos y las imágenes subidas. Por eso la
+eliminación se divide en dos etapas:
+
+- solicitar_eliminacion(): marca al usuario con ELIMINADO_EN (deja de poder
+  iniciar sesión y desaparece de los listados de inmediato) y crea un trabajo
+  en la tabla Eliminaciones_usuarios.
+- un hilo trabajador recorre los trabajos pendientes y borra en lotes
+  acotados los reportes, objetos huérfanos, mensajes y finalmente el usuario.
+
+Cada lote se confirma junto con el avance del trabajo, así que si el proceso
+se cae se retoma desde la última fase guardada. Los archivos a borrar del
+disco se anotan en Eliminaciones_archivos dentro de la misma transacción y se
+eliminan después, de modo que ningún archivo queda huérfano por una caída.
+Ahí también llegan los contenidos de adjuntos que se quedaron sin
+referencias (ver adjuntos.py).
+
+Un trabajo que falla anota ERROR y suma INTENTOS: espera ESPERA_BASE *
+2^INTENTOS segundos (hasta ESPERA_MAXIMA) antes de reintentarse, va detrás
+de los que no fallaron y, a los MAX_INTENTOS, queda aparcado hasta que se
+vuelva a solicitar la eliminación. Así un trabajo roto no frena a los demás.
+"""
+
+import os
+import threading
+import time
+
+from psycopg2.extras import RealDictCursor
+
+from .adjuntos import PREFIJO_RUTA, borrar_sin_referencias
+from .database import conectar_db
+from .cache import invalidar_reportes
+from .feed import quitar_usuarios
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+TAMANO_LOTE_DEFECTO = 500
+INTERVALO_DEFECTO = 5  # segundos de espera cuando no hay trabajo
+MAX_INTENTOS = 8
+ESPERA_BASE = 30  # segundos
+ESPERA_MAXIMA = 60 * 60
+
+FASES = ("reportes", "mensajes", "usuario", "completado")
+
+# ========================
+# SOLICITUD (SÍNCRONA)
+# ========================
+
+
+def solicitar_eliminacion(cursor, ids_usuarios, solicitado_por=None):
+    """
+    Marca usuarios como eliminados y encola su limpieza.
+
+    No confirma la transacción: el llamador decide cuándo hacer commit.
+
+    Args:
+        cursor: Cursor de tuplas de la conexión del llamador
+        ids_usuarios (list): IDs de los usuarios a eliminar
+        solicitado_por (str): ID del administrador que pide la eliminación
+
+    Returns:
+        set: IDs que existían y quedaron marcados como eliminados
+    """
+    if not ids_usuarios:
+        return set()
+
+    cursor.execute(
+        """
+        UPDATE public."Usuarios"
+        SET "ELIMINADO_EN" = COALESCE("ELIMINADO_EN", CURRENT_TIMESTAMP)
+        WHERE "ID_USUARIO" = ANY(%s)
+        RETURNING "ID_USUARIO"
+        """,
+        (list(ids_usuarios),),
+    )
+    marcados = {fila[0] for fila in cursor.fetchall()}
+
+    if marcados:
+        # sus reportes dejan de mostrarse en la portada desde ya
+        quitar_usuarios(cursor, marcados)
+        cursor.execute(
+            """
+            INSERT INTO public."Eliminaciones_usuarios" ("ID_USUARIO", "SOLICITADO_POR")
+            SELECT unnest(%s::text[]), %s
+            ON CONFLICT ("ID_USUARIO") DO UPDATE SET "INTENTOS" = 0
+            WHERE public."Eliminaciones_usuarios"."FASE" <> 'completado'
+            """,
+            (list(marcados), solicitado_por),
+        )
+
+    return marcados
+
+
+# ========================
+# PROCESAMIENTO POR LOTES
+# ========================
+
+
+def _encolar_archivos(cursor, rutas):
+    """Anota rutas /uploads/... para borrarlas del disco después del commit."""
+    rutas = [r for r in rutas if r and r.startswith("/uploads/")]
+    if rutas:
+        cursor.execute(
+            """
+            INSERT INTO public."Eliminaciones_archivos" ("RUTA")
+            SELECT unnest(%s::text[])
+            ON CONFLICT ("RUTA") DO NOTHING
+            """,
+            (rutas,),
+        )
+
+
+def _fase_reportes(cursor, id_usuario, tamano_lote):
+    """Borra un lote de reportes del usuario y los objetos que quedan sin reporte."""
+    cursor.execute(
+        """
+        DELETE FROM public."Reportes"
+        WHERE "ID_USUARIO" = %s AND ("TIPO", "ID_REPORTE") IN (
+            SELECT "TIPO", "ID_REPORTE" FROM public."Reportes" WHERE "ID_USUARIO" = %s LIMIT %s
+        )
+        RETURNING "ID_OBJETO"
+        """,
+        (id_usuario, id_usuario, tamano_lote),
+    )
+    filas = cursor.fetchall()
+    if len(filas) < tamano_lote:
+        # último lote: también los que archivó particiones.archivar_reportes()
+        cursor.execute(
+            'DELETE FROM public."Reportes_archivados" WHERE "ID_USUARIO" = %s RETURNING "ID_OBJETO"',
+            (id_usuario,),
+        )
+        filas += cursor.fetchall()
+    borrados = len(filas)
+    objetos = {fila["ID_OBJETO"] for fila in filas}
+
+    objetos_borrados = 0
+    if objetos:
+        cursor.execute(
+            """
+            DELETE FROM public."Objetos" o
+            WHERE o."ID_OBJETO" = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM public."Reportes" r WHERE r."ID_OBJETO" = o."ID_OBJETO")
+              AND NOT EXISTS (SELECT 1 FROM public."Reportes_archivados" a WHERE a."ID_OBJETO" = o."ID_OBJETO")
+            RETURNING o."IMAGEN"
+            """,
+            (list(objetos),),
+        )
+        imagenes = [fila["IMAGEN"] for fila in cursor.fetchall()]
+        objetos_borrados = len(imagenes)
+        _encolar_archivos(cursor, imagenes)
+
+    avance = {"REPORTES_BORRADOS": borrados, "OBJETOS_BORRADOS": objetos_borrados}
+    return ("reportes" if borrados else "mensajes"), avance
+
+
+def _fase_mensajes(cursor, id_usuario, tamano_lote):
+    """Borra un lote de mensajes enviados o recibidos por el usuario."""
+    cursor.execute(
+        """
+        SELECT "ID_MENSAJE" FROM public."Mensajes"
+        WHERE "ID_REMITENTE" = %s OR "ID_DESTINATARIO" = %s
+        LIMIT %s
+        """,
+        (id_usuario, id_usuario, tamano_lote),
+    )
+    ids = [fila["ID_MENSAJE"] for fila in cursor.fetchall()]
+    if not ids:
+        return "usuario", {}
+
+    cursor.execute(
+        'SELECT "RUTA" FROM public."Adjuntos_mensajes" WHERE "ID_MENSAJE" = ANY(%s)',
+        (ids,),
+    )
+    _encolar_archivos(cursor, [fila["RUTA"] for fila in cursor.fetchall()])
+
+    # los adjuntos se borran en cascada con el mensaje
+    cursor.execute('DELETE FROM public."Mensajes" WHERE "ID_MENSAJE" = ANY(%s)', (ids,))
+    return "mensajes", {"MENSAJES_BORRADOS": len(ids)}
+
+
+def _fase_usuario(cursor, id_usuario):
+    """Borra la fila del usuario; Perfiles y Notificaciones caen en cascada."""
+    cursor.execute(
+        'SELECT "FOTO_PERFIL" FROM public."Perfiles" WHERE "ID_USUARIO" = %s',
+        (id_usuario,),
+    )
+    _encolar_archivos(cursor, [fila["FOTO_PERFIL"] for fila in cursor.fetchall()])
+
+    # solo si sigue marcado: un admin pudo haber restaurado al usuario a mano
+    cursor.execute(
+        'DELETE FROM public."Usuarios" WHERE "ID_USUARIO" = %s AND "ELIMINADO_EN" IS NOT NULL',
+        (id_usuario,),
+    )
+    return "completado", {}
+
+
+def _procesar_un_lote(conexion, tamano_lote):
+    """
+    Toma un trabajo pendiente y avanza un lote.
+
+    Returns:
+        bool: True si había trabajo pendiente
+    """
+    cursor = conexion.cursor(cursor_factory=RealDictCursor)
+    try:
+        # SKIP LOCKED permite varios trabajadores (uno por proceso) sin pisarse;
+        # los que fallaron esperan su turno y van al final
+        cursor.execute(
+            """
+            SELECT "ID_USUARIO", "FASE" FROM public."Eliminaciones_usuarios"
+            WHERE "FASE" <> 'completado'
+              AND "INTENTOS" < %s
+              AND ("ERROR" IS NULL
+                   OR "ACTUALIZADO" < CURRENT_TIMESTAMP
+                      - make_interval(secs => LEAST(%s, %s * power(2, "INTENTOS"))))
+            ORDER BY "ERROR" IS NOT NULL, "ACTUALIZADO"
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """,
+            (MAX_INTENTOS, ESPERA_MAXIMA, ESPERA_BASE),
+        )
+        trabajo = cursor.fetchone()
+        if not trabajo:
+            conexion.rollback()
+            return False
+
+        id_usuario = trabajo["ID_USUARIO"]
+        fase = trabajo["FASE"]
+
+        if fase == "reportes":
+            siguiente, avance = _fase_reportes(cursor, id_usuario, tamano_lote)
+        elif fase == "mensajes":
+            siguiente, avance = _fase_mensajes(cursor, id_usuario, tamano_lote)
+        else:
+            siguiente, avance = _fase_usuario(cursor, id_usuario)
+
+        cursor.execute(
+            """
+            UPDATE public."Eliminaciones_usuarios"
+            SET "FASE" = %s,
+                "REPORTES_BORRADOS" = "REPORTES_BORRADOS" + %s,
+                "OBJETOS_BORRADOS" = "OBJETOS_BORRADOS" + %s,
+                "MENSAJES_BORRADOS" = "MENSAJES_BORRADOS" + %s,
+                "ERROR" = NULL,
+                "INTENTOS" = 0,
+                "ACTUALIZADO" = CURRENT_TIMESTAMP
+            WHERE "ID_USUARIO" = %s
+            """,
+            (
+                siguiente,
+                avance.get("REPORTES_BORRADOS", 0),
+                avance.get("OBJETOS_BORRADOS", 0),
+                avance.get("MENSAJES_BORRADOS", 0),
+                id_usuario,
+            ),
+        )
+        conexion.commit()
+        if avance.get("REPORTES_BORRADOS"):
+            invalidar_reportes()
+        return True
+
+    except Exception as e:
+        conexion.rollback()
+        print(f"✗ Error en eliminación de usuario: {e}")
+        if "id_usuario" in locals():
+            cursor.execute(
+                """
+                UPDATE public."Eliminaciones_usuarios"
+                SET "ERROR" = %s, "INTENTOS" = "INTENTOS" + 1, "ACTUALIZADO" = CURRENT_TIMESTAMP
+                WHERE "ID_USUARIO" = %s
+                RETURNING "INTENTOS"
+                """,
+                (str(e)[:500], id_usuario),
+            )
+            fila = cursor.fetchone()
+            conexion.commit()
+            if fila and fila["INTENTOS"] >= MAX_INTENTOS:
+                print(f"⚠ Eliminación de {id_usuario} aparcada tras {MAX_INTENTOS} fallos")
+        return False
+    finally:
+        cursor.close()
+
+
+def _borrar_archivos_pendientes(conexion, carpeta_uploads, carpeta_adjuntos, tamano_lote):
+    """
+    Borra del disco un lote de archivos anotados.
+
+    Returns:
+        int: Cantidad de archivos procesados
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT "RUTA" FROM public."Eliminaciones_archivos"
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (tamano_lote,),
+        )
+        rutas = [fila[0] for fila in cursor.fetchall()]
+        borrar_sin_referencias(cursor, carpeta_adjuntos, rutas)
+        for ruta in rutas:
+            if ruta.startswith(PREFIJO_RUTA):
+                continue
+            # basename evita salir de la carpeta de subidas con rutas manipuladas
+            archivo = os.path.join(carpeta_uploads, os.path.basename(ruta))
+            try:
+                os.remove(archivo)
+            except FileNotFoundError:
+                pass
+        if rutas:
+            cursor.execute(
+                'DELETE FROM public."Eliminaciones_archivos" WHERE "RUTA" = ANY(%s)',
+                (rutas,),
+            )
+        conexion.commit()
+        return len(rutas)
+    except Exception as e:
+        conexion.rollback()
+        print(f"✗ Error borrando archivos de usuarios eliminados: {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def procesar_eliminaciones(carpeta_uploads, carpeta_adjuntos, tamano_lote=TAMANO_LOTE_DEFECTO):
+    """
+    Avanza un lote de limpieza y un lote de archivos.
+
+    Returns:
+        bool: True si quedó trabajo por hacer
+    """
+    conexion = conectar_db()
+    if not conexion:
+        return False
+    try:
+        hubo_trabajo = _procesar_un_lote(conexion, tamano_lote)
+        archivos = _borrar_archivos_pendientes(conexion, carpeta_uploads, carpeta_adjuntos, tamano_lote)
+        return hubo_trabajo or archivos > 0
+    finally:
+        conexion.close()
+
+
+# ========================
+# HILO TRABAJADOR
+# ========================
+
+
+def iniciar_trabajador_eliminaciones(app):
+    """
+    Arranca un hilo daemon que procesa las eliminaciones pendientes.
+
+    Mientras haya trabajo procesa lotes seguidos; si no hay, espera
+    LIMPIEZA_INTERVALO segundos antes de volver a consultar.
+    """
+    carpeta = app.config["UPLOAD_FOLDER"]
+    carpeta_adjuntos = app.config["ADJUNTOS_FOLDER"]
+    tamano_lote = app.config.get("LIMPIEZA_TAMANO_LOTE", TAMANO_LOTE_DEFECTO)
+    intervalo = app.config.get("LIMPIEZA_INTERVALO", INTERVALO_DEFECTO)
+
+    def ciclo():
+        while True:
+            try:
+                pendiente = procesar_eliminaciones(carpeta, carpeta_adjuntos, tamano_lote)
+            except Exception as e:
+                print(f"✗ Error en el trabajador de eliminaciones: {e}")
+                pendiente = False
+            if not pendiente:
+                time.sleep(intervalo)
+
+    hilo = threading.Thread(target=ciclo, name="eliminaciones-usuarios", daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,128 @@
+"""
+Conteos por faceta para el motor de búsqueda.
+
+Calcula en una sola pasada, con GROUPING SETS, cuántos resultados tendría
+cada valor de las facetas (categoría, tipo, estado, mes y color).
+
+Los conteos son disyuntivos: el conteo de cada faceta aplica todos los
+filtros activos menos el de esa misma faceta, para que el usuario vea las
+alternativas que tiene. Cada fila trae un indicador por filtro y cada
+conteo usa COUNT(*) FILTER con los indicadores de las demás facetas.
+
+Los resultados se guardan unos segundos por consulta normalizada porque
+la misma búsqueda se repite mucho mientras el usuario escribe; la caché se
+invalida cuando cambian los reportes.
+"""
+
+from .cache import cache_consultas, ESPACIO_REPORTES
+from .colores import nombre_color
+from .consulta_reportes import DIMENSIONES_FACETA
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+TTL_FACETAS = 60  # segundos
+DIMENSIONES = DIMENSIONES_FACETA
+
+
+
+def clave_busqueda(q, **filtros):
+    """
+    Clave de caché de una búsqueda: texto en minúsculas con espacios
+    colapsados y filtros vacíos descartados.
+    """
+    texto = " ".join((q or "").lower().split())
+    return (texto,) + tuple(sorted((k, v) for k, v in filtros.items() if v))
+
+
+def contar_facetas(cursor, consulta, clave=None):
+    """
+    Cuenta resultados por valor de cada faceta.
+
+    Args:
+        cursor: Cursor RealDictCursor
+        consulta: ConsultaReportes con los filtros de la búsqueda
+        clave: Clave de caché (ver clave_busqueda); None desactiva la caché
+
+    Returns:
+        dict: {"total": n, "categoria": [{id, nombre, total}], "tipo": [...], ...}
+    """
+    if clave is None:
+        return _contar(cursor, consulta)
+    return cache_consultas.obtener_o_calcular(
+        ESPACIO_REPORTES,
+        ["facetas", list(clave)],
+        lambda: _contar(cursor, consulta),
+        ttl=TTL_FACETAS,
+    )
+
+
+def _contar(cursor, consulta):
+    # texto, usuario, publicos...: todo lo que no es faceta filtra siempre
+    condicion_base, params_base = consulta.condicion(excluir=DIMENSIONES)
+    filtros = consulta.filtros_faceta()
+
+    indicadores = []
+    params = []
+    for dimension in DIMENSIONES:
+        if dimension in filtros:
+            sql, valores = filtros[dimension]
+            indicadores.append(f"({sql}) AS f_{dimension}")
+            params.extend(valores)
+        else:
+            indicadores.append(f"TRUE AS f_{dimension}")
+    params.extend(params_base)
+
+    # conteo de cada faceta = filas que cumplen los filtros de las demás
+    conteos = []
+    for dimension in DIMENSIONES:
+        otros = " AND ".join(f"f_{d}" for d in DIMENSIONES if d != dimension)
+        conteos.append(f"COUNT(*) FILTER (WHERE {otros}) AS n_{dimension}")
+    todos = " AND ".join(f"f_{d}" for d in DIMENSIONES)
+    conteos.append(f"COUNT(*) FILTER (WHERE {todos}) AS n_total")
+
+    cursor.execute(
+        f'''
+        SELECT {", ".join(DIMENSIONES)},
+               {", ".join(f"GROUPING({d}) AS g_{d}" for d in DIMENSIONES)},
+               {", ".join(conteos)}
+        FROM (
+            SELECT o."ID_CATEGORIA" AS categoria, r."TIPO" AS tipo,
+                   r."STATUS" AS status, to_char(r."FECHA", 'YYYY-MM') AS mes,
+                   o."ID_COLOR" AS color,
+                   {", ".join(indicadores)}
+            FROM public."Reportes" r
+            JOIN public."Objetos" o ON o."ID_OBJETO" = r."ID_OBJETO"
+            LEFT JOIN public."Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
+            WHERE {condicion_base}
+        ) t
+        GROUP BY GROUPING SETS ({", ".join(f"({d})" for d in DIMENSIONES)}, ())
+        ''',
+        params,
+    )
+
+    resultado = {"total": 0}
+    for dimension in DIMENSIONES:
+        resultado[dimension] = []
+
+    for fila in cursor.fetchall():
+        activas = [d for d in DIMENSIONES if fila[f"g_{d}"] == 0]
+        if not activas:
+            resultado["total"] = fila["n_total"]
+            continue
+        dimension = activas[0]
+        valor = fila[dimension]
+        total = fila[f"n_{dimension}"]
+        if valor is None or not total:
+            continue
+        nombre = nombre_color(valor) if dimension == "color" else valor
+        resultado[dimension].append({"id": valor, "nombre": nombre, "total": total})
+
+    for dimension in DIMENSIONES:
+        if dimension == "mes":
+            resultado[dimension].sort(key=lambda f: f["id"], reverse=True)
+        else:
+            resultado[dimension].sort(key=lambda f: f["total"], reverse=True)
+
+    return resultado
@@ -0,0 +1,175 @@
+"""
+Feed de reportes recientes.
+
+La portada solo muestra los últimos reportes, así que en vez de unir todo
+el historial en cada visita se mantiene la tabla Feed_reportes con las
+TAMANO_FEED tarjetas más nuevas ya armadas (nombre del objeto, imagen,
+categoría, usuario y fecha en ISO).
+
+Las rutas que crean o borran reportes llaman a agregar_reporte() o
+quitar_reportes() dentro de su propia transacción. La lectura pide a
+Postgres el arreglo JSON completo y lo devuelve como bytes, sin joins ni
+formateo por fila en Python.
+"""
+
+from .cache import cache_consultas, ESPACIO_REPORTES
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+TAMANO_FEED = 50
+
+# mismas claves que devolvía /api/reportes_recientes (ver report-card.js)
+_TARJETAS = """
+    SELECT r."TIPO", r."ID_REPORTE", r."ID_USUARIO", r."FECHA",
+           jsonb_build_object(
+               'NOMBRE', o."NOMBRE",
+               'ID_OBJETO', o."ID_OBJETO",
+               'COLOR', o."COLOR",
+               'IMAGEN', o."IMAGEN",
+               'categoria', o."ID_CATEGORIA",
+               'nombre_categoria', c."NOMBRE",
+               'LUGAR', o."LUGAR_ENCONTRADO",
+               'FECHA', to_jsonb(r."FECHA"),
+               'tipo', r."TIPO",
+               'id_reporte', r."ID_REPORTE",
+               'nombre_usuario', COALESCE(u."NOMBRE", 'Usuario')
+           )
+    FROM public."Reportes" r
+    JOIN public."Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
+    LEFT JOIN public."Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
+    LEFT JOIN public."Usuarios" u ON r."ID_USUARIO" = u."ID_USUARIO"
+    WHERE u."ELIMINADO_EN" IS NULL
+"""
+
+_INSERTAR = """
+    INSERT INTO public."Feed_reportes" ("TIPO", "ID_REPORTE", "ID_USUARIO", "FECHA", "TARJETA")
+"""
+
+
+def _recortar(cursor):
+    """Deja solo las TAMANO_FEED tarjetas más nuevas."""
+    cursor.execute(
+        """
+        DELETE FROM public."Feed_reportes" f
+        WHERE NOT EXISTS (
+            SELECT 1 FROM (
+                SELECT "TIPO", "ID_REPORTE" FROM public."Feed_reportes"
+                ORDER BY "FECHA" DESC NULLS LAST, "ID_REPORTE" DESC
+                LIMIT %s
+            ) recientes
+            WHERE recientes."TIPO" = f."TIPO" AND recientes."ID_REPORTE" = f."ID_REPORTE"
+        )
+        """,
+        (TAMANO_FEED,),
+    )
+
+
+def _rellenar(cursor):
+    """Completa el feed con los reportes más nuevos."""
+    # recorre idx_reportes_fecha de las dos particiones y corta en el LIMIT
+    cursor.execute(
+        _INSERTAR
+        + _TARJETAS
+        + """
+        ORDER BY r."FECHA" DESC NULLS LAST, r."ID_REPORTE" DESC, r."TIPO" DESC
+        LIMIT %s
+        ON CONFLICT ("TIPO", "ID_REPORTE") DO NOTHING
+        """,
+        (TAMANO_FEED,),
+    )
+    _recortar(cursor)
+
+
+def agregar_reporte(cursor, tipo, id_reporte):
+    """
+    Agrega (o actualiza) la tarjeta de un reporte recién creado.
+
+    No confirma la transacción: el llamador decide cuándo hacer commit.
+    """
+    cursor.execute(
+        _INSERTAR
+        + _TARJETAS
+        + """
+        AND r."TIPO" = %s AND r."ID_REPORTE" = %s
+        ON CONFLICT ("TIPO", "ID_REPORTE") DO UPDATE
+        SET "FECHA" = EXCLUDED."FECHA", "TARJETA" = EXCLUDED."TARJETA"
+        """,
+        (tipo, id_reporte),
+    )
+    _recortar(cursor)
+
+
+def quitar_reportes(cursor, tipo, ids_reportes):
+    """
+    Quita tarjetas de reportes borrados y rellena el hueco con el siguiente
+    reporte más nuevo. No confirma la transacción.
+    """
+    if not ids_reportes:
+        return
+    cursor.execute(
+        'DELETE FROM public."Feed_reportes" WHERE "TIPO" = %s AND "ID_REPORTE" = ANY(%s)',
+        (tipo, list(ids_reportes)),
+    )
+    if cursor.rowcount:
+        _rellenar(cursor)
+
+
+def quitar_usuarios(cursor, ids_usuarios):
+    """Quita las tarjetas de usuarios eliminados. No confirma la transacción."""
+    if not ids_usuarios:
+        return
+    cursor.execute(
+        'DELETE FROM public."Feed_reportes" WHERE "ID_USUARIO" = ANY(%s)',
+        (list(ids_usuarios),),
+    )
+    if cursor.rowcount:
+        _rellenar(cursor)
+
+
+def reconstruir_feed(cursor):
+    """Vuelve a armar el feed completo desde la tabla Reportes."""
+    cursor.execute('DELETE FROM public."Feed_reportes"')
+    _rellenar(cursor)
+
+
+def _leer_feed(conexion):
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COALESCE(
+                json_agg("TARJETA" ORDER BY "FECHA" DESC NULLS LAST, "ID_REPORTE" DESC),
+                '[]'
+            )::text
+            FROM public."Feed_reportes"
+            """
+        )
+        datos = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return b'{"ok": true, "datos": ' + datos.encode("utf-8") + b"}"
+
+
+def feed_serializado(conectar):
+    """
+    Respuesta JSON del feed ya serializada.
+
+    Args:
+        conectar: Función que abre una conexión (solo se usa si no hay caché)
+
+    Returns:
+        bytes: {"ok": true, "datos": [...]}
+    """
+
+    def calcular():
+        conexion = conectar()
+        if conexion is None:
+            raise ConnectionError("Error de conexión a la base de datos")
+        try:
+            return _leer_feed(conexion)
+        finally:
+            conexion.close()
+
+    return cache_consultas.obtener_o_calcular(ESPACIO_REPORTES, ["feed"], calcular)
@@ -0,0 +1,264 @@
+"""
+Huellas perceptuales de las imágenes subidas.
+
+Para cada foto de un objeto se calcula un dHash de 64 bits: la imagen se
+reduce a 9x8 en escala de grises y cada bit indica si un píxel es más claro
+que su vecino de la derecha. Dos fotos de la misma imagen (recomprimida,
+redimensionada o con otro brillo) quedan a pocos bits de distancia.
+
+Búsqueda por distancia de Hamming con índices múltiples: el hash se parte en
+4 bandas de 16 bits que se guardan en un arreglo con índice GIN. Si dos hashes
+difieren en 3 bits o menos, por el principio del palomar al menos una banda
+es idéntica, así que basta con buscar las filas que comparten alguna banda y
+luego calcular la distancia exacta solo sobre ellas.
+"""
+
+import os
+
+from psycopg2.extras import RealDictCursor
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+BANDAS = 4
+BITS_BANDA = 64 // BANDAS
+DISTANCIA_MAXIMA = BANDAS - 1  # radio garantizado por las bandas
+LIMITE_SIMILARES = 10
+LOTE_PARES = 500  # huellas recientes que recorre cada página de pares
+CANDIDATOS_POR_HUELLA = 200  # filas que comparten banda revisadas por huella
+PARES_POR_HUELLA = 5
+
+
+# ========================
+# CÁLCULO DEL HASH
+# ========================
+
+
+def calcular_dhash(origen):
+    """
+    Calcula el dHash de 64 bits de una imagen.
+
+    Args:
+        origen: Ruta del archivo u objeto tipo archivo
+
+    Returns:
+        int: Hash sin signo de 64 bits o None si no se pudo leer la imagen
+    """
+    try:
+        from PIL import Image
+    except Exception as e:
+        print(f"Pillow no disponible, no se calculan huellas: {e}")
+        return None
+
+    try:
+        with Image.open(origen) as imagen:
+            # draft deja que el decodificador JPEG reduzca al leer: mucho más rápido
+            imagen.draft("L", (64, 64))
+            pequena = imagen.convert("L").resize((9, 8), Image.LANCZOS)
+            pixeles = list(pequena.getdata())
+    except Exception as e:
+        print(f"Error calculando huella de imagen: {e}")
+        return None
+
+    valor = 0
+    for fila in range(8):
+        base = fila * 9
+        for col in range(8):
+            valor = (valor << 1) | (pixeles[base + col] > pixeles[base + col + 1])
+    return valor
+
+
+def _con_signo(valor):
+    """Convierte un entero sin signo de 64 bits al rango de BIGINT."""
+    return valor - (1 << 64) if valor >= (1 << 63) else valor
+
+
+def bandas_hash(valor):
+    """
+    Bandas del hash para el índice GIN.
+
+    Cada banda se codifica como posición * 65536 + valor para que la misma
+    secuencia de bits en bandas distintas no se confunda.
+    """
+    mascara = (1 << BITS_BANDA) - 1
+    return [
+        i * (1 << BITS_BANDA) + ((valor >> (i * BITS_BANDA)) & mascara)
+        for i in range(BANDAS)
+    ]
+
+
+# ========================
+# REGISTRO Y CONSULTAS
+# ========================
+
+
+def registrar_huella(cursor, id_objeto, valor):
+    """
+    Guarda o reemplaza la huella de un objeto. No hace commit.
+
+    Con valor None queda una fila sin hash para no reintentar imágenes ilegibles.
+    """
+    if valor is None:
+        cursor.execute(
+            """
+            INSERT INTO public."Huellas_imagenes" ("ID_OBJETO") VALUES (%s)
+            ON CONFLICT ("ID_OBJETO") DO NOTHING
+            """,
+            (id_objeto,),
+        )
+        return
+    cursor.execute(
+        """
+        INSERT INTO public."Huellas_imagenes" ("ID_OBJETO", "HASH", "BANDAS")
+        VALUES (%s, %s, %s)
+        ON CONFLICT ("ID_OBJETO") DO UPDATE
+        SET "HASH" = EXCLUDED."HASH", "BANDAS" = EXCLUDED."BANDAS", "FECHA" = CURRENT_TIMESTAMP
+        """,
+        (id_objeto, _con_signo(valor), bandas_hash(valor)),
+    )
+
+
+def buscar_similares(cursor, valor, excluir_objeto=None, distancia=DISTANCIA_MAXIMA, limite=LIMITE_SIMILARES):
+    """
+    Objetos cuya imagen está a `distancia` bits o menos del hash dado.
+
+    Args:
+        cursor: Cursor RealDictCursor
+        valor (int): Hash sin signo
+        excluir_objeto (str): ID de objeto a omitir (normalmente el propio)
+
+    Returns:
+        list: Filas con id_objeto, distancia, NOMBRE, IMAGEN, tipo, id_reporte, ID_USUARIO
+    """
+    firmado = _con_signo(valor)
+    cursor.execute(
+        """
+        SELECT s.id_objeto, s.distancia, o."NOMBRE", o."IMAGEN",
+               r."TIPO" AS tipo, r."ID_REPORTE" AS id_reporte, r."ID_USUARIO"
+        FROM (
+            SELECT h."ID_OBJETO" AS id_objeto,
+                   bit_count((h."HASH" # %s)::bit(64)) AS distancia
+            FROM public."Huellas_imagenes" h
+            WHERE h."BANDAS" && %s::int[]
+              AND h."ID_OBJETO" IS DISTINCT FROM %s
+        ) s
+        JOIN public."Objetos" o ON o."ID_OBJETO" = s.id_objeto
+        LEFT JOIN public."Reportes" r ON r."ID_OBJETO" = s.id_objeto
+        WHERE s.distancia <= %s
+        ORDER BY s.distancia, s.id_objeto
+        LIMIT %s
+        """,
+        (firmado, bandas_hash(valor), excluir_objeto, distancia, limite),
+    )
+    return cursor.fetchall()
+
+
+def listar_pares_duplicados(cursor, distancia=DISTANCIA_MAXIMA, llave=None, limite=50, lote=LOTE_PARES):
+    """
+    Pares de objetos con imágenes casi idénticas, los más recientes primero.
+
+    Cada página recorre solo las `lote` huellas más nuevas a partir de
+    `llave` y compara cada una con a lo sumo CANDIDATOS_POR_HUELLA huellas
+    más viejas que comparten alguna banda (índice GIN). Así el costo no
+    depende del total de imágenes ni de cuántas comparten una banda común,
+    como las fotos en blanco. Cada par sale una vez, con la fecha del más nuevo.
+
+    Args:
+        cursor: Cursor RealDictCursor
+        llave (list): [FECHA, ID_OBJETO] de la última huella de la página anterior
+
+    Returns:
+        tuple: (pares, llave de la página siguiente o None)
+    """
+    condicion = ""
+    params = []
+    if llave:
+        condicion = 'AND ("FECHA", "ID_OBJETO") < (%s::timestamp, %s)'
+        params.extend(llave)
+    params += [lote, CANDIDATOS_POR_HUELLA, distancia, PARES_POR_HUELLA]
+
+    cursor.execute(
+        f"""
+        WITH recientes AS (
+            SELECT "ID_OBJETO", "HASH", "BANDAS", "FECHA"
+            FROM public."Huellas_imagenes"
+            WHERE "HASH" IS NOT NULL AND "FECHA" IS NOT NULL {condicion}
+            ORDER BY "FECHA" DESC, "ID_OBJETO" DESC
+            LIMIT %s
+        )
+        SELECT a."ID_OBJETO" AS id_objeto_a, p.id_objeto_b, p.distancia,
+               oa."NOMBRE" AS nombre_a, oa."IMAGEN" AS imagen_a,
+               ob."NOMBRE" AS nombre_b, ob."IMAGEN" AS imagen_b,
+               a."FECHA" AS fecha
+        FROM recientes a
+        JOIN public."Objetos" oa ON oa."ID_OBJETO" = a."ID_OBJETO"
+        LEFT JOIN LATERAL (
+            SELECT c.id_objeto_b, c.distancia
+            FROM (
+                SELECT b."ID_OBJETO" AS id_objeto_b,
+                       bit_count((a."HASH" # b."HASH")::bit(64)) AS distancia
+                FROM public."Huellas_imagenes" b
+                WHERE b."BANDAS" && a."BANDAS"
+                  AND (b."FECHA", b."ID_OBJETO") < (a."FECHA", a."ID_OBJETO")
+                LIMIT %s
+            ) c
+            WHERE c.distancia <= %s
+            ORDER BY c.distancia
+            LIMIT %s
+        ) p ON TRUE
+        LEFT JOIN public."Objetos" ob ON ob."ID_OBJETO" = p.id_objeto_b
+        ORDER BY a."FECHA" DESC, a."ID_OBJETO" DESC, p.distancia
+        """,
+        params,
+    )
+
+    # la página termina al completar la huella en la que se llega a `limite`
+    pares = []
+    siguiente = None
+    actual = None
+    vistas = 0
+    for fila in cursor.fetchall():
+        clave = [fila["fecha"], fila["id_objeto_a"]]
+        if clave != actual:
+            if len(pares) >= limite:
+                break
+            actual = siguiente = clave
+            vistas += 1
+        if fila["id_objeto_b"] is not None:
+            pares.append(fila)
+    else:
+        if vistas < lote:
+            siguiente = None
+    return pares, siguiente
+
+
+def calcular_huellas_pendientes(conexion, carpeta_uploads, limite=200):
+    """
+    Calcula huellas de objetos con imagen que aún no la tienen (datos antiguos).
+
+    Returns:
+        int: Cantidad de huellas guardadas
+    """
+    cursor = conexion.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(
+            """
+            SELECT o."ID_OBJETO", o."IMAGEN"
+            FROM public."Objetos" o
+            LEFT JOIN public."Huellas_imagenes" h ON h."ID_OBJETO" = o."ID_OBJETO"
+            WHERE h."ID_OBJETO" IS NULL AND o."IMAGEN" LIKE '/uploads/%%'
+            LIMIT %s
+            """,
+            (limite,),
+        )
+        guardadas = 0
+        for fila in cursor.fetchall():
+            ruta = os.path.join(carpeta_uploads, os.path.basename(fila["IMAGEN"]))
+            valor = calcular_dhash(ruta)
+            registrar_huella(cursor, fila["ID_OBJETO"], valor)
+            guardadas += valor is not None
+        conexion.commit()
+        return guardadas
+    finally:
+        cursor.close()
@@ -0,0 +1,285 @@
+"""
+Intentos fallidos de login y de recuperación, fuera de la fila de Usuarios.
+
+Antes cada respuesta incorrecta actualizaba INTENTOS_RECUPERACION y
+BLOQUEADO_HASTA en Usuarios: bajo fuerza bruta eso era una escritura por
+intento sobre la fila más leída de la base. Ahora los fallos se cuentan
+aquí con una ventana deslizante aproximada (ventana actual + anterior
+ponderada por lo que falta de ella) y al pasar el máximo la clave queda
+bloqueada un tiempo.
+
+Políticas (POLITICAS, configurables con INTENTOS_<TIPO>="max/ventana/bloqueo"
+en segundos):
+
+- "login": por cuenta, 10 fallos en 15 min -> 15 min de bloqueo.
+- "recuperacion": por cuenta, 5 fallos en 10 min -> 10 min de bloqueo.
+
+Backends, elegidos con INTENTOS_URL (por defecto el Redis de CACHE_URL si
+lo hay y si no "postgres", para que el bloqueo sea compartido y sobreviva a
+un reinicio como cuando vivía en Usuarios):
+
+- IntentosMemoria: por proceso, acotado a MAX_CLAVES.
+- IntentosRedis: compartido; cada operación es un script Lua. Si Redis
+  falla en una petición cuenta en memoria hasta que vuelva.
+- IntentosPostgres ("postgres"): tabla UNLOGGED "Intentos"; el fallo es
+  una llamada a la función registrar_intento() y de paso purga vencidos.
+
+Cada petición hace a lo sumo una consulta de estado(); registrar un fallo
+o limpiar tras un acierto solo ocurre cuando hace falta.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+MAX_CLAVES = 100_000
+
+# tipo -> (máximo de fallos, ventana en segundos, bloqueo en segundos)
+POLITICAS = {
+    "login": (10, 900, 900),
+    "recuperacion": (5, 600, 600),
+}
+
+
+def _deslizar(registro, ahora, ventana):
+    """
+    Lleva [indice, actual, anterior] a la ventana de `ahora` y devuelve la
+    estimación de fallos en los últimos `ventana` segundos.
+    """
+    indice = int(ahora // ventana)
+    if registro[0] != indice:
+        registro[2] = registro[1] if registro[0] == indice - 1 else 0
+        registro[1] = 0
+        registro[0] = indice
+    transcurrido = (ahora - indice * ventana) / ventana
+    return registro[2] * (1 - transcurrido) + registro[1]
+
+
+class IntentosMemoria:
+    """Contadores en memoria del proceso."""
+
+    nombre = "memoria"
+
+    def __init__(self, max_claves=MAX_CLAVES):
+        self._datos = OrderedDict()  # clave -> [indice, actual, anterior, bloqueado_hasta, vence]
+        self._max_claves = max_claves
+        self._lock = threading.Lock()
+
+    def estado(self, clave):
+        ahora = time.time()
+        with self._lock:
+            registro = self._datos.get(clave)
+            if registro is None:
+                return 0.0, False
+            if registro[4] < ahora:
+                del self._datos[clave]
+                return 0.0, False
+            return max(0.0, registro[3] - ahora), True
+
+    def fallo(self, clave, maximo, ventana, bloqueo):
+        ahora = time.time()
+        with self._lock:
+            registro = self._datos.get(clave)
+            if registro is None or registro[4] < ahora:
+                registro = self._datos[clave] = [int(ahora // ventana), 0, 0, 0.0, 0.0]
+                if len(self._datos) > self._max_claves:
+                    self._datos.popitem(last=False)
+            else:
+                self._datos.move_to_end(clave)
+            registro[1] += 1
+            intentos = _deslizar(registro, ahora, ventana)
+            if intentos >= maximo:
+                registro[1] = registro[2] = 0
+                registro[3] = ahora + bloqueo
+            registro[4] = max(registro[3], (registro[0] + 2) * ventana)
+            return math.ceil(intentos), max(0.0, registro[3] - ahora)
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+
+_FALLO_REDIS = """
+local r = redis.call('HMGET', KEYS[1], 'indice', 'actual', 'anterior', 'bloqueado')
+local ahora = tonumber(ARGV[1])
+local maximo = tonumber(ARGV[2])
+local ventana = tonumber(ARGV[3])
+local bloqueo = tonumber(ARGV[4])
+local indice = math.floor(ahora / ventana)
+local actual = tonumber(r[2]) or 0
+local anterior = tonumber(r[3]) or 0
+local bloqueado = tonumber(r[4]) or 0
+local previo = tonumber(r[1])
+if previo ~= indice then
+    if previo == indice - 1 then anterior = actual else anterior = 0 end
+    actual = 0
+end
+actual = actual + 1
+local intentos = anterior * (1 - (ahora - indice * ventana) / ventana) + actual
+if intentos >= maximo then
+    actual = 0
+    anterior = 0
+    bloqueado = ahora + bloqueo
+end
+redis.call('HSET', KEYS[1], 'indice', indice, 'actual', actual, 'anterior', anterior,
+           'bloqueado', tostring(bloqueado))
+redis.call('EXPIREAT', KEYS[1], math.ceil(math.max(bloqueado, (indice + 2) * ventana)))
+return {math.ceil(intentos), tostring(math.max(0, bloqueado - ahora))}
+"""
+
+
+class IntentosRedis:
+    """Contadores en Redis, compartidos por todos los procesos."""
+
+    nombre = "redis"
+
+    def __init__(self, url):
+        import redis  # dependencia opcional
+
+        self._error = redis.exceptions.RedisError
+        self._cliente = redis.Redis.from_url(url)
+        self._cliente.ping()  # from_url no conecta; sin esto crear_intentos nunca cae a memoria
+        self._fallo = self._cliente.register_script(_FALLO_REDIS)
+        self._respaldo = IntentosMemoria()
+        self._caido = False
+
+    def _clave(self, clave):
+        return "orio:intentos:" + clave
+
+    def _sin_redis(self, e):
+        if not self._caido:
+            print(f"⚠ Redis de intentos no responde, se usa memoria: {e}")
+            self._caido = True
+        return self._respaldo
+
+    def estado(self, clave):
+        try:
+            bloqueado = self._cliente.hget(self._clave(clave), "bloqueado")
+        except self._error as e:
+            return self._sin_redis(e).estado(clave)
+        self._caido = False
+        if bloqueado is None:
+            return 0.0, False
+        return max(0.0, float(bloqueado) - time.time()), True
+
+    def fallo(self, clave, maximo, ventana, bloqueo):
+        try:
+            intentos, espera = self._fallo(
+                keys=[self._clave(clave)], args=[time.time(), maximo, ventana, bloqueo]
+            )
+        except self._error as e:
+            return self._sin_redis(e).fallo(clave, maximo, ventana, bloqueo)
+        return int(intentos), float(espera)
+
+    def limpiar(self, clave):
+        self._respaldo.limpiar(clave)
+        try:
+            self._cliente.delete(self._clave(clave))
+        except self._error as e:
+            self._sin_redis(e)
+
+
+class IntentosPostgres:
+    """Contadores en la tabla UNLOGGED "Intentos" (ver database.REGISTRAR_INTENTO)."""
+
+    nombre = "postgres"
+
+    def __init__(self, conectar):
+        self._conectar = conectar
+
+    def _ejecutar(self, sql, parametros):
+        conexion = self._conectar()
+        if not conexion:
+            raise ConnectionError("Sin conexión a la base para los intentos")
+        try:
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute(sql, parametros)
+                return cursor.fetchone() if cursor.description else None
+        finally:
+            conexion.close()
+
+    def estado(self, clave):
+        fila = self._ejecutar(
+            """
+            SELECT GREATEST(0, "BLOQUEADO_HASTA" - extract(epoch FROM now()))
+            FROM public."Intentos"
+            WHERE "CLAVE" = %s AND "VENCE" > extract(epoch FROM now())
+            """,
+            (clave,),
+        )
+        if not fila:
+            return 0.0, False
+        return float(fila[0]), True
+
+    def fallo(self, clave, maximo, ventana, bloqueo):
+        intentos, espera = self._ejecutar(
+            "SELECT * FROM public.registrar_intento(%s, %s, %s, %s)",
+            (clave, maximo, ventana, bloqueo),
+        )
+        return intentos, float(espera)
+
+    def limpiar(self, clave):
+        self._ejecutar('DELETE FROM public."Intentos" WHERE "CLAVE" = %s', (clave,))
+
+
+def crear_intentos(url=None, conectar=None):
+    """Como cache.crear_backend(), más "postgres" para la tabla UNLOGGED."""
+    if url == "postgres" and conectar:
+        return IntentosPostgres(conectar)
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            return IntentosRedis(url)
+        except Exception as e:
+            print(f"⚠ Intentos en Redis no disponibles, se usa memoria: {e}")
+    return IntentosMemoria()
+
+
+intentos = IntentosMemoria()
+_politicas = dict(POLITICAS)
+
+
+def configurar_intentos(app, conectar=None):
+    """Configura el backend (INTENTOS_URL) y las políticas INTENTOS_<TIPO>."""
+    global intentos
+    url = app.config.get("INTENTOS_URL")
+    if not url:
+        cache_url = app.config.get("CACHE_URL") or ""
+        url = cache_url if cache_url.startswith(("redis://", "rediss://")) else "postgres"
+    intentos = crear_intentos(url, conectar)
+    for tipo in POLITICAS:
+        valor = app.config.get(f"INTENTOS_{tipo.upper()}")
+        if valor:
+            _politicas[tipo] = tuple(int(v) for v in str(valor).split("/"))
+
+
+def bloqueo_restante(tipo, clave):
+    """
+    Una sola consulta al backend.
+
+    Returns:
+        tuple: (segundos de bloqueo restantes, True si hay fallos registrados)
+    """
+    espera, hay_fallos = intentos.estado(f"{tipo}:{clave}")
+    return math.ceil(espera), hay_fallos
+
+
+def registrar_fallo(tipo, clave):
+    """
+    Cuenta un fallo y bloquea la clave si llega al máximo.
+
+    Returns:
+        tuple: (fallos en la ventana, segundos de bloqueo; 0 si no quedó bloqueada)
+    """
+    maximo, ventana, bloqueo = _politicas[tipo]
+    fallos, espera = intentos.fallo(f"{tipo}:{clave}", maximo, ventana, bloqueo)
+    return fallos, math.ceil(espera)
+
+
+def limpiar_fallos(tipo, clave):
+    """Olvida los fallos tras un acierto."""
+    intentos.limpiar(f"{tipo}:{clave}")
+
+
+def maximo_fallos(tipo):
+    return _politicas[tipo][0]
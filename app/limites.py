@@ -0,0 +1,182 @@
+"""
+Límite de intentos con token bucket.
+
+Cada clave (por ejemplo "login:ip:1.2.3.4" o "login:cuenta:ana") tiene un
+balde de `capacidad` fichas que se rellena a `por_minuto` fichas por
+minuto. Cada intento gasta una; sin fichas se responde 429 con
+Retry-After. Así una ráfaga de credential stuffing se corta antes de
+llegar al hash de la contraseña, que es lo caro.
+
+Backends, igual que en cache.py:
+
+- LimitadorMemoria: por proceso, acotado a MAX_CLAVES baldes.
+- LimitadorRedis: compartido entre procesos (script Lua atómico). Si
+  Redis falla en una petición usa baldes en memoria hasta que vuelva.
+
+LIMITES_URL elige el backend (por defecto el de CACHE_URL).
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+MAX_CLAVES = 100_000
+
+# nombre -> (capacidad, fichas por minuto) por defecto
+LIMITES_DEFECTO = {
+    "login_ip": (20, 10),
+    "login_cuenta": (5, 2),
+    "registro_ip": (5, 2),
+    "recuperar_ip": (10, 5),
+}
+
+
+class LimitadorMemoria:
+    """Baldes en memoria del proceso."""
+
+    nombre = "memoria"
+
+    def __init__(self, max_claves=MAX_CLAVES):
+        self._baldes = OrderedDict()  # clave -> [fichas, instante]
+        self._max_claves = max_claves
+        self._lock = threading.Lock()
+
+    def consumir(self, clave, capacidad, por_segundo, costo=1):
+        ahora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get(clave)
+            if balde is None:
+                balde = self._baldes[clave] = [capacidad, ahora]
+                if len(self._baldes) > self._max_claves:
+                    # el balde más viejo se olvida: vuelve a empezar lleno
+                    self._baldes.popitem(last=False)
+            else:
+                self._baldes.move_to_end(clave)
+            fichas = min(capacidad, balde[0] + (ahora - balde[1]) * por_segundo)
+            balde[1] = ahora
+            if fichas >= costo:
+                balde[0] = fichas - costo
+                return True, 0.0
+            balde[0] = fichas
+            return False, (costo - fichas) / por_segundo
+
+
+_SCRIPT_REDIS = """
+local balde = redis.call('HMGET', KEYS[1], 'fichas', 'instante')
+local capacidad = tonumber(ARGV[1])
+local tasa = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local costo = tonumber(ARGV[4])
+local fichas = tonumber(balde[1]) or capacidad
+local instante = tonumber(balde[2]) or ahora
+fichas = math.min(capacidad, fichas + math.max(0, ahora - instante) * tasa)
+local permitido = 0
+local espera = 0
+if fichas >= costo then
+    fichas = fichas - costo
+    permitido = 1
+else
+    espera = (costo - fichas) / tasa
+end
+redis.call('HSET', KEYS[1], 'fichas', tostring(fichas), 'instante', tostring(ahora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / tasa) + 1)
+return {permitido, tostring(espera)}
+"""
+
+
+class LimitadorRedis:
+    """Baldes en Redis, compartidos por todos los procesos."""
+
+    nombre = "redis"
+
+    def __init__(self, url):
+        import redis  # dependencia opcional
+
+        self._error = redis.exceptions.RedisError
+        self._cliente = redis.Redis.from_url(url)
+        self._cliente.ping()  # from_url no conecta; sin esto crear_limitador nunca cae a memoria
+        self._script = self._cliente.register_script(_SCRIPT_REDIS)
+        self._respaldo = LimitadorMemoria()
+        self._caido = False
+
+    def consumir(self, clave, capacidad, por_segundo, costo=1):
+        try:
+            permitido, espera = self._script(
+                keys=["orio:limite:" + clave], args=[capacidad, por_segundo, time.time(), costo]
+            )
+        except self._error as e:
+            if not self._caido:
+                print(f"⚠ Redis de límites no responde, se usa memoria: {e}")
+                self._caido = True
+            return self._respaldo.consumir(clave, capacidad, por_segundo, costo)
+        self._caido = False
+        return bool(permitido), float(espera)
+
+
+def crear_limitador(url=None):
+    """Como cache.crear_backend(): Redis si la URL lo pide y está disponible."""
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            return LimitadorRedis(url)
+        except Exception as e:
+            print(f"⚠ Límites en Redis no disponibles, se usa memoria: {e}")
+    return LimitadorMemoria()
+
+
+limitador = LimitadorMemoria()
+_limites = dict(LIMITES_DEFECTO)
+
+
+def configurar_limites(app):
+    """
+    Configura el backend (LIMITES_URL) y los límites LIMITE_<NOMBRE> con
+    formato "capacidad/por_minuto", por ejemplo LIMITE_LOGIN_IP=20/10.
+    """
+    global limitador
+    limitador = crear_limitador(app.config.get("LIMITES_URL") or app.config.get("CACHE_URL"))
+    for nombre in LIMITES_DEFECTO:
+        valor = app.config.get(f"LIMITE_{nombre.upper()}")
+        if valor:
+            capacidad, _, por_minuto = str(valor).partition("/")
+            _limites[nombre] = (float(capacidad), float(por_minuto))
+
+
+def consumir(nombre, clave):
+    """
+    Gasta una ficha del límite `nombre` para `clave`.
+
+    Returns:
+        tuple: (permitido, segundos hasta la próxima ficha)
+    """
+    if not current_app.config.get("LIMITES_ACTIVOS", True):
+        return True, 0.0
+    capacidad, por_minuto = _limites[nombre]
+    return limitador.consumir(f"{nombre}:{clave}", capacidad, por_minuto / 60)
+
+
+def respuesta_limite(espera, mensaje="Demasiados intentos, espera un momento"):
+    """Respuesta 429 con Retry-After."""
+    respuesta = jsonify({"ok": False, "mensaje": mensaje, "segundos_restantes": math.ceil(espera)})
+    respuesta.status_code = 429
+    respuesta.headers["Retry-After"] = str(math.ceil(espera))
+    return respuesta
+
+
+def limitar_por_ip(nombre):
+    """Decorador: aplica el límite `nombre` por IP antes de entrar a la ruta."""
+
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            permitido, espera = consumir(nombre, request.remote_addr or "desconocida")
+            if not permitido:
+                return respuesta_limite(espera)
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorador
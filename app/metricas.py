@@ -0,0 +1,402 @@
+"""
+Instrumentación de peticiones y consultas.
+
+- ConexionMedida: conexión de psycopg2 (conectar_db la usa como
+  connection_factory) cuyos cursores miden cada execute(): tiempo, filas
+  y texto de la consulta. Respeta el cursor_factory que pida el código
+  (RealDictCursor, etc.).
+- instrumentar(app): hooks de Flask que acumulan por petición el tiempo
+  total, el tiempo en la base, el número de consultas y las filas; los
+  agregan en histogramas por ruta y agregan la cabecera Server-Timing.
+- Registro de lentas: consultas de más de CONSULTA_LENTA_MS y peticiones
+  de más de SOLICITUD_LENTA_MS se imprimen con el SQL normalizado (sin
+  literales) y solo los tipos de los parámetros, nunca sus valores.
+- /metrics: todo lo anterior en formato de texto de Prometheus, más los
+  contadores de la caché. Los valores son por proceso; con varios workers
+  Prometheus debe raspar cada uno. Sin METRICAS_TOKEN solo responde a
+  peticiones directas desde la misma máquina.
+- Captura de sentencias: con la auditoría activa (ver auditoria.py) cada
+  petición guarda también la lista de sus consultas.
+"""
+
+import hmac
+import re
+import threading
+import time
+from typing import NamedTuple
+
+from flask import Response, g, has_request_context, request
+from psycopg2.extensions import connection as _ConexionBase
+from psycopg2.extensions import cursor as _CursorBase
+
+from .cache import cache_consultas
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+CONSULTA_LENTA_MS = 200
+SOLICITUD_LENTA_MS = 1000
+
+# límites de los histogramas, en segundos
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# límites del histograma de consultas por petición
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_umbrales = {"consulta": CONSULTA_LENTA_MS / 1000, "solicitud": SOLICITUD_LENTA_MS / 1000}
+
+# True guarda las sentencias de cada petición en g.medicion["sentencias"]
+_captura = {"peticiones": False}
+# sentencias del hilo actual entre iniciar_captura() y terminar_captura()
+_hilo = threading.local()
+
+
+# ========================
+# SQL NORMALIZADO
+# ========================
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"(?<![\w\"$])-?\d+(?:\.\d+)?\b")
+_MARCADORES = re.compile(r"%\(\w+\)s|%s")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql):
+    """
+    SQL sin literales ni espacios repetidos, para agrupar consultas iguales
+    con valores distintos.
+
+    Cadenas, números y marcadores de parámetros pasan a ?, y las listas
+    de ? a (...).
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    elif not isinstance(sql, str):
+        # psycopg2.sql.Composed y similares
+        sql = str(sql)
+    sql = _CADENAS.sub("?", sql)
+    sql = _MARCADORES.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    sql = _LISTAS.sub("(...)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def _describir_parametros(params):
+    """Tipos de los parámetros, sin sus valores: [str, int, list[3]]"""
+    if params is None:
+        return "[]"
+    valores = params.values() if isinstance(params, dict) else params
+    tipos = []
+    for valor in valores:
+        if isinstance(valor, (list, tuple)):
+            tipos.append(f"{type(valor).__name__}[{len(valor)}]")
+        else:
+            tipos.append(type(valor).__name__)
+    return "[" + ", ".join(tipos) + "]"
+
+
+# ========================
+# CURSORES MEDIDOS
+# ========================
+
+
+class _Medicion:
+    """Mixin que mide execute() y executemany() de un cursor de psycopg2."""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            registrar_consulta(query, vars, time.perf_counter() - inicio, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            registrar_consulta(query, None, time.perf_counter() - inicio, self.rowcount)
+
+
+# ========================
+# CAPTURA DE SENTENCIAS
+# ========================
+
+
+class Sentencia(NamedTuple):
+    """Consulta capturada: SQL normalizado, huella de SQL + parámetros y filas."""
+
+    sql: str
+    huella: int
+    filas: int
+
+
+def iniciar_captura():
+    """Empieza a guardar las consultas que ejecute este hilo."""
+    _hilo.sentencias = []
+
+
+def terminar_captura():
+    """
+    Deja de guardar las consultas del hilo.
+
+    Returns:
+        list[Sentencia]: Las consultas desde iniciar_captura()
+    """
+    sentencias = getattr(_hilo, "sentencias", None) or []
+    _hilo.sentencias = None
+    return sentencias
+
+
+def capturar_peticiones(activo):
+    """Guarda o no las sentencias de cada petición en g.medicion."""
+    _captura["peticiones"] = bool(activo)
+
+
+# ========================
+# CONEXIÓN
+# ========================
+
+
+_clases_medidas = {}
+_lock_clases = threading.Lock()
+
+
+def _clase_medida(base):
+    """Subclase de `base` con _Medicion, creada una vez por clase de cursor."""
+    clase = _clases_medidas.get(base)
+    if clase is None:
+        with _lock_clases:
+            clase = _clases_medidas.get(base)
+            if clase is None:
+                clase = type(f"{base.__name__}Medido", (_Medicion, base), {})
+                _clases_medidas[base] = clase
+    return clase
+
+
+class ConexionMedida(_ConexionBase):
+    """Conexión cuyos cursores, de cualquier cursor_factory, se miden."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or _CursorBase
+        kwargs["cursor_factory"] = _clase_medida(base)
+        return super().cursor(*args, **kwargs)
+
+
+def registrar_consulta(sql, params, duracion, filas):
+    """
+    Suma una consulta a la petición en curso y la imprime si fue lenta.
+
+    También se llama desde hilos sin petición (trabajadores en segundo
+    plano); ahí solo aplica el registro de lentas y la captura del hilo.
+    """
+    filas = max(filas, 0)
+    medicion = g.get("medicion") if has_request_context() else None
+    if medicion is not None:
+        medicion["db"] += duracion
+        medicion["consultas"] += 1
+        medicion["filas"] += filas
+
+    capturadas = getattr(_hilo, "sentencias", None)
+    if capturadas is not None or (medicion is not None and medicion["sentencias"] is not None):
+        # la huella distingue sentencias idénticas sin guardar los parámetros
+        sentencia = Sentencia(normalizar_sql(sql), hash((str(sql), repr(params))), filas)
+        if capturadas is not None:
+            capturadas.append(sentencia)
+        if medicion is not None and medicion["sentencias"] is not None:
+            medicion["sentencias"].append(sentencia)
+
+    if duracion >= _umbrales["consulta"]:
+        _metricas.consultas_lentas.sumar(1, ruta=_ruta_actual())
+        print(
+            f"[LENTA] {duracion * 1000:.1f} ms, {filas} filas, "
+            f"params={_describir_parametros(params)}: {normalizar_sql(sql)}"
+        )
+
+
+# ========================
+# MÉTRICAS
+# ========================
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+class Contador:
+    """Contador de Prometheus con etiquetas."""
+
+    def __init__(self, nombre, ayuda):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def sumar(self, cantidad=1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            for clave, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(clave)} {valor}")
+        return lineas
+
+
+class Histograma:
+    """Histograma de Prometheus con etiquetas y límites fijos."""
+
+    def __init__(self, nombre, ayuda, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            for clave, (conteos, suma, total) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, conteo in zip(self.buckets, conteos):
+                    acumulado += conteo
+                    lineas.append(f"{self.nombre}_bucket{_etiquetas(clave, [('le', limite)])} {acumulado}")
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(clave, [('le', '+Inf')])} {total}")
+                lineas.append(f"{self.nombre}_sum{_etiquetas(clave)} {suma}")
+                lineas.append(f"{self.nombre}_count{_etiquetas(clave)} {total}")
+        return lineas
+
+
+class _Metricas:
+    def __init__(self):
+        self.solicitudes = Contador("orio_solicitudes_total", "Peticiones atendidas por ruta y estado HTTP")
+        self.duracion = Histograma(
+            "orio_solicitud_duracion_segundos", "Duración de las peticiones por ruta", BUCKETS_SEGUNDOS
+        )
+        self.duracion_db = Histograma(
+            "orio_solicitud_db_segundos", "Tiempo en la base de datos por petición", BUCKETS_SEGUNDOS
+        )
+        self.consultas = Histograma(
+            "orio_solicitud_consultas", "Consultas SQL por petición", BUCKETS_CONSULTAS
+        )
+        self.filas = Contador("orio_filas_total", "Filas devueltas o modificadas por las consultas, por ruta")
+        self.consultas_lentas = Contador("orio_consultas_lentas_total", "Consultas más lentas que CONSULTA_LENTA_MS")
+
+    def exponer(self):
+        lineas = []
+        for metrica in (
+            self.solicitudes, self.duracion, self.duracion_db, self.consultas, self.filas, self.consultas_lentas
+        ):
+            lineas += metrica.exponer()
+
+        cache = cache_consultas.metricas()
+        lineas += ["# HELP orio_cache_total Operaciones de la caché de listados", "# TYPE orio_cache_total counter"]
+        for evento in ("aciertos", "fallos", "esperas", "invalidaciones", "errores"):
+            lineas.append(f'orio_cache_total{{evento="{evento}"}} {cache.get(evento, 0)}')
+        return "\n".join(lineas) + "\n"
+
+
+_metricas = _Metricas()
+
+
+# ========================
+# HOOKS DE FLASK
+# ========================
+
+
+def _ruta_actual():
+    """Patrón de la ruta (/reportes/<id>), no la URL, para no crear una serie por ID."""
+    if not has_request_context():
+        return "sin_peticion"
+    regla = request.url_rule
+    return regla.rule if regla is not None else "sin_ruta"
+
+
+def _es_local():
+    """True si la petición llegó directo desde loopback, sin pasar por un proxy."""
+    if request.headers.get("X-Forwarded-For") or request.headers.get("Forwarded"):
+        return False
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+def instrumentar(app):
+    """
+    Registra la medición por petición y la ruta /metrics.
+
+    Config:
+        CONSULTA_LENTA_MS, SOLICITUD_LENTA_MS: umbrales del registro de lentas
+        METRICAS_TOKEN: si está definido, /metrics exige "Authorization: Bearer <token>";
+            si no, solo atiende peticiones de loopback que no pasaron por un proxy
+    """
+    _umbrales["consulta"] = app.config.get("CONSULTA_LENTA_MS", CONSULTA_LENTA_MS) / 1000
+    _umbrales["solicitud"] = app.config.get("SOLICITUD_LENTA_MS", SOLICITUD_LENTA_MS) / 1000
+
+    @app.before_request
+    def iniciar_medicion():
+        g.medicion = {
+            "inicio": time.perf_counter(),
+            "db": 0.0,
+            "consultas": 0,
+            "filas": 0,
+            "sentencias": [] if _captura["peticiones"] else None,
+        }
+
+    @app.after_request
+    def cerrar_medicion(response):
+        medicion = g.pop("medicion", None)
+        if medicion is None:
+            return response
+        duracion = time.perf_counter() - medicion["inicio"]
+        ruta = _ruta_actual()
+        metodo = request.method
+
+        _metricas.solicitudes.sumar(1, metodo=metodo, ruta=ruta, estado=response.status_code)
+        _metricas.duracion.observar(duracion, metodo=metodo, ruta=ruta)
+        _metricas.duracion_db.observar(medicion["db"], metodo=metodo, ruta=ruta)
+        _metricas.consultas.observar(medicion["consultas"], metodo=metodo, ruta=ruta)
+        _metricas.filas.sumar(medicion["filas"], ruta=ruta)
+
+        response.headers["Server-Timing"] = (
+            f"db;dur={medicion['db'] * 1000:.1f}, app;dur={duracion * 1000:.1f}"
+        )
+        if duracion >= _umbrales["solicitud"]:
+            print(
+                f"[LENTA] {metodo} {ruta} {response.status_code}: {duracion * 1000:.0f} ms, "
+                f"db {medicion['db'] * 1000:.0f} ms, {medicion['consultas']} consultas, "
+                f"{medicion['filas']} filas"
+            )
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        token = app.config.get("METRICAS_TOKEN")
+        if token:
+            recibido = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(recibido.encode(), f"Bearer {token}".encode()):
+                return Response("no autorizado\n", status=401, mimetype="text/plain")
+        elif not _es_local():
+            return Response("defina METRICAS_TOKEN para leer /metrics\n", status=403, mimetype="text/plain")
+        return Response(_metricas.exponer(), mimetype="text/plain; version=0.0.4")
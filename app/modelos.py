@@ -0,0 +1,161 @@
+"""
+Modelos livianos para filas de la base de datos.
+
+Cada clase usa __slots__, así que una fila ocupa un objeto sin diccionario
+propio en lugar de un RealDictRow con todas las claves repetidas. Se llenan
+desde cursores de tuplas (ver repositorio.py): el orden de __slots__ es el
+orden de las columnas del SELECT, por eso Clase(*fila) arma el objeto.
+
+a_dict() devuelve las claves que ya usa el API para cada entidad, y
+serializacion.py la llama sola cuando un modelo llega a una respuesta JSON.
+"""
+
+from datetime import datetime
+
+
+class Modelo:
+    """Base común: construcción desde filas, comparación y conversión a dict."""
+
+    __slots__ = ()
+
+    # clave JSON de cada atributo, en el mismo orden que __slots__
+    CLAVES = ()
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Convierte las tuplas de fetchall() en una lista de modelos."""
+        return [cls(*fila) for fila in filas]
+
+    def a_dict(self):
+        return {clave: getattr(self, campo) for campo, clave in zip(self.__slots__, self.CLAVES)}
+
+    def __eq__(self, otro):
+        if type(otro) is not type(self):
+            return NotImplemented
+        return all(getattr(self, c) == getattr(otro, c) for c in self.__slots__)
+
+    def __repr__(self):
+        valores = ", ".join(f"{c}={getattr(self, c)!r}" for c in self.__slots__[:3])
+        return f"{type(self).__name__}({valores}, ...)"
+
+
+class Reporte(Modelo):
+    """
+    Reporte perdido o encontrado junto con los datos de su objeto.
+
+    Atributos:
+        tipo (str): "perdido" o "encontrado"
+        id_reporte (str): ID_REPORTE o ID_REPORTE_ENC según el tipo
+        id_objeto (str), nombre (str), color (str), imagen (str | None)
+        fecha (date | datetime), observaciones (str | None)
+        id_categoria (str), nombre_categoria (str | None)
+    """
+
+    __slots__ = (
+        "tipo", "id_reporte", "id_objeto", "nombre", "color", "imagen",
+        "fecha", "observaciones", "id_categoria", "nombre_categoria",
+    )
+    CLAVES = (
+        "tipo", "id_reporte", "ID_OBJETO", "NOMBRE", "COLOR", "IMAGEN",
+        "FECHA", "OBSERVACIONES", "categoria", "nombre_categoria",
+    )
+
+    def __init__(self, tipo, id_reporte, id_objeto, nombre, color, imagen,
+                 fecha, observaciones, id_categoria, nombre_categoria):
+        self.tipo = tipo
+        self.id_reporte = id_reporte
+        self.id_objeto = id_objeto
+        self.nombre = nombre
+        self.color = color
+        self.imagen = imagen
+        self.fecha = fecha
+        self.observaciones = observaciones
+        self.id_categoria = id_categoria
+        self.nombre_categoria = nombre_categoria
+
+
+class Objeto(Modelo):
+    """
+    Objeto reportado.
+
+    Atributos:
+        id_objeto (str), nombre (str), color (str), id_color (str | None)
+        imagen (str | None), id_categoria (str)
+    """
+
+    __slots__ = ("id_objeto", "nombre", "color", "id_color", "imagen", "id_categoria")
+    CLAVES = ("ID_OBJETO", "NOMBRE", "COLOR", "ID_COLOR", "IMAGEN", "ID_CATEGORIA")
+
+    def __init__(self, id_objeto, nombre, color, id_color, imagen, id_categoria):
+        self.id_objeto = id_objeto
+        self.nombre = nombre
+        self.color = color
+        self.id_color = id_color
+        self.imagen = imagen
+        self.id_categoria = id_categoria
+
+
+class Mensaje(Modelo):
+    """
+    Mensaje del buzón con los nombres de remitente, destinatario y objeto.
+
+    Atributos:
+        id_mensaje (int), id_remitente (str), id_destinatario (str)
+        id_objeto (str | None), asunto (str | None), cuerpo (str | None)
+        fecha (datetime), leido (bool)
+        remitente_nombre, destinatario_nombre, objeto_nombre, objeto_imagen (str | None)
+    """
+
+    __slots__ = (
+        "id_mensaje", "id_remitente", "id_destinatario", "id_objeto", "asunto",
+        "cuerpo", "fecha", "leido", "remitente_nombre", "destinatario_nombre",
+        "objeto_nombre", "objeto_imagen",
+    )
+    CLAVES = (
+        "ID_MENSAJE", "ID_REMITENTE", "ID_DESTINATARIO", "ID_OBJETO", "ASUNTO",
+        "CUERPO", "FECHA", "LEIDO", "remitente_nombre", "destinatario_nombre",
+        "objeto_nombre", "objeto_imagen",
+    )
+
+    def __init__(self, id_mensaje, id_remitente, id_destinatario, id_objeto, asunto,
+                 cuerpo, fecha, leido, remitente_nombre=None, destinatario_nombre=None,
+                 objeto_nombre=None, objeto_imagen=None):
+        self.id_mensaje = id_mensaje
+        self.id_remitente = id_remitente
+        self.id_destinatario = id_destinatario
+        self.id_objeto = id_objeto
+        self.asunto = asunto
+        self.cuerpo = cuerpo
+        self.fecha = fecha
+        self.leido = bool(leido)
+        self.remitente_nombre = remitente_nombre
+        self.destinatario_nombre = destinatario_nombre
+        self.objeto_nombre = objeto_nombre
+        self.objeto_imagen = objeto_imagen
+
+    def a_dict(self):
+        datos = super().a_dict()
+        # mismo formato que el resto del buzón
+        if isinstance(self.fecha, datetime):
+            datos["FECHA"] = self.fecha.strftime("%d/%m/%Y %H:%M")
+        return datos
+
+
+class Usuario(Modelo):
+    """
+    Usuario con su nombre de perfil.
+
+    Atributos:
+        id_usuario (str), nombre (str | None), genero (str | None)
+        id_rol (int), contrasena (str): hash, nunca sale en a_dict()
+    """
+
+    __slots__ = ("id_usuario", "nombre", "genero", "id_rol", "contrasena")
+    CLAVES = ("ID_USUARIO", "NOMBRE", "GENERO", "ID_ROL")
+
+    def __init__(self, id_usuario, nombre, genero, id_rol, contrasena=None):
+        self.id_usuario = id_usuario
+        self.nombre = nombre
+        self.genero = genero
+        self.id_rol = id_rol
+        self.contrasena = contrasena
@@ -0,0 +1,116 @@
+"""
+Utilidades de paginación para las APIs de listados.
+
+Contiene funciones comunes reutilizables para:
+- Codificar y decodificar cursores de paginación por llave (keyset)
+- Leer y acotar el tamaño de página desde los parámetros de la petición
+- Obtener un total estimado barato a partir del planificador de PostgreSQL
+
+La paginación por llave evita los OFFSET grandes: cada página pide solo las
+filas posteriores a la última llave vista, de modo que el costo no crece con
+el número de página.
+"""
+
+import base64
+import json
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+LIMITE_POR_DEFECTO = 30
+LIMITE_MAXIMO = 100
+
+
+# ========================
+# CURSORES
+# ========================
+
+
+def codificar_cursor(valores):
+    """
+    Convierte la llave de la última fila en un cursor opaco para el cliente.
+
+    Args:
+        valores (list): Valores de la llave de ordenamiento (serializables a JSON)
+
+    Returns:
+        str: Cursor en base64 seguro para URLs
+    """
+    crudo = json.dumps(valores, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """
+    Recupera la llave de ordenamiento de un cursor generado por codificar_cursor.
+
+    Args:
+        cursor (str): Cursor recibido en la petición
+
+    Returns:
+        list: Valores de la llave o None si el cursor está vacío o es inválido
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def leer_limite(valor, por_defecto=LIMITE_POR_DEFECTO, maximo=LIMITE_MAXIMO):
+    """
+    Interpreta el parámetro de tamaño de página y lo acota a un rango seguro.
+
+    Args:
+        valor: Valor recibido en la petición (texto o None)
+        por_defecto (int): Tamaño usado si el valor falta o es inválido
+        maximo (int): Tamaño máximo permitido
+
+    Returns:
+        int: Tamaño de página entre 1 y maximo
+    """
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return max(1, min(limite, maximo))
+
+
+# ========================
+# TOTALES ESTIMADOS
+# ========================
+
+
+def contar_estimado(cursor, sql, params=None):
+    """
+    Estima cuántas filas devolvería una consulta sin ejecutarla.
+
+    Usa EXPLAIN para leer la estimación del planificador, que cuesta lo mismo
+    que planear la consulta y no recorre la tabla como un COUNT(*).
+
+    Args:
+        cursor: Cursor abierto de psycopg2 (tupla o RealDictCursor)
+        sql (str): Consulta SELECT sin LIMIT
+        params (list): Parámetros de la consulta
+
+    Returns:
+        int: Número estimado de filas o None si no se pudo estimar
+    """
+    try:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params or [])
+        fila = cursor.fetchone()
+    except Exception as e:
+        print(f"Error estimando total: {e}")
+        return None
+
+    plan = fila["QUERY PLAN"] if isinstance(fila, dict) else fila[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (LookupError, TypeError, ValueError):
+        return None
@@ -0,0 +1,301 @@
+"""
+Particiones mensuales por FECHA y archivo de reportes cerrados.
+
+Reportes (dentro de cada partición por tipo) y Notificaciones tienen una
+partición por mes. Casi todas las lecturas miran solo lo reciente (portada,
+estadísticas de 7 días, listados por fecha) y con un filtro sobre FECHA
+PostgreSQL descarta las particiones que quedan fuera del rango.
+
+- asegurar_particiones() crea la partición DEFAULT de cada tabla y las de
+  los próximos MESES_ADELANTE meses. Las filas que caen en DEFAULT (fechas
+  viejas o futuras que escribe el usuario) pasan a su propia partición en
+  la siguiente pasada.
+- archivar_reportes() mueve a Reportes_archivados los reportes cerrados
+  (STATUS encontrado o falso) con más de ARCHIVO_MESES meses, para que no
+  pesen en los listados ni en los índices. Viene apagado (ARCHIVO_MESES=0):
+  ninguna lectura consulta Reportes_archivados, así que un reporte
+  archivado deja de verse en la aplicación.
+- recortar_notificaciones() borra las particiones de notificaciones más
+  viejas que la retención, solo si NOTIFICACIONES_RETENCION_MESES lo pide
+  (por defecto se conserva todo).
+
+Un hilo de mantenimiento corre las tres tareas cada MANTENIMIENTO_INTERVALO
+segundos; un advisory lock evita que dos procesos lo hagan a la vez.
+"""
+
+import re
+import threading
+import time
+from datetime import date
+
+from .cache import invalidar_reportes
+from .feed import quitar_reportes
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+MESES_ADELANTE = 3
+ARCHIVO_MESES_DEFECTO = 0  # meses; 0 no archiva
+RETENCION_NOTIFICACIONES_DEFECTO = 0  # meses; 0 conserva todo
+INTERVALO_DEFECTO = 6 * 60 * 60  # segundos
+TAMANO_LOTE_DEFECTO = 1000
+
+# tablas particionadas por rango de FECHA
+TABLAS_MENSUALES = ("Reportes_tipo_perdido", "Reportes_tipo_encontrado", "Notificaciones")
+
+LLAVE_MANTENIMIENTO = 40040  # pg_try_advisory_lock del mantenimiento
+
+_COLUMNAS_REPORTE = (
+    '"TIPO", "ID_REPORTE", "FECHA", "OBSERVACIONES", "ID_OBJETO", '
+    '"ID_USUARIO", "FICHA", "ID_CATEGORIA", "STATUS"'
+)
+
+
+# ========================
+# MESES
+# ========================
+
+
+def _mes(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+
+def _sumar_meses(mes, n):
+    anios, indice = divmod(mes.month - 1 + n, 12)
+    return date(mes.year + anios, indice + 1, 1)
+
+
+def nombre_particion(tabla, mes):
+    """Reportes_tipo_perdido + 2025-03 -> Reportes_tipo_perdido_2025_03"""
+    return f"{tabla}_{mes:%Y_%m}"
+
+
+def _moviendo_reportes(cursor, activo):
+    """
+    Marca la transacción para que el trigger de Coincidencias no borre
+    coincidencias de filas que solo cambian de partición o de tabla.
+    """
+    cursor.execute(
+        "SELECT set_config('orio.moviendo_reportes', %s, true)",
+        ("on" if activo else "off",),
+    )
+
+
+# ========================
+# PARTICIONES
+# ========================
+
+
+def crear_particion(cursor, tabla, mes):
+    """
+    Crea la partición de un mes y le pasa las filas de ese mes que estaban
+    en la partición DEFAULT. No confirma la transacción.
+
+    Returns:
+        bool: True si la partición no existía
+    """
+    nombre = nombre_particion(tabla, mes)
+    cursor.execute("SELECT to_regclass(%s)", (f'public."{nombre}"',))
+    if cursor.fetchone()[0]:
+        return False
+
+    desde, hasta = mes, _sumar_meses(mes, 1)
+    cursor.execute(
+        f'CREATE TABLE public."{nombre}" (LIKE public."{tabla}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    )
+    _moviendo_reportes(cursor, True)
+    cursor.execute(
+        f"""
+        WITH movidas AS (
+            DELETE FROM public."{tabla}_default"
+            WHERE "FECHA" >= %s AND "FECHA" < %s
+            RETURNING *
+        )
+        INSERT INTO public."{nombre}" SELECT * FROM movidas
+        """,
+        (desde, hasta),
+    )
+    _moviendo_reportes(cursor, False)
+    # ATTACH copia índices, claves foráneas y triggers de la tabla padre
+    cursor.execute(
+        f'ALTER TABLE public."{tabla}" ATTACH PARTITION public."{nombre}" '
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    )
+    return True
+
+
+def asegurar_particiones(cursor, tablas=TABLAS_MENSUALES, hoy=None):
+    """
+    Crea la partición DEFAULT, las de los próximos meses y las de los meses
+    que tengan filas en DEFAULT. No confirma la transacción.
+
+    Returns:
+        int: Particiones creadas
+    """
+    inicio = _mes(hoy or date.today())
+    creadas = 0
+    for tabla in tablas:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS public."{tabla}_default" PARTITION OF public."{tabla}" DEFAULT'
+        )
+        meses = {_sumar_meses(inicio, n) for n in range(MESES_ADELANTE + 1)}
+        cursor.execute(
+            f"""SELECT DISTINCT date_trunc('month', "FECHA")::date FROM public."{tabla}_default" """
+        )
+        meses.update(fila[0] for fila in cursor.fetchall())
+        for mes in sorted(meses):
+            creadas += crear_particion(cursor, tabla, mes)
+    return creadas
+
+
+def recortar_notificaciones(cursor, meses, hoy=None):
+    """
+    Borra las particiones mensuales de Notificaciones anteriores a `meses`
+    meses atrás. No confirma la transacción.
+
+    Returns:
+        int: Particiones borradas
+    """
+    limite = _sumar_meses(_mes(hoy or date.today()), -meses)
+    cursor.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public."Notificaciones"'::regclass
+        """
+    )
+    borradas = 0
+    for (nombre,) in cursor.fetchall():
+        encontrado = re.fullmatch(r"Notificaciones_(\d{4})_(\d{2})", nombre)
+        if encontrado and date(int(encontrado[1]), int(encontrado[2]), 1) < limite:
+            cursor.execute(f'DROP TABLE public."{nombre}"')
+            borradas += 1
+    return borradas
+
+
+# ========================
+# ARCHIVO
+# ========================
+
+
+def archivar_reportes(cursor, meses, tamano_lote=TAMANO_LOTE_DEFECTO, hoy=None):
+    """
+    Mueve un lote de reportes cerrados con fecha anterior a `meses` meses
+    atrás a Reportes_archivados. No confirma la transacción.
+
+    Sus coincidencias se conservan (las confirmadas cuentan como objetos
+    recuperados).
+
+    Returns:
+        int: Reportes archivados
+    """
+    limite = _sumar_meses(_mes(hoy or date.today()), -meses)
+    _moviendo_reportes(cursor, True)
+    # la condición sobre FECHA deja fuera las particiones recientes
+    # solo se borran de Reportes las filas que el INSERT devolvió: si alguna
+    # choca en el archivo se queda donde estaba en vez de perderse
+    cursor.execute(
+        f"""
+        WITH candidatos AS (
+            SELECT {_COLUMNAS_REPORTE} FROM public."Reportes"
+            WHERE "STATUS" IN ('encontrado', 'falso') AND "FECHA" < %s
+            LIMIT %s
+        ), archivados AS (
+            INSERT INTO public."Reportes_archivados" ({_COLUMNAS_REPORTE})
+            SELECT {_COLUMNAS_REPORTE} FROM candidatos
+            ON CONFLICT DO NOTHING
+            RETURNING "TIPO", "ID_REPORTE", "FECHA"
+        )
+        DELETE FROM public."Reportes" r
+        USING archivados a
+        WHERE r."TIPO" = a."TIPO" AND r."ID_REPORTE" = a."ID_REPORTE" AND r."FECHA" = a."FECHA"
+        RETURNING r."TIPO", r."ID_REPORTE"
+        """,
+        (limite, tamano_lote),
+    )
+    filas = cursor.fetchall()
+    _moviendo_reportes(cursor, False)
+
+    for tipo in ("perdido", "encontrado"):
+        quitar_reportes(cursor, tipo, [id_reporte for t, id_reporte in filas if t == tipo])
+    return len(filas)
+
+
+# ========================
+# HILO DE MANTENIMIENTO
+# ========================
+
+
+def mantener_particiones(conectar, meses_archivo, retencion_notificaciones, tamano_lote=TAMANO_LOTE_DEFECTO):
+    """
+    Crea particiones, recorta notificaciones y archiva reportes en lotes.
+
+    Args:
+        conectar: Función que abre una conexión
+        meses_archivo (int): Antigüedad para archivar; 0 no archiva
+        retencion_notificaciones (int): Meses de notificaciones; 0 conserva todo
+
+    Returns:
+        dict: Conteos de la pasada o None si otro proceso la estaba haciendo
+    """
+    conexion = conectar()
+    if not conexion:
+        return None
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (LLAVE_MANTENIMIENTO,))
+        if not cursor.fetchone()[0]:
+            conexion.rollback()
+            return None
+        try:
+            resumen = {"particiones": asegurar_particiones(cursor), "notificaciones": 0, "archivados": 0}
+            if retencion_notificaciones:
+                resumen["notificaciones"] = recortar_notificaciones(cursor, retencion_notificaciones)
+            conexion.commit()
+
+            # un commit por lote para no tener bloqueados los reportes mucho tiempo
+            while meses_archivo:
+                archivados = archivar_reportes(cursor, meses_archivo, tamano_lote)
+                conexion.commit()
+                resumen["archivados"] += archivados
+                if archivados < tamano_lote:
+                    break
+            if resumen["archivados"]:
+                invalidar_reportes()
+            return resumen
+        finally:
+            conexion.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LLAVE_MANTENIMIENTO,))
+            conexion.commit()
+    finally:
+        cursor.close()
+        conexion.close()
+
+
+def iniciar_mantenimiento_particiones(app, conectar):
+    """
+    Arranca un hilo daemon que corre mantener_particiones() al iniciar y
+    después cada MANTENIMIENTO_INTERVALO segundos.
+    """
+    intervalo = app.config.get("MANTENIMIENTO_INTERVALO", INTERVALO_DEFECTO)
+    meses_archivo = app.config.get("ARCHIVO_MESES", ARCHIVO_MESES_DEFECTO)
+    retencion = app.config.get("NOTIFICACIONES_RETENCION_MESES", RETENCION_NOTIFICACIONES_DEFECTO)
+
+    def ciclo():
+        while True:
+            try:
+                resumen = mantener_particiones(conectar, meses_archivo, retencion)
+                if resumen and any(resumen.values()):
+                    print(
+                        f"✓ Mantenimiento: {resumen['particiones']} particiones nuevas, "
+                        f"{resumen['notificaciones']} de notificaciones borradas, "
+                        f"{resumen['archivados']} reportes archivados"
+                    )
+            except Exception as e:
+                print(f"✗ Error en el mantenimiento de particiones: {e}")
+            time.sleep(intervalo)
+
+    hilo = threading.Thread(target=ciclo, name="mantenimiento-particiones", daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,136 @@
+"""
+Caché del rol de cada usuario para los decoradores de decorators.py.
+
+El rol guardado en la sesión al iniciar sesión quedaba viejo si un admin
+lo cambiaba después. Consultar Usuarios en cada petición sería una
+consulta más por sondeo, así que el rol se guarda por proceso en una
+CacheTTL corta (ROLES_TTL) junto con la versión de los roles. Los
+endpoints que cambian roles o eliminan usuarios llaman a
+invalidar_roles(), que incrementa esa versión: las entradas con otra
+versión dejan de valer sin recorrer nada.
+
+La versión tiene que ser la misma para todos los procesos:
+
+- Con CACHE_URL en Redis es la del espacio "roles" de la caché
+  compartida (cache.py) y el cambio se ve al instante.
+- Si no, es una fila de la tabla Versiones. Cada proceso la relee como
+  mucho cada INTERVALO_VERSION segundos y en la misma consulta que el
+  rol, así que una petición hace a lo sumo una consulta y un admin
+  degradado deja de serlo en todos los procesos en ese intervalo.
+
+Si la base no responde se sigue con el último rol conocido (el de la
+caché o el de la sesión) en vez de fallar la petición.
+"""
+
+import threading
+import time
+
+from .cache import CacheTTL, cache_consultas
+from .database import conectar_db
+
+TTL_DEFECTO = 30  # segundos
+INTERVALO_VERSION = 1.0  # segundos entre lecturas de Versiones por proceso
+ESPACIO_ROLES = "roles"
+
+_roles = CacheTTL(TTL_DEFECTO, max_entradas=10_000)
+_version_local = {"valor": None, "leida": 0.0}
+_lock = threading.Lock()
+
+
+def configurar_permisos(app):
+    """Aplica ROLES_TTL."""
+    _roles.ttl = app.config.get("ROLES_TTL", TTL_DEFECTO)
+
+
+def _version_compartida():
+    """Versión de Redis, o None si la caché no es compartida o falla."""
+    if cache_consultas.backend.nombre != "redis":
+        return None
+    try:
+        return cache_consultas.backend.version(ESPACIO_ROLES)
+    except Exception as e:
+        print(f"Error leyendo versión de roles: {e}")
+        return None
+
+
+def _version_vigente():
+    """Versión de Versiones leída hace menos de INTERVALO_VERSION, o None."""
+    with _lock:
+        if time.monotonic() - _version_local["leida"] < INTERVALO_VERSION:
+            return _version_local["valor"]
+    return None
+
+
+def rol_actual(id_usuario, respaldo=None):
+    """
+    Rol vigente del usuario: de la caché si la versión coincide, si no de
+    la base.
+
+    Args:
+        respaldo (int): Rol a usar si la base no responde y no hay caché
+
+    Returns:
+        int | None: ID_ROL, o None si el usuario no existe o fue eliminado
+    """
+    redis = cache_consultas.backend.nombre == "redis"
+    version = _version_compartida() if redis else _version_vigente()
+    entrada = _roles.obtener(id_usuario)
+    if entrada is not None and version is not None and entrada[0] == version:
+        return entrada[1]
+
+    conexion = conectar_db()
+    if not conexion:
+        print("⚠ Sin conexión para leer el rol, se usa el último conocido")
+        return entrada[1] if entrada is not None else respaldo
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT
+                    (SELECT "ID_ROL" FROM public."Usuarios"
+                     WHERE "ID_USUARIO" = %s AND "ELIMINADO_EN" IS NULL),
+                    (SELECT "VERSION" FROM public."Versiones" WHERE "ESPACIO" = %s)
+                """,
+                (id_usuario, ESPACIO_ROLES),
+            )
+            id_rol, version_bd = cursor.fetchone()
+    finally:
+        conexion.close()
+
+    if not redis:
+        version = version_bd or 0
+        with _lock:
+            _version_local["valor"] = version
+            _version_local["leida"] = time.monotonic()
+    if version is not None:
+        _roles.guardar(id_usuario, (version, id_rol))
+    return id_rol
+
+
+def invalidar_roles():
+    """Avisa que cambió el rol de algún usuario o que se eliminó alguno."""
+    if cache_consultas.backend.nombre == "redis":
+        cache_consultas.invalidar(ESPACIO_ROLES)
+        return
+
+    conexion = conectar_db()
+    if not conexion:
+        print("✗ Sin conexión para invalidar roles; los procesos lo verán al vencer ROLES_TTL")
+        _roles.limpiar()
+        return
+    try:
+        with conexion, conexion.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO public."Versiones" ("ESPACIO", "VERSION") VALUES (%s, 1)
+                ON CONFLICT ("ESPACIO") DO UPDATE SET "VERSION" = public."Versiones"."VERSION" + 1
+                RETURNING "VERSION"
+                """,
+                (ESPACIO_ROLES,),
+            )
+            version = cursor.fetchone()[0]
+    finally:
+        conexion.close()
+    with _lock:
+        _version_local["valor"] = version
+        _version_local["leida"] = time.monotonic()
@@ -0,0 +1,156 @@
+"""
+Consultas de lectura que devuelven modelos (ver modelos.py).
+
+Todas reciben un cursor de tuplas (conexion.cursor() sin cursor_factory) y
+no confirman transacciones. El orden de columnas de cada SELECT coincide
+con el de __slots__ del modelo que devuelve.
+"""
+
+from .colores import normalizar_color
+from .consulta_reportes import ConsultaReportes
+from .modelos import Mensaje, Objeto, Usuario
+
+
+# ========================
+# REPORTES
+# ========================
+
+
+def reportes_de_usuario(cursor, id_usuario, categoria=None, tipo=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Reportes perdidos y encontrados de un usuario, del más nuevo al más viejo.
+
+    Args:
+        categoria (str): ID_CATEGORIA o parte del nombre de la categoría
+        tipo (str): "perdido", "encontrado" o None para ambos
+        fecha_inicio, fecha_fin (str): Rango YYYY-MM-DD, ambos incluidos
+
+    Returns:
+        list[Reporte]
+    """
+    return (
+        ConsultaReportes()
+        .del_usuario(id_usuario)
+        .solo_tipo(tipo)
+        .categoria(categoria)
+        .rango_fechas(fecha_inicio, fecha_fin)
+        .modelos(cursor)
+    )
+
+
+# ========================
+# OBJETOS
+# ========================
+
+
+def buscar_objetos(cursor, q="", categoria="", color=""):
+    """
+    Objetos por nombre, categoría y color.
+
+    Returns:
+        list[Objeto]
+    """
+    condiciones = ["TRUE"]
+    params = []
+
+    if q:
+        condiciones.append('"NOMBRE" ILIKE %s')
+        params.append(f"%{q}%")
+    if categoria:
+        condiciones.append('"ID_CATEGORIA" = %s')
+        params.append(categoria)
+    if color:
+        id_color = normalizar_color(color)
+        if id_color:
+            condiciones.append('"ID_COLOR" = %s')
+            params.append(id_color)
+        else:
+            condiciones.append('"COLOR" ILIKE %s')
+            params.append(f"%{color}%")
+
+    cursor.execute(
+        f'''
+        SELECT "ID_OBJETO", "NOMBRE", "COLOR", "ID_COLOR", "IMAGEN", "ID_CATEGORIA"
+        FROM "Objetos"
+        WHERE {" AND ".join(condiciones)}
+        ''',
+        params,
+    )
+    return Objeto.desde_filas(cursor.fetchall())
+
+
+# ========================
+# MENSAJES
+# ========================
+
+
+def mensajes_de_usuario(cursor, id_usuario):
+    """
+    Todos los mensajes enviados o recibidos por un usuario, del más nuevo al
+    más viejo, con nombres de perfil y datos del objeto.
+
+    Returns:
+        list[Mensaje]
+    """
+    cursor.execute(
+        '''
+        SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO",
+               m."ASUNTO", m."CUERPO", m."FECHA", m."LEIDO",
+               pr."NOMBRE", pd."NOMBRE", o."NOMBRE", o."IMAGEN"
+        FROM public."Mensajes" m
+        LEFT JOIN public."Objetos" o ON m."ID_OBJETO" = o."ID_OBJETO"
+        LEFT JOIN public."Perfiles" pr ON m."ID_REMITENTE" = pr."ID_USUARIO"
+        LEFT JOIN public."Perfiles" pd ON m."ID_DESTINATARIO" = pd."ID_USUARIO"
+        WHERE m."ID_REMITENTE" = %s OR m."ID_DESTINATARIO" = %s
+        ORDER BY m."FECHA" DESC
+        ''',
+        (id_usuario, id_usuario),
+    )
+    return Mensaje.desde_filas(cursor.fetchall())
+
+
+def mensajes_recibidos(cursor, id_usuario, limite=200):
+    """
+    Últimos mensajes recibidos por un usuario.
+
+    Returns:
+        list[Mensaje]
+    """
+    cursor.execute(
+        '''
+        SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO",
+               m."ASUNTO", m."CUERPO", m."FECHA", m."LEIDO", p."NOMBRE"
+        FROM public."Mensajes" m
+        LEFT JOIN public."Perfiles" p ON m."ID_REMITENTE" = p."ID_USUARIO"
+        WHERE m."ID_DESTINATARIO" = %s
+        ORDER BY m."FECHA" DESC
+        LIMIT %s
+        ''',
+        (id_usuario, limite),
+    )
+    return Mensaje.desde_filas(cursor.fetchall())
+
+
+# ========================
+# USUARIOS
+# ========================
+
+
+def obtener_usuario_activo(cursor, id_usuario):
+    """
+    Usuario no eliminado con su nombre de perfil y el hash de su contraseña.
+
+    Returns:
+        Usuario | None
+    """
+    cursor.execute(
+        '''
+        SELECT u."ID_USUARIO", p."NOMBRE", u."GENERO", u."ID_ROL", u."CONTRASENA"
+        FROM public."Usuarios" u
+        LEFT JOIN public."Perfiles" p ON u."ID_USUARIO" = p."ID_USUARIO"
+        WHERE u."ID_USUARIO" = %s AND u."ELIMINADO_EN" IS NULL
+        ''',
+        (id_usuario,),
+    )
+    fila = cursor.fetchone()
+    return Usuario(*fila) if fila else None
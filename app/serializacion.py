@@ -0,0 +1,74 @@
+"""
+Serialización rápida de respuestas JSON.
+
+Los listados grandes (búsqueda, feed, notificaciones, conversaciones) leen
+con cursores de tuplas y arman los diccionarios con zip() sobre los nombres
+de columna, que es bastante más barato que RealDictCursor. Las fechas se
+formatean en el SQL cuando el API espera un formato propio; el resto las
+serializa orjson de forma nativa en ISO 8601, igual que isoformat().
+
+orjson es opcional: si no está instalado se usa json de la biblioteca
+estándar con el mismo manejo de fechas y Decimal.
+"""
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import current_app
+
+from .modelos import Modelo
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+def _por_defecto(valor):
+    """Tipos que ninguno de los dos codificadores maneja solo."""
+    if isinstance(valor, Modelo):
+        return valor.a_dict()
+    if isinstance(valor, Decimal):
+        # igual que el proveedor JSON de Flask: texto, sin perder precisión
+        return str(valor)
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def serializar(datos):
+    """
+    Convierte datos a JSON.
+
+    Returns:
+        bytes: JSON en UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(datos, default=_por_defecto, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        datos, default=_por_defecto, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def respuesta_json(datos, status=200):
+    """Respuesta Flask con el cuerpo ya serializado por serializar()."""
+    cuerpo = datos if isinstance(datos, bytes) else serializar(datos)
+    return current_app.response_class(cuerpo, status=status, mimetype="application/json")
+
+
+def columnas(cursor):
+    """Nombres de columna del último SELECT, en el mismo orden que las tuplas."""
+    return [descripcion[0] for descripcion in cursor.description]
+
+
+def filas_como_dicts(cursor):
+    """
+    Lee todas las filas de un cursor de tuplas como diccionarios simples.
+
+    Las claves son las mismas que daría RealDictCursor.
+    """
+    nombres = columnas(cursor)
+    return [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
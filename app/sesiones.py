@@ -0,0 +1,404 @@
+"""
+Sesiones guardadas en el servidor.
+
+La cookie firmada de Flask llevaba id_usuario, nombre, género, rol, tema y
+el estado de recuperación en cada petición (también en cada sondeo del
+chat) y no había forma de invalidarla si un admin cambiaba el rol o
+eliminaba al usuario. Ahora la cookie solo lleva un identificador opaco y
+los datos viven en un backend:
+
+- SesionesPostgres ("postgres", por defecto): tabla UNLOGGED "Sesiones".
+- SesionesMemoria ("memoria"): por proceso, para desarrollo.
+- SesionesRedis ("redis://..."): externo y compartido.
+
+Cada proceso guarda las lecturas en una CacheTTL de pocos segundos
+(SESIONES_CACHE_TTL), así los sondeos no consultan la base en cada
+petición. El vencimiento solo se renueva cuando pasó la mitad de la
+duración, y las sesiones vencidas se borran por lotes en un hilo aparte.
+
+revocar_sesiones() borra todas las sesiones de unos usuarios. En otros
+procesos la copia en caché puede durar hasta SESIONES_CACHE_TTL segundos.
+"""
+
+import secrets
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from .cache import CacheTTL
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+CACHE_TTL_DEFECTO = 5  # segundos
+LIMPIEZA_INTERVALO_DEFECTO = 600  # segundos
+LOTE_LIMPIEZA = 1000
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    """Diccionario de sesión que recuerda su identificador y si cambió."""
+
+    def __init__(self, datos=None, sid=None, vence=0.0):
+        def al_cambiar(sesion):
+            sesion.modified = True
+
+        super().__init__(datos, al_cambiar)
+        self.sid = sid
+        self.vence = vence
+        self.new = sid is None
+        self.modified = False
+        self.usuario_original = self.get("id_usuario")
+
+
+# ========================
+# BACKENDS
+# ========================
+
+
+class SesionesMemoria:
+    """Sesiones en memoria del proceso; se pierden al reiniciar."""
+
+    nombre = "memoria"
+
+    def __init__(self):
+        self._datos = {}  # sid -> (vence, id_usuario, datos)
+        self._lock = threading.Lock()
+
+    def cargar(self, sid):
+        with self._lock:
+            entrada = self._datos.get(sid)
+        if entrada is None or entrada[0] < time.time():
+            return None
+        return entrada[2], entrada[0]
+
+    def guardar(self, sid, id_usuario, datos, vence):
+        with self._lock:
+            self._datos[sid] = (vence, id_usuario, datos)
+
+    def renovar(self, sid, vence):
+        with self._lock:
+            entrada = self._datos.get(sid)
+            if entrada:
+                self._datos[sid] = (vence,) + entrada[1:]
+
+    def borrar(self, sid):
+        with self._lock:
+            self._datos.pop(sid, None)
+
+    def revocar(self, ids_usuarios):
+        ids = set(ids_usuarios)
+        with self._lock:
+            sids = [sid for sid, (_, usuario, _) in self._datos.items() if usuario in ids]
+            for sid in sids:
+                del self._datos[sid]
+        return len(sids)
+
+    def purgar(self, lote=LOTE_LIMPIEZA):
+        ahora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, entrada in self._datos.items() if entrada[0] < ahora][:lote]
+            for sid in vencidas:
+                del self._datos[sid]
+        return len(vencidas)
+
+
+class SesionesPostgres:
+    """Sesiones en la tabla UNLOGGED "Sesiones"."""
+
+    nombre = "postgres"
+
+    def __init__(self, conectar):
+        self._conectar = conectar
+
+    def _ejecutar(self, sql, parametros):
+        conexion = self._conectar()
+        if not conexion:
+            raise ConnectionError("Sin conexión a la base para las sesiones")
+        try:
+            with conexion, conexion.cursor() as cursor:
+                cursor.execute(sql, parametros)
+                if cursor.description:
+                    return cursor.fetchone()
+                return cursor.rowcount
+        finally:
+            conexion.close()
+
+    def cargar(self, sid):
+        fila = self._ejecutar(
+            """
+            SELECT "DATOS", "VENCE" FROM public."Sesiones"
+            WHERE "ID_SESION" = %s AND "VENCE" > extract(epoch FROM now())
+            """,
+            (sid,),
+        )
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, sid, id_usuario, datos, vence):
+        self._ejecutar(
+            """
+            INSERT INTO public."Sesiones" ("ID_SESION", "ID_USUARIO", "DATOS", "VENCE")
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT ("ID_SESION") DO UPDATE SET
+                "ID_USUARIO" = EXCLUDED."ID_USUARIO",
+                "DATOS" = EXCLUDED."DATOS",
+                "VENCE" = EXCLUDED."VENCE"
+            """,
+            (sid, id_usuario, datos, vence),
+        )
+
+    def renovar(self, sid, vence):
+        self._ejecutar('UPDATE public."Sesiones" SET "VENCE" = %s WHERE "ID_SESION" = %s', (vence, sid))
+
+    def borrar(self, sid):
+        self._ejecutar('DELETE FROM public."Sesiones" WHERE "ID_SESION" = %s', (sid,))
+
+    def revocar(self, ids_usuarios):
+        return self._ejecutar(
+            'DELETE FROM public."Sesiones" WHERE "ID_USUARIO" = ANY(%s)', (list(ids_usuarios),)
+        )
+
+    def purgar(self, lote=LOTE_LIMPIEZA):
+        return self._ejecutar(
+            """
+            DELETE FROM public."Sesiones"
+            WHERE "ID_SESION" IN (
+                SELECT "ID_SESION" FROM public."Sesiones"
+                WHERE "VENCE" < extract(epoch FROM now())
+                LIMIT %s
+            )
+            """,
+            (lote,),
+        )
+
+
+class SesionesRedis:
+    """Sesiones en Redis; las vence Redis con EXPIREAT."""
+
+    nombre = "redis"
+
+    def __init__(self, url):
+        import redis  # dependencia opcional
+
+        self._cliente = redis.Redis.from_url(url)
+        self._cliente.ping()
+
+    @staticmethod
+    def _clave(sid):
+        return "orio:sesion:" + sid
+
+    @staticmethod
+    def _clave_usuario(id_usuario):
+        return "orio:sesiones_usuario:" + id_usuario
+
+    def cargar(self, sid):
+        tuberia = self._cliente.pipeline()
+        tuberia.get(self._clave(sid))
+        tuberia.pttl(self._clave(sid))
+        datos, restante = tuberia.execute()
+        if datos is None:
+            return None
+        # el vencimiento es el de la clave, que renovar() mueve
+        return datos.decode(), time.time() + restante / 1000
+
+    def guardar(self, sid, id_usuario, datos, vence):
+        tuberia = self._cliente.pipeline()
+        tuberia.set(self._clave(sid), datos, exat=int(vence) + 1)
+        if id_usuario:
+            tuberia.sadd(self._clave_usuario(id_usuario), sid)
+            tuberia.expireat(self._clave_usuario(id_usuario), int(vence) + 1)
+        tuberia.execute()
+
+    def renovar(self, sid, vence):
+        self._cliente.expireat(self._clave(sid), int(vence) + 1)
+
+    def borrar(self, sid):
+        self._cliente.delete(self._clave(sid))
+
+    def revocar(self, ids_usuarios):
+        total = 0
+        for id_usuario in ids_usuarios:
+            sids = self._cliente.smembers(self._clave_usuario(id_usuario))
+            claves = [self._clave(sid.decode()) for sid in sids]
+            if claves:
+                total += self._cliente.delete(*claves)
+            self._cliente.delete(self._clave_usuario(id_usuario))
+        return total
+
+    def purgar(self, lote=LOTE_LIMPIEZA):
+        return 0
+
+
+def crear_backend_sesiones(url, conectar):
+    """Como cache.crear_backend(): si Redis no está disponible, se usa Postgres."""
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            return SesionesRedis(url)
+        except Exception as e:
+            print(f"⚠ Sesiones en Redis no disponibles, se usa Postgres: {e}")
+    if url == "memoria":
+        return SesionesMemoria()
+    return SesionesPostgres(conectar)
+
+
+# ========================
+# INTERFAZ PARA FLASK
+# ========================
+
+
+class InterfazSesiones(SessionInterface):
+    """SessionInterface de Flask sobre uno de los backends."""
+
+    def __init__(self, backend, cache_ttl=CACHE_TTL_DEFECTO):
+        self.backend = backend
+        self.cache = CacheTTL(cache_ttl, max_entradas=10_000) if cache_ttl else None
+
+    def _duracion(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def _cargar(self, sid):
+        entrada = self.cache.obtener(sid) if self.cache else None
+        if entrada is None:
+            entrada = self.backend.cargar(sid)
+            if entrada is None:
+                return None
+            if self.cache:
+                self.cache.guardar(sid, entrada)
+        return entrada
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                entrada = self._cargar(sid)
+            except Exception as e:
+                print(f"✗ Error cargando la sesión: {e}")
+                entrada = None
+            if entrada is not None and entrada[1] > time.time():
+                return SesionServidor(session_json_serializer.loads(entrada[0]), sid, entrada[1])
+        return SesionServidor()
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid:
+                self._olvidar(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta)
+            return
+
+        ahora = time.time()
+        vence = ahora + self._duracion(app)
+        sid = session.sid
+        if session.modified:
+            # al entrar o salir con otra cuenta cambia el identificador (fijación de sesión)
+            if sid and session.get("id_usuario") != session.usuario_original:
+                self._olvidar(sid)
+                sid = None
+            sid = sid or secrets.token_urlsafe(32)
+            datos = session_json_serializer.dumps(dict(session))
+            try:
+                self.backend.guardar(sid, session.get("id_usuario"), datos, vence)
+            except Exception as e:
+                # la respuesta ya está armada: se entrega sin la cookie de una sesión que no quedó guardada
+                print(f"✗ Error guardando la sesión: {e}")
+                return
+            if self.cache:
+                self.cache.guardar(sid, (datos, vence))
+        elif session.vence - ahora < self._duracion(app) / 2:
+            # renovar solo pasada la mitad: los sondeos no escriben en cada petición
+            try:
+                self.backend.renovar(sid, vence)
+            except Exception as e:
+                print(f"✗ Error renovando la sesión: {e}")
+                return
+            if self.cache:
+                entrada = self.cache.obtener(sid)
+                if entrada:
+                    self.cache.guardar(sid, (entrada[0], vence))
+        else:
+            return
+
+        response.set_cookie(
+            nombre,
+            sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=dominio,
+            path=ruta,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add("Cookie")
+
+    def _olvidar(self, sid):
+        try:
+            self.backend.borrar(sid)
+        except Exception as e:
+            # vence sola; la limpieza periódica la borra después
+            print(f"✗ Error borrando la sesión: {e}")
+        if self.cache:
+            # una entrada vencida equivale a no tenerla
+            self.cache.guardar(sid, None, ttl=0)
+
+
+_interfaz = None
+
+
+def configurar_sesiones(app, conectar):
+    """Instala la interfaz de sesiones según SESIONES_URL."""
+    global _interfaz
+    backend = crear_backend_sesiones(app.config.get("SESIONES_URL", "postgres"), conectar)
+    _interfaz = InterfazSesiones(backend, app.config.get("SESIONES_CACHE_TTL", CACHE_TTL_DEFECTO))
+    app.session_interface = _interfaz
+    return _interfaz
+
+
+def revocar_sesiones(*ids_usuarios):
+    """
+    Cierra todas las sesiones de los usuarios indicados.
+
+    Returns:
+        int: Sesiones borradas
+    """
+    if _interfaz is None or not ids_usuarios:
+        return 0
+    try:
+        borradas = _interfaz.backend.revocar(ids_usuarios)
+    except Exception as e:
+        print(f"✗ Error revocando sesiones de {', '.join(ids_usuarios)}: {e}")
+        return 0
+    if _interfaz.cache:
+        _interfaz.cache.limpiar()
+    return borradas
+
+
+def iniciar_limpieza_sesiones(app):
+    """
+    Arranca un hilo daemon que borra sesiones vencidas por lotes cada
+    SESIONES_LIMPIEZA_INTERVALO segundos.
+    """
+    intervalo = app.config.get("SESIONES_LIMPIEZA_INTERVALO", LIMPIEZA_INTERVALO_DEFECTO)
+
+    def ciclo():
+        while True:
+            time.sleep(intervalo)
+            try:
+                total = 0
+                while _interfaz is not None:
+                    borradas = _interfaz.backend.purgar(LOTE_LIMPIEZA)
+                    total += borradas
+                    if borradas < LOTE_LIMPIEZA:
+                        break
+                if total:
+                    print(f"✓ {total} sesiones vencidas borradas")
+            except Exception as e:
+                print(f"✗ Error limpiando sesiones: {e}")
+
+    hilo = threading.Thread(target=ciclo, name="limpieza-sesiones", daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,358 @@
+"""
+Subidas por partes que se pueden retomar (al estilo tus).
+
+Con un solo POST multipart cada foto grande pasaba entera por
+MAX_CONTENT_LENGTH y, si la conexión del celular se cortaba, había que
+empezar de cero. El protocolo es:
+
+1. POST /api/subidas {"nombre", "tamano"} -> {"id_subida", "recibido": 0}
+2. PATCH /api/subidas/<id> con Upload-Offset y el trozo como
+   application/offset+octet-stream, las veces que haga falta. Cada trozo
+   se copia del stream de la petición al archivo por bloques (memoria
+   acotada) y responde 204 con el nuevo Upload-Offset.
+3. HEAD /api/subidas/<id> devuelve Upload-Offset para retomar tras un corte.
+4. Al llegar al tamaño declarado la subida se finaliza: se valida el tipo
+   con los primeros bytes (adjuntos.detectar_tipo) y queda COMPLETA.
+
+Una subida completa se usa una sola vez pasando su id a submit_reporte
+(id_subida), subir_foto_perfil (id_subida) o al enviar un mensaje
+(subidas). usar_subida() la entrega al que la pide y deja de existir.
+
+El avance es el tamaño del archivo en disco: si un PATCH se corta a la
+mitad, lo que llegó cuenta. Dos PATCH a la misma subida no se pisan
+porque cada uno toma un pg_try_advisory_lock sobre su id. Las subidas
+sin terminar se borran a las SUBIDAS_VENCE_HORAS.
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+
+from werkzeug.datastructures import FileStorage
+
+from .adjuntos import TAMANO_BLOQUE, AdjuntoRechazado, detectar_tipo
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+
+MAX_BYTES_DEFECTO = 64 * 1024 * 1024
+MAX_ABIERTAS_DEFECTO = 10  # subidas sin terminar por usuario
+VENCE_HORAS_DEFECTO = 24
+LIMPIEZA_INTERVALO = 60 * 60  # segundos
+LLAVE_SUBIDAS = 40050  # primera mitad de pg_try_advisory_lock(int, int)
+TIPOS_IMAGEN = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+
+_ID_VALIDO = re.compile(r"[0-9a-f]{32}")
+
+
+class SubidaInvalida(Exception):
+    """Petición de subida rechazada; lleva el código HTTP a responder."""
+
+    def __init__(self, mensaje, estado=400, recibido=None):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.estado = estado
+        self.recibido = recibido
+
+
+def ruta_parcial(carpeta, id_subida):
+    """Archivo de la subida; el id llega del cliente, así que se valida antes de armar la ruta."""
+    if not _ID_VALIDO.fullmatch(id_subida or ""):
+        raise SubidaInvalida("Subida no encontrada", 404)
+    return os.path.join(carpeta, f"{id_subida}.part")
+
+
+def _recibido(carpeta, id_subida):
+    try:
+        return os.path.getsize(ruta_parcial(carpeta, id_subida))
+    except FileNotFoundError:
+        return 0
+
+
+def crear_subida(cursor, carpeta, id_usuario, nombre, tamano, max_bytes, max_abiertas):
+    """
+    Registra una subida nueva y crea su archivo vacío.
+
+    Returns:
+        str: id_subida
+    """
+    if not nombre or tamano is None or tamano <= 0:
+        raise SubidaInvalida("Faltan nombre o tamaño")
+    if tamano > max_bytes:
+        raise SubidaInvalida(f"El archivo supera {max_bytes // (1024 * 1024)} MB", 413)
+
+    cursor.execute(
+        'SELECT count(*) FROM public."Subidas" WHERE "ID_USUARIO" = %s AND NOT "COMPLETA"',
+        (id_usuario,),
+    )
+    if cursor.fetchone()[0] >= max_abiertas:
+        raise SubidaInvalida(f"Máximo {max_abiertas} subidas sin terminar", 429)
+
+    id_subida = uuid.uuid4().hex
+    os.makedirs(carpeta, exist_ok=True)
+    open(ruta_parcial(carpeta, id_subida), "wb").close()
+    cursor.execute(
+        """
+        INSERT INTO public."Subidas" ("ID_SUBIDA", "ID_USUARIO", "NOMBRE", "TAMANO")
+        VALUES (%s, %s, %s, %s)
+        """,
+        (id_subida, id_usuario, nombre, tamano),
+    )
+    return id_subida
+
+
+def estado_subida(cursor, carpeta, id_subida, id_usuario):
+    """
+    Returns:
+        dict | None: id_subida, nombre, tamano, recibido, completa, tipo
+    """
+    cursor.execute(
+        """
+        SELECT "NOMBRE", "TAMANO", "COMPLETA", "TIPO" FROM public."Subidas"
+        WHERE "ID_SUBIDA" = %s AND "ID_USUARIO" = %s
+        """,
+        (id_subida, id_usuario),
+    )
+    fila = cursor.fetchone()
+    if not fila:
+        return None
+    return {
+        "id_subida": id_subida,
+        "nombre": fila[0],
+        "tamano": fila[1],
+        "recibido": fila[1] if fila[2] else _recibido(carpeta, id_subida),
+        "completa": fila[2],
+        "tipo": fila[3],
+    }
+
+
+def recibir_trozo(conexion, carpeta, id_subida, id_usuario, desde, flujo):
+    """
+    Agrega un trozo a la subida y la finaliza si llegó al tamaño declarado.
+
+    Args:
+        conexion: Conexión propia; se confirma después de cada paso para no
+            dejar una transacción abierta mientras llega el trozo
+        desde (int): Upload-Offset que manda el cliente
+        flujo: request.stream
+
+    Returns:
+        int: Bytes recibidos en total
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", (LLAVE_SUBIDAS, id_subida))
+        bloqueada = cursor.fetchone()[0]
+        conexion.commit()
+        if not bloqueada:
+            raise SubidaInvalida("Ya se está recibiendo un trozo de esta subida", 409)
+        try:
+            estado = estado_subida(cursor, carpeta, id_subida, id_usuario)
+            conexion.commit()
+            if estado is None:
+                raise SubidaInvalida("Subida no encontrada", 404)
+            if estado["completa"]:
+                return estado["recibido"]
+            if desde != estado["recibido"]:
+                raise SubidaInvalida("Upload-Offset no coincide", 409, estado["recibido"])
+
+            restante = estado["tamano"] - desde
+            with open(ruta_parcial(carpeta, id_subida), "ab") as destino:
+                while restante > 0:
+                    bloque = flujo.read(min(TAMANO_BLOQUE, restante))
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    restante -= len(bloque)
+                sobrante = bool(flujo.read(1))
+
+            recibido = estado["tamano"] - restante
+            if recibido == estado["tamano"]:
+                _finalizar(cursor, carpeta, id_subida, estado["nombre"])
+                conexion.commit()
+            if sobrante:
+                raise SubidaInvalida("El trozo pasa del tamaño declarado", 413, recibido)
+            return recibido
+        finally:
+            conexion.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (LLAVE_SUBIDAS, id_subida))
+            conexion.commit()
+    finally:
+        cursor.close()
+
+
+def _finalizar(cursor, carpeta, id_subida, nombre):
+    """Valida el tipo con los primeros bytes y marca la subida como completa."""
+    with open(ruta_parcial(carpeta, id_subida), "rb") as origen:
+        cabecera = origen.read(TAMANO_BLOQUE)
+    try:
+        tipo = detectar_tipo(nombre, cabecera)
+    except AdjuntoRechazado as e:
+        cancelar_subida(cursor, carpeta, id_subida)
+        cursor.connection.commit()
+        raise SubidaInvalida(e.mensaje, e.estado)
+    cursor.execute(
+        'UPDATE public."Subidas" SET "COMPLETA" = TRUE, "TIPO" = %s WHERE "ID_SUBIDA" = %s',
+        (tipo, id_subida),
+    )
+
+
+def cancelar_subida(cursor, carpeta, id_subida, id_usuario=None):
+    """Borra la subida y su archivo. Returns: True si existía."""
+    if id_usuario is None:
+        cursor.execute('DELETE FROM public."Subidas" WHERE "ID_SUBIDA" = %s', (id_subida,))
+    else:
+        cursor.execute(
+            'DELETE FROM public."Subidas" WHERE "ID_SUBIDA" = %s AND "ID_USUARIO" = %s',
+            (id_subida, id_usuario),
+        )
+    existia = cursor.rowcount > 0
+    if existia:
+        try:
+            os.remove(ruta_parcial(carpeta, id_subida))
+        except FileNotFoundError:
+            pass
+    return existia
+
+
+def usar_subida(cursor, carpeta, id_subida, id_usuario, tipos=None):
+    """
+    Toma una subida completa del usuario dentro de la transacción del
+    llamador. El archivo se puede leer en su lugar y se mueve o se borra
+    después del commit; si la transacción falla, la subida sigue disponible.
+
+    Args:
+        tipos (set): Tipos MIME aceptados o None para cualquiera
+
+    Returns:
+        tuple: (ruta del archivo, nombre original, tipo)
+
+    Raises:
+        SubidaInvalida
+    """
+    cursor.execute(
+        """
+        DELETE FROM public."Subidas"
+        WHERE "ID_SUBIDA" = %s AND "ID_USUARIO" = %s AND "COMPLETA"
+        RETURNING "NOMBRE", "TIPO"
+        """,
+        (id_subida, id_usuario),
+    )
+    fila = cursor.fetchone()
+    if not fila:
+        raise SubidaInvalida("Subida no encontrada o sin terminar", 404)
+    if tipos is not None and fila[1] not in tipos:
+        raise SubidaInvalida(f"Tipo de archivo no permitido: {fila[0]}", 415)
+    return ruta_parcial(carpeta, id_subida), fila[0], fila[1]
+
+
+def subidas_completas(cursor, carpeta, ids_subidas, id_usuario):
+    """
+    Lee (sin tomarlas) varias subidas completas del usuario en una consulta,
+    para copiarlas fuera de la transacción antes de usar_subidas().
+
+    Returns:
+        list[tuple]: (ruta del archivo, nombre original, tipo) en el orden pedido
+
+    Raises:
+        SubidaInvalida: Si alguna no existe, no es del usuario o no terminó
+    """
+    if not ids_subidas:
+        return []
+    cursor.execute(
+        """
+        SELECT "ID_SUBIDA", "NOMBRE", "TIPO" FROM public."Subidas"
+        WHERE "ID_SUBIDA" = ANY(%s) AND "ID_USUARIO" = %s AND "COMPLETA"
+        """,
+        (list(ids_subidas), id_usuario),
+    )
+    filas = {fila[0]: fila[1:] for fila in cursor.fetchall()}
+    if len(filas) != len(set(ids_subidas)):
+        raise SubidaInvalida("Subida no encontrada o sin terminar", 404)
+    return [(ruta_parcial(carpeta, i),) + tuple(filas[i]) for i in ids_subidas]
+
+
+def usar_subidas(cursor, ids_subidas, id_usuario):
+    """Toma en una sentencia las subidas leídas con subidas_completas()."""
+    if not ids_subidas:
+        return
+    cursor.execute(
+        """
+        DELETE FROM public."Subidas"
+        WHERE "ID_SUBIDA" = ANY(%s) AND "ID_USUARIO" = %s AND "COMPLETA"
+        """,
+        (list(ids_subidas), id_usuario),
+    )
+    if cursor.rowcount != len(set(ids_subidas)):
+        # otra petición la usó entre la lectura y ahora
+        raise SubidaInvalida("Subida ya usada", 409)
+
+
+def como_archivo(ruta, nombre, tipo):
+    """FileStorage sobre una subida, para pasarla a adjuntos.recibir()."""
+    return FileStorage(stream=open(ruta, "rb"), filename=nombre, content_type=tipo)
+
+
+def limpiar_subidas(conectar, carpeta, vence_horas):
+    """
+    Borra las subidas más viejas que vence_horas (terminadas o no, si nadie
+    las usó) y los archivos .part que ya no tienen fila.
+
+    Returns:
+        int: Subidas borradas
+    """
+    conexion = conectar()
+    if not conexion:
+        return 0
+    try:
+        with conexion, conexion.cursor() as cursor:
+            cursor.execute(
+                """
+                DELETE FROM public."Subidas"
+                WHERE "CREADO" < CURRENT_TIMESTAMP - make_interval(hours => %s)
+                RETURNING "ID_SUBIDA"
+                """,
+                (vence_horas,),
+            )
+            vencidas = [fila[0] for fila in cursor.fetchall()]
+            cursor.execute('SELECT "ID_SUBIDA" FROM public."Subidas"')
+            vigentes = {fila[0] for fila in cursor.fetchall()}
+    finally:
+        conexion.close()
+
+    limite = time.time() - vence_horas * 3600
+    for archivo in os.listdir(carpeta) if os.path.isdir(carpeta) else []:
+        id_subida, extension = os.path.splitext(archivo)
+        ruta = os.path.join(carpeta, archivo)
+        # los .part recién creados pueden no tener fila todavía
+        if extension == ".part" and id_subida not in vigentes and os.path.getmtime(ruta) < limite:
+            os.remove(ruta)
+    for id_subida in vencidas:
+        try:
+            os.remove(ruta_parcial(carpeta, id_subida))
+        except FileNotFoundError:
+            pass
+    return len(vencidas)
+
+
+def iniciar_limpieza_subidas(app, conectar):
+    """Arranca un hilo daemon que corre limpiar_subidas() cada hora."""
+    carpeta = app.config["SUBIDAS_FOLDER"]
+    vence_horas = app.config.get("SUBIDAS_VENCE_HORAS", VENCE_HORAS_DEFECTO)
+
+    def ciclo():
+        while True:
+            try:
+                borradas = limpiar_subidas(conectar, carpeta, vence_horas)
+                if borradas:
+                    print(f"✓ {borradas} subidas vencidas borradas")
+            except Exception as e:
+                print(f"✗ Error limpiando subidas: {e}")
+            time.sleep(LIMPIEZA_INTERVALO)
+
+    hilo = threading.Thread(target=ciclo, name="limpieza-subidas", daemon=True)
+    hilo.start()
+    return hilo
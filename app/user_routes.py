@@ -4,7 +4,7 @@ import re
 import uuid
 import random
 from io import BytesIO
-from datetime import datetime, timedelta
+from datetime import date, datetime
 
 from flask import (
     render_template,
@@ -21,12 +21,43 @@ from werkzeug.utils import secure_filename
 # Componentes internos
 from .database import conectar_db
 from .decorators import login_required, guest_required
+from .auditoria import presupuesto_consultas
+from .adjuntos import AdjuntoRechazado, colocar, descartar, recibir, registrar
+from .adjuntos import enviar as enviar_adjunto
+from .subidas import (
+    TIPOS_IMAGEN,
+    SubidaInvalida,
+    cancelar_subida,
+    como_archivo,
+    crear_subida,
+    estado_subida,
+    recibir_trozo,
+    subidas_completas,
+    usar_subida,
+    usar_subidas,
+)
+from .contrasenas import HashSaturado, hashear, necesita_rehash, verificar
+from .intentos import bloqueo_restante, limpiar_fallos, maximo_fallos, registrar_fallo
+from .limites import consumir, limitar_por_ip, respuesta_limite
+from .coincidencias import calcular_coincidencias, listar_coincidencias_usuario
+from .huellas_imagen import calcular_dhash, registrar_huella, buscar_similares
+from .colores import normalizar_color, color_dominante_imagen
+from .facetas import clave_busqueda, contar_facetas
+from .cache import cache_consultas, invalidar_reportes, ESPACIO_REPORTES
+from .feed import agregar_reporte, quitar_reportes, feed_serializado
+from .serializacion import serializar, respuesta_json, filas_como_dicts
+from .consulta_reportes import ConsultaReportes, COLUMNAS_BUSQUEDA, COLUMNAS_DETALLE
+from .paginacion import codificar_cursor, decodificar_cursor, leer_limite
+from .repositorio import (
+    reportes_de_usuario,
+    buscar_objetos,
+    mensajes_de_usuario,
+    mensajes_recibidos,
+    obtener_usuario_activo,
+)
 
 # Si tienes utilidades
 from psycopg2.extras import RealDictCursor
-from werkzeug.security import check_password_hash, generate_password_hash
-
-print (generate_password_hash("123456"))  # Esto es solo para mostrar cómo se ve una contraseña encriptada
 
 def init_user_routes(app):
     """
@@ -36,71 +67,21 @@ def init_user_routes(app):
     # RUTA DETALLES DE OBJETO
     # -----------------------------
     @app.route("/detalles/<id_objeto>")
+    @presupuesto_consultas(2)  # 1 + la del tema en la primera petición de la sesión
     def detalles_objeto(id_objeto):
         db = conectar_db()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        # recuperar la información del objeto y al menos un reporte asociado
-        # (se toma el más reciente mediante ORDER BY y LIMIT)
-        cursor.execute(
-            """
-            SELECT * FROM (
-                SELECT 
-                    o."NOMBRE", 
-                    o."ID_OBJETO", 
-                    o."COLOR", 
-                    o."IMAGEN", 
-                    o."LUGAR_ENCONTRADO" AS LUGAR,
-                    COALESCE(c."NOMBRE", o."ID_CATEGORIA") as CATEGORIA,
-                    r."FECHA", 
-                    r."OBSERVACIONES", 
-                    r."ID_USUARIO", 
-                    COALESCE(u."NOMBRE", r."ID_USUARIO") as NOMBRE_USUARIO,
-                    'perdido' AS tipo
-                FROM "Objetos" o
-                LEFT JOIN "Reportes_perdidos" r ON o."ID_OBJETO" = r."ID_OBJETO"
-                LEFT JOIN "Usuarios" u ON r."ID_USUARIO" = u."ID_USUARIO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE o."ID_OBJETO" = %s OR r."ID_REPORTE" = %s
-
-                UNION ALL
-
-                SELECT 
-                    o."NOMBRE", 
-                    o."ID_OBJETO", 
-                    o."COLOR", 
-                    o."IMAGEN", 
-                    o."LUGAR_ENCONTRADO" AS LUGAR,
-                    COALESCE(c."NOMBRE", o."ID_CATEGORIA") as CATEGORIA,
-                    r."FECHA", 
-                    r."OBSERVACIONES", 
-                    r."ID_USUARIO", 
-                    COALESCE(u."NOMBRE", r."ID_USUARIO") as NOMBRE_USUARIO,
-                    'encontrado' AS tipo
-                FROM "Objetos" o
-                LEFT JOIN "Reportes_encontrados" r ON o."ID_OBJETO" = r."ID_OBJETO"
-                LEFT JOIN "Usuarios" u ON r."ID_USUARIO" = u."ID_USUARIO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE o."ID_OBJETO" = %s OR r."ID_REPORTE_ENC" = %s
-            ) t
-            ORDER BY t."FECHA" DESC NULLS LAST
-            LIMIT 1
-            """,
-            (id_objeto, id_objeto, id_objeto, id_objeto),
+        cursor = db.cursor()
+        # el reporte más reciente del objeto (o el reporte con ese ID)
+        filas = (
+            ConsultaReportes(COLUMNAS_DETALLE)
+            .objeto_o_reporte(id_objeto)
+            .limitar(1)
+            .dicts(cursor)
         )
-        item = cursor.fetchone()
-
-        # si el reporte existe pero no trajo el nombre de usuario, intentar obtenerlo
-        if item and (not item.get("NOMBRE_USUARIO")) and item.get("ID_USUARIO"):
-            cursor.execute(
-                'SELECT "NOMBRE" FROM "Usuarios" WHERE "ID_USUARIO" = %s',
-                (item["ID_USUARIO"],),
-            )
-            user = cursor.fetchone()
-            if user and user.get("NOMBRE"):
-                item["NOMBRE_USUARIO"] = user["NOMBRE"]
+        item = filas[0] if filas else None
 
         # formatear fecha para mostrar
-        if item and isinstance(item.get("FECHA"), datetime):
+        if item and isinstance(item.get("FECHA"), date):
             item["FECHA"] = item["FECHA"].strftime("%d/%m/%Y")
 
         cursor.close()
@@ -139,6 +120,7 @@ def init_user_routes(app):
         return render_template("registro.html")
 
     @app.route("/guardar_usuario", methods=["POST"])
+    @limitar_por_ip("registro_ip")
     def guardar_usuario():
         try:
             # obtener datos del formulario
@@ -151,8 +133,6 @@ def init_user_routes(app):
             respuesta1 = request.form.get("respuesta1")
             pregunta2 = request.form.get("pregunta2")
             respuesta2 = request.form.get("respuesta2")
-            respuesta1_hash = generate_password_hash(respuesta1)
-            respuesta2_hash = generate_password_hash(respuesta2)
             id_rol = 1 #rol de usuario por defecto
             telefono = request.form.get("telefono")
 
@@ -204,8 +184,11 @@ def init_user_routes(app):
                 conexion.close()
                 return jsonify({"mensaje": "El usuario ya existe"}), 400
 
-            # insertar usuario con contraseña encriptada
-            hashed_password = generate_password_hash(contrasena)
+            # insertar usuario con contraseña encriptada; los hashes se
+            # calculan después de validar para no gastar CPU en rechazos
+            hashed_password = hashear(contrasena)
+            respuesta1_hash = hashear(respuesta1)
+            respuesta2_hash = hashear(respuesta2)
             cursor.execute(
                 """
                 INSERT INTO public."Usuarios"
@@ -249,6 +232,8 @@ def init_user_routes(app):
 
             return jsonify({"ok": True, "mensaje": "Usuario creado correctamente"})
 
+        except HashSaturado:
+            return jsonify({"mensaje": "Servidor ocupado, intenta de nuevo"}), 503
         except Exception as e:
             return (
                 jsonify({"mensaje": "Error al guardar el usuario", "error": str(e)}),
@@ -265,122 +250,91 @@ def init_user_routes(app):
         tipo = request.args.get("tipo", "").strip()
         fecha_inicio = request.args.get("fecha_inicio", "").strip() or None
         fecha_fin = request.args.get("fecha_fin", "").strip() or None
+        color = request.args.get("color", "").strip()
+        status = request.args.get("status", "").strip()
+        facetas = request.args.get("facetas") == "1"
+        limite = leer_limite(request.args.get("limite"))
+        cursor_param = request.args.get("cursor", "").strip()
+
+        if status and status not in ("pendiente", "encontrado"):
+            return jsonify({"ok": False, "error": "Estado no válido"}), 400
+        if tipo and tipo not in ("perdido", "encontrado"):
+            return jsonify({"ok": False, "error": "Tipo no válido"}), 400
+
+        llave = decodificar_cursor(cursor_param)
+        if cursor_param and (not llave or len(llave) != 3):
+            return jsonify({"ok": False, "error": "Cursor no válido"}), 400
+        # las facetas no dependen de la página: solo se cuentan en la primera
+        facetas = facetas and not llave
+
+        clave = clave_busqueda(
+            q,
+            categoria=categoria,
+            tipo=tipo,
+            status=status,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            color=color,
+        )
 
-        print(f"[BUSQUEDAS] params q={q!r} categoria={categoria!r} tipo={tipo!r} fecha_inicio={fecha_inicio!r} fecha_fin={fecha_fin!r}")
-
-        db = conectar_db()
-        if db is None:
-            error_msg = "Error de conexión a la base de datos"
-            print(f"[BUSQUEDAS] {error_msg}")
-            return jsonify({"ok": False, "error": error_msg}), 500
-
-        cursor = db.cursor(cursor_factory=RealDictCursor)
+        # la búsqueda es pública: la respuesta serializada se comparte entre visitantes
+        def calcular():
+            db = conectar_db()
+            if db is None:
+                raise ConnectionError("Error de conexión a la base de datos")
 
-        params = []
-        conditions = ['1=1']
+            cursor = db.cursor()
 
-        if q:
-            conditions.append(
-                '(o."NOMBRE" ILIKE %s OR o."COLOR" ILIKE %s OR c."NOMBRE" ILIKE %s)'
+            # los reportes marcados como falsos no son públicos;
+            # se pide una fila extra para saber si existe otra página
+            consulta = (
+                ConsultaReportes(COLUMNAS_BUSQUEDA)
+                .publicos()
+                .texto(q)
+                .solo_tipo(tipo)
+                .categoria(categoria)
+                .status(status)
+                .rango_fechas(fecha_inicio, fecha_fin)
+                .color(color)
+                .ordenar("fecha_desc", llave)
+                .limitar(limite + 1)
             )
-            params.extend([f"%{q}%"] * 3)
+            objetos = consulta.dicts(cursor)
+            cursor.close()
 
-        if categoria:
-            if categoria.isdigit():
-                conditions.append('o."ID_CATEGORIA" = %s')
-                params.append(int(categoria))
-            else:
-                conditions.append('c."NOMBRE" ILIKE %s')
-                params.append(f"%{categoria}%")
-
-        if fecha_inicio:
-            conditions.append('r."FECHA" >= %s::DATE')
-            params.append(fecha_inicio)
-
-        if fecha_fin:
-            conditions.append('r."FECHA" <= %s::DATE')
-            params.append(fecha_fin)
-
-        where = ' AND '.join(conditions)
-
-        if tipo == "perdido":
-            query = f'''
-                SELECT o."NOMBRE", o."ID_OBJETO", o."COLOR", o."IMAGEN",
-                    o."ID_CATEGORIA" AS CATEGORIA, c."NOMBRE" AS nombre_categoria,
-                    o."LUGAR_ENCONTRADO" AS "LUGAR", r."FECHA",
-                    'perdido' AS tipo, r."ID_REPORTE" AS id_reporte
-                FROM "Objetos" o
-                JOIN "Reportes_perdidos" r ON o."ID_OBJETO" = r."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where}
-                AND r."STATUS" = 'perdido'
-                ORDER BY r."FECHA" DESC
-            '''
-            print(f"[BUSQUEDAS] SQL PERDIDO: {query.strip()} params={params}")
-            cursor.execute(query, params)
-
-        elif tipo == "encontrado":
-            query = f'''
-                SELECT o."NOMBRE", o."ID_OBJETO", o."COLOR", o."IMAGEN",
-                    o."ID_CATEGORIA" AS CATEGORIA, c."NOMBRE" AS nombre_categoria,
-                    o."LUGAR_ENCONTRADO" AS "LUGAR", r."FECHA",
-                    'encontrado' AS tipo, r."ID_REPORTE_ENC" AS id_reporte
-                FROM "Objetos" o
-                JOIN "Reportes_encontrados" r ON o."ID_OBJETO" = r."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where}
-                ORDER BY r."FECHA" DESC
-            '''
-            print(f"[BUSQUEDAS] SQL ENCONTRADO: {query.strip()} params={params}")
-            cursor.execute(query, params)
+            siguiente = None
+            if len(objetos) > limite:
+                objetos = objetos[:limite]
+                siguiente = codificar_cursor(consulta.llave_de(objetos[-1]))
 
-        else:
-            params_union = params + params
-            query = f'''
-                SELECT o."NOMBRE", o."ID_OBJETO", o."COLOR", o."IMAGEN",
-                    o."ID_CATEGORIA" AS CATEGORIA, c."NOMBRE" AS nombre_categoria,
-                    o."LUGAR_ENCONTRADO" AS "LUGAR", r."FECHA",
-                    'perdido' AS tipo, r."ID_REPORTE" AS id_reporte
-                FROM "Objetos" o
-                JOIN "Reportes_perdidos" r ON o."ID_OBJETO" = r."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where}
-                AND r."STATUS" = 'perdido'
-
-                UNION ALL
-
-                SELECT o."NOMBRE", o."ID_OBJETO", o."COLOR", o."IMAGEN",
-                    o."ID_CATEGORIA" AS CATEGORIA, c."NOMBRE" AS nombre_categoria,
-                    o."LUGAR_ENCONTRADO" AS "LUGAR", r."FECHA",
-                    'encontrado' AS tipo, r."ID_REPORTE_ENC" AS id_reporte
-                FROM "Objetos" o
-                JOIN "Reportes_encontrados" r ON o."ID_OBJETO" = r."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where}
-
-                ORDER BY "FECHA" DESC
-            '''
-            print(f"[BUSQUEDAS] SQL UNION: {query.strip()} params={params_union}")
-            cursor.execute(query, params_union)
+            conteos = None
+            if facetas:
+                cursor_facetas = db.cursor(cursor_factory=RealDictCursor)
+                conteos = contar_facetas(cursor_facetas, consulta, clave)
+                cursor_facetas.close()
 
-        objetos = cursor.fetchall()
-        print(f"[BUSQUEDAS] resultados={len(objetos)}")
+            db.close()
 
-        cursor.close()
-        db.close()
+            respuesta = {"ok": True, "datos": objetos, "siguiente": siguiente}
+            if not objetos:
+                respuesta = {"datos": [], "mensaje": "No se encontraron resultados"}
+            if conteos is not None:
+                respuesta["facetas"] = conteos
 
-        for objeto in objetos:
-            fecha_val = objeto.get("FECHA")
-            if fecha_val is not None and not isinstance(fecha_val, str):
-                try:
-                    objeto["FECHA"] = fecha_val.isoformat()
-                except Exception:
-                    objeto["FECHA"] = str(fecha_val)
+            return serializar(respuesta)
+
+        try:
+            cuerpo = cache_consultas.obtener_o_calcular(
+                ESPACIO_REPORTES,
+                ["busquedas", facetas, list(clave), limite, cursor_param],
+                calcular,
+            )
+        except ConnectionError as e:
+            print(f"[BUSQUEDAS] {e}")
+            return jsonify({"ok": False, "error": str(e)}), 500
 
-        if not objetos:
-            return jsonify({"datos": [], "mensaje": "No se encontraron resultados"})
+        return respuesta_json(cuerpo)
 
-        return jsonify({"ok": True, "datos": objetos})
     # -------------------------------------
     # RUTA INICIO DE SESIÓN
     # -------------------------------------
@@ -404,40 +358,76 @@ def init_user_routes(app):
                     400,
                 )
 
-            conexion = conectar_db()
-            cursor = conexion.cursor(cursor_factory=RealDictCursor)
+            # límites antes de tocar la base o calcular el hash
+            for limite, clave in (("login_ip", request.remote_addr), ("login_cuenta", id_usuario)):
+                permitido, espera = consumir(limite, clave)
+                if not permitido:
+                    return respuesta_limite(espera)
 
-            cursor.execute(
-                '''
-                SELECT u."ID_USUARIO", u."CONTRASENA", u."GENERO", p."NOMBRE", u."ID_ROL"
-                FROM public."Usuarios" u
-                LEFT JOIN public."Perfiles" p 
-                ON u."ID_USUARIO" = p."ID_USUARIO"
-                WHERE u."ID_USUARIO" = %s
-                ''',
-                (id_usuario,),
-            )
-            user = cursor.fetchone()
+            segundos_restantes, hay_fallos = bloqueo_restante("login", id_usuario)
+            if segundos_restantes:
+                return (
+                    jsonify(
+                        {
+                            "ok": False,
+                            "bloqueado": True,
+                            "mensaje": "Cuenta bloqueada temporalmente por intentos fallidos",
+                            "segundos_restantes": segundos_restantes,
+                        }
+                    ),
+                    403,
+                )
 
-            cursor.close()
-            conexion.close()
+            conexion = conectar_db()
+            cursor = conexion.cursor()
+            user = obtener_usuario_activo(cursor, id_usuario)
 
             if not user:
+                cursor.close()
+                conexion.close()
                 return (
                     jsonify({"ok": False, "mensaje": "El usuario no está registrado"}),
                     404,
                 )
 
-            if not check_password_hash(user["CONTRASENA"], contrasena):
+            if not verificar(user.contrasena, contrasena):
+                cursor.close()
+                conexion.close()
+                _, bloqueo = registrar_fallo("login", id_usuario)
+                if bloqueo:
+                    return (
+                        jsonify(
+                            {
+                                "ok": False,
+                                "bloqueado": True,
+                                "mensaje": "Cuenta bloqueada temporalmente por intentos fallidos",
+                                "segundos_restantes": bloqueo,
+                            }
+                        ),
+                        403,
+                    )
                 return jsonify({"ok": False, "mensaje": "Contraseña incorrecta"}), 401
 
+            if hay_fallos:
+                limpiar_fallos("login", id_usuario)
+
+            # hash con algoritmo o parámetros anteriores: se rehace con la contraseña recién comprobada
+            if necesita_rehash(user.contrasena):
+                cursor.execute(
+                    'UPDATE public."Usuarios" SET "CONTRASENA" = %s WHERE "ID_USUARIO" = %s',
+                    (hashear(contrasena), user.id_usuario),
+                )
+                conexion.commit()
+            cursor.close()
+            conexion.close()
+
             session.clear()
-            session["id_usuario"] = user["ID_USUARIO"]
-            session["nombre"] = user["NOMBRE"]
-            session["genero"] = user["GENERO"]
-            session["id_rol"] = user["ID_ROL"]
+            session["id_usuario"] = user.id_usuario
+            session["nombre"] = user.nombre
+            session["genero"] = user.genero
+            session["id_rol"] = user.id_rol
 
-            if user["ID_ROL"] == 2:
+            if user.id_rol == 2:
                 return jsonify({
                     "ok": True,
                     "mensaje": "Inicio de sesión exitoso",
@@ -449,6 +439,8 @@ def init_user_routes(app):
                 "mensaje": "Inicio de sesión exitoso",
                 "redirect": "/menu"
             })  
+        except HashSaturado:
+            return jsonify({"ok": False, "mensaje": "Servidor ocupado, intenta de nuevo"}), 503
         except Exception as e:
             import traceback
 
@@ -496,15 +488,17 @@ def init_user_routes(app):
             ficha = request.form.get("ficha")
             ficha = int(ficha) if ficha else None
 
-            id_objeto = str(random.randint(100000, 999999))
-            id_reporte = str(random.randint(100000, 999999))
-
             # -------------------------
             # IMAGEN
             # -------------------------
 
             imagen = request.files.get("imagen")
+            id_subida = request.form.get("id_subida")
             ruta = None
+            mover_subida = None
+
+            bd = conectar_db()
+            cursor = bd.cursor()
 
             if imagen and imagen.filename:
 
@@ -522,12 +516,36 @@ def init_user_routes(app):
 
                 ruta = f"/uploads/{unique_filename}"
 
+            elif id_subida:
+                # foto subida por partes (ver subidas.py): se lee en su lugar y se mueve tras el commit
+                try:
+                    save_path, nombre_subida, _ = usar_subida(
+                        cursor, app.config["SUBIDAS_FOLDER"], id_subida, id_usuario, TIPOS_IMAGEN
+                    )
+                except SubidaInvalida as e:
+                    bd.rollback()
+                    cursor.close()
+                    bd.close()
+                    return jsonify({"mensaje": e.mensaje, "error": True}), e.estado
+                unique_filename = f"{uuid.uuid4()}_{secure_filename(nombre_subida)}"
+                ruta = f"/uploads/{unique_filename}"
+                mover_subida = (save_path, os.path.join(app.config["UPLOAD_FOLDER"], unique_filename))
+
+            # huella perceptual para detectar fotos repetidas o del mismo objeto
+            huella = calcular_dhash(save_path) if ruta else None
+
+            # color de la paleta: primero el texto, si no se reconoce el de la foto
+            id_color = normalizar_color(color_dominante)
+            if not id_color and ruta:
+                id_color = color_dominante_imagen(save_path)
+
             # -------------------------
             # DB
             # -------------------------
 
-            bd = conectar_db()
-            cursor = bd.cursor()
+            # la llave de Reportes incluye FECHA, así que el ID único sale de la secuencia
+            cursor.execute("""SELECT nextval('public."Ids_reportes"'), nextval('public."Ids_reportes"')""")
+            id_objeto, id_reporte = (str(i) for i in cursor.fetchone())
 
             # asegurar estado
             cursor.execute('SELECT 1 FROM "Estados" WHERE "ID_ESTADO"=%s', (estado,))
@@ -556,8 +574,8 @@ def init_user_routes(app):
             cursor.execute(
                 """
                 INSERT INTO "Objetos"
-                ("ID_OBJETO","NOMBRE","COLOR","ID_ESTADO","LUGAR_ENCONTRADO","ID_CATEGORIA","IMAGEN")
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
+                ("ID_OBJETO","NOMBRE","COLOR","ID_ESTADO","LUGAR_ENCONTRADO","ID_CATEGORIA","IMAGEN","ID_COLOR")
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
                 """,
                 (
                     id_objeto,
@@ -567,9 +585,13 @@ def init_user_routes(app):
                     lugar,
                     categoria,
                     ruta,
+                    id_color,
                 ),
             )
 
+            if ruta:
+                registrar_huella(cursor, id_objeto, huella)
+
             # -------------------------
             # INSERT REPORTE
             # -------------------------
@@ -612,11 +634,54 @@ def init_user_routes(app):
                     ),
                 )
 
+            agregar_reporte(cursor, tipo, id_reporte)
+
             bd.commit()
+            if mover_subida:
+                os.replace(*mover_subida)
+            invalidar_reportes()
+
+            # proponer coincidencias con reportes del tipo contrario; si falla,
+            # el reporte ya quedó guardado
+            coincidencias = []
+            try:
+                coincidencias = calcular_coincidencias(bd, tipo, id_reporte)
+                bd.commit()
+            except Exception as e:
+                bd.rollback()
+                print(f"Error calculando coincidencias: {e}")
+
+            # otras fotos casi idénticas: reenvíos del mismo usuario o el mismo objeto
+            posibles_duplicados = []
+            if huella is not None:
+                try:
+                    cursor_dict = bd.cursor(cursor_factory=RealDictCursor)
+                    similares = buscar_similares(cursor_dict, huella, excluir_objeto=id_objeto)
+                    cursor_dict.close()
+                    posibles_duplicados = [
+                        {
+                            "id_objeto": s["id_objeto"],
+                            "id_reporte": s["id_reporte"],
+                            "tipo": s["tipo"],
+                            "nombre": s["NOMBRE"],
+                            "imagen": s["IMAGEN"],
+                            "distancia": s["distancia"],
+                            "mismo_usuario": s["ID_USUARIO"] == id_usuario,
+                        }
+                        for s in similares
+                    ]
+                except Exception as e:
+                    bd.rollback()
+                    print(f"Error buscando imágenes similares: {e}")
+
             cursor.close()
             bd.close()
 
-            return jsonify({"mensaje": "Reporte enviado correctamente"}), 200
+            return jsonify({
+                "mensaje": "Reporte enviado correctamente",
+                "coincidencias": coincidencias,
+                "posibles_duplicados": posibles_duplicados,
+            }), 200
 
         except Exception as e:
 
@@ -662,24 +727,8 @@ def init_user_routes(app):
         color = request.args.get("color", "")
 
         db = conectar_db()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-
-        # Construir consulta dinámica según los filtros
-        query = 'SELECT "NOMBRE", "ID_OBJETO", "COLOR", "IMAGEN", "ID_CATEGORIA" FROM "Objetos" WHERE 1=1'
-        params = []
-
-        if q:
-            query += ' AND "NOMBRE" ILIKE %s'
-            params.append(f"%{q}%")
-        if categoria:
-            query += ' AND "ID_CATEGORIA" = %s'
-            params.append(categoria)
-        if color:
-            query += ' AND "COLOR" ILIKE %s'
-            params.append(f"%{color}%")
-
-        cursor.execute(query, params)
-        resultados = cursor.fetchall()
+        cursor = db.cursor()
+        resultados = buscar_objetos(cursor, q, categoria, color)
         cursor.close()
         db.close()
 
@@ -706,7 +755,7 @@ def init_user_routes(app):
         conexion = conectar_db()
         cursor = conexion.cursor(cursor_factory=RealDictCursor)
         cursor.execute(
-            'SELECT "PREGUNTA_1", "PREGUNTA_2" FROM public."Usuarios" WHERE "ID_USUARIO" = %s',
+            'SELECT "PREGUNTA_1", "PREGUNTA_2" FROM public."Usuarios" WHERE "ID_USUARIO" = %s AND "ELIMINADO_EN" IS NULL',
             (id_usuario,),
         )
         user = cursor.fetchone()
@@ -731,6 +780,7 @@ def init_user_routes(app):
     # -------------------------------------
     @app.route("/recuperar_respuestas", methods=["POST"])
     @guest_required
+    @limitar_por_ip("recuperar_ip")
     def recuperar_respuestas():
 
         id_usuario = session.get("recuperar_id")
@@ -747,11 +797,25 @@ def init_user_routes(app):
         conexion = conectar_db()
         cursor = conexion.cursor(cursor_factory=RealDictCursor)
 
+        # Verificar si está bloqueado (antes de leer Usuarios o calcular hashes)
+        segundos_restantes, hay_fallos = bloqueo_restante("recuperacion", id_usuario)
+        if segundos_restantes:
+            cursor.close()
+            conexion.close()
+            return (
+                jsonify(
+                    {
+                        "ok": False,
+                        "bloqueado": True,
+                        "segundos_restantes": segundos_restantes,
+                    }
+                ),
+                403,
+            )
+
         cursor.execute(
             """
-            SELECT "RESPUESTA_1", "RESPUESTA_2",
-                "INTENTOS_RECUPERACION",
-                "BLOQUEADO_HASTA"
+            SELECT "RESPUESTA_1", "RESPUESTA_2"
             FROM public."Usuarios"
             WHERE "ID_USUARIO" = %s
             """,
@@ -765,91 +829,35 @@ def init_user_routes(app):
             conexion.close()
             return jsonify({"ok": False, "mensaje": "Usuario no encontrado"}), 404
 
-        # Verificar si está bloqueado
-        ahora = datetime.utcnow()
-
-        if user["BLOQUEADO_HASTA"] and user["BLOQUEADO_HASTA"] > ahora:
-            segundos_restantes = int((user["BLOQUEADO_HASTA"] - ahora).total_seconds())
-            cursor.close()
-            conexion.close()
-            return (
-                jsonify(
-                    {
-                        "ok": False,
-                        "bloqueado": True,
-                        "segundos_restantes": segundos_restantes,
-                    }
-                ),
-                403,
-            )
-
         # Validar respuestas
-        respuestas_correctas = check_password_hash(
+        respuestas_correctas = verificar(
             user["RESPUESTA_1"], respuesta1
-        ) and check_password_hash(user["RESPUESTA_2"], respuesta2)
+        ) and verificar(user["RESPUESTA_2"], respuesta2)
 
         if not respuestas_correctas:
+            cursor.close()
+            conexion.close()
 
-            intentos = user["INTENTOS_RECUPERACION"] + 1
-
-            # Si llega a 5 intentos → bloquear 10 minutos
-            if intentos >= 5:
-                bloqueo_hasta = ahora + timedelta(minutes=10)
-
-                cursor.execute(
-                    """
-                    UPDATE public."Usuarios"
-                    SET "INTENTOS_RECUPERACION" = 0,
-                        "BLOQUEADO_HASTA" = %s
-                    WHERE "ID_USUARIO" = %s
-                    """,
-                    (bloqueo_hasta, id_usuario),
-                )
-
-                conexion.commit()
-                cursor.close()
-                conexion.close()
-
+            intentos, bloqueo = registrar_fallo("recuperacion", id_usuario)
+            if bloqueo:
                 return (
                     jsonify(
-                        {"ok": False, "bloqueado": True, "segundos_restantes": 600}
+                        {"ok": False, "bloqueado": True, "segundos_restantes": bloqueo}
                     ),
                     403,
                 )
 
-            # Si aún no llega a 5
-            cursor.execute(
-                """
-                UPDATE public."Usuarios"
-                SET "INTENTOS_RECUPERACION" = %s
-                WHERE "ID_USUARIO" = %s
-                """,
-                (intentos, id_usuario),
-            )
-
-            conexion.commit()
-            cursor.close()
-            conexion.close()
-
+            maximo = maximo_fallos("recuperacion")
             return (
                 jsonify(
-                    {"ok": False, "mensaje": f"Respuestas incorrectas ({intentos}/5)"}
+                    {"ok": False, "mensaje": f"Respuestas incorrectas ({intentos}/{maximo})"}
                 ),
                 401,
             )
 
         # Si respuestas correctas → resetear intentos
-        cursor.execute(
-            """
-            UPDATE public."Usuarios"
-            SET "INTENTOS_RECUPERACION" = 0,
-                "BLOQUEADO_HASTA" = NULL
-            WHERE "ID_USUARIO" = %s
-            """,
-            (id_usuario,),
-        )
-
-        conexion.commit()
+        if hay_fallos:
+            limpiar_fallos("recuperacion", id_usuario)
 
         # solo estamos validando respuestas
         if not nueva_contrasena:
@@ -880,7 +888,7 @@ def init_user_routes(app):
             )
 
         # Actualizar contraseña
-        hashed_password = generate_password_hash(nueva_contrasena)
+        hashed_password = hashear(nueva_contrasena)
 
         cursor.execute(
             """
@@ -1025,12 +1033,72 @@ def init_user_routes(app):
             print(f"Error en guardar_perfil: {e}")
             return jsonify({"ok": False, "error": str(e)}), 500
 
+    def _guardar_foto_perfil(db, cursor, id_usuario, ruta_guardada, mover_subida=None):
+        """Anota la foto en Perfiles; la de una subida por partes se mueve tras el commit."""
+        # Verificar si existe perfil
+        cursor.execute(
+            'SELECT 1 FROM "Perfiles" WHERE "ID_USUARIO" = %s', (id_usuario,)
+        )
+        existe = cursor.fetchone()
+
+        if existe:
+            cursor.execute(
+                """
+                UPDATE "Perfiles"
+                SET "FOTO_PERFIL" = %s, "FECHA_ACTUALIZACION" = CURRENT_TIMESTAMP
+                WHERE "ID_USUARIO" = %s
+            """,
+                (ruta_guardada, id_usuario),
+            )
+        else:
+            # Crear perfil si no existe (no debería pasar)
+            cursor.execute(
+                """
+                INSERT INTO "Perfiles" ("ID_USUARIO", "FOTO_PERFIL")
+                VALUES (%s, %s)
+            """,
+                (id_usuario, ruta_guardada),
+            )
+
+        db.commit()
+        cursor.close()
+        db.close()
+        if mover_subida:
+            os.replace(*mover_subida)
+
+        return jsonify(
+            {
+                "ok": True,
+                "ruta": ruta_guardada,
+                "mensaje": "Foto actualizada correctamente",
+            }
+        )
+
     @app.route("/subir_foto_perfil", methods=["POST"])
     @login_required
     def subir_foto_perfil():
         """Sube la foto de perfil del usuario"""
         try:
             id_usuario = session["id_usuario"]
+            id_subida = request.form.get("id_subida")
+
+            if id_subida:
+                # foto subida por partes (ver subidas.py); se mueve después del commit
+                db = conectar_db()
+                cursor = db.cursor()
+                try:
+                    ruta_subida, nombre_subida, _ = usar_subida(
+                        cursor, app.config["SUBIDAS_FOLDER"], id_subida, id_usuario,
+                        {"image/png", "image/jpeg", "image/gif"},
+                    )
+                except SubidaInvalida as e:
+                    db.rollback()
+                    cursor.close()
+                    db.close()
+                    return jsonify({"ok": False, "error": e.mensaje}), e.estado
+                filename = f"perfil_{id_usuario}_{uuid.uuid4().hex}.{nombre_subida.rsplit('.', 1)[1].lower()}"
+                mover_subida = (ruta_subida, os.path.join(app.config["UPLOAD_FOLDER"], filename))
+                return _guardar_foto_perfil(db, cursor, id_usuario, f"/uploads/{filename}", mover_subida)
 
             if "foto" not in request.files:
                 return jsonify({"ok": False, "error": "No se encontró imagen"}), 400
@@ -1056,47 +1124,8 @@ def init_user_routes(app):
             filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
             foto.save(filepath)
 
-            ruta_guardada = f"/uploads/{filename}"
-
             db = conectar_db()
-            cursor = db.cursor()
-
-            # Verificar si existe perfil
-            cursor.execute(
-                'SELECT 1 FROM "Perfiles" WHERE "ID_USUARIO" = %s', (id_usuario,)
-            )
-            existe = cursor.fetchone()
-
-            if existe:
-                cursor.execute(
-                    """
-                    UPDATE "Perfiles"
-                    SET "FOTO_PERFIL" = %s, "FECHA_ACTUALIZACION" = CURRENT_TIMESTAMP
-                    WHERE "ID_USUARIO" = %s
-                """,
-                    (ruta_guardada, id_usuario),
-                )
-            else:
-                # Crear perfil si no existe (no debería pasar)
-                cursor.execute(
-                    """
-                    INSERT INTO "Perfiles" ("ID_USUARIO", "FOTO_PERFIL")
-                    VALUES (%s, %s)
-                """,
-                    (id_usuario, ruta_guardada),
-                )
-
-            db.commit()
-            cursor.close()
-            db.close()
-
-            return jsonify(
-                {
-                    "ok": True,
-                    "ruta": ruta_guardada,
-                    "mensaje": "Foto actualizada correctamente",
-                }
-            )
+            return _guardar_foto_perfil(db, db.cursor(), id_usuario, f"/uploads/{filename}")
 
         except Exception as e:
             print(f"Error en subir_foto_perfil: {e}")
@@ -1129,75 +1158,14 @@ def init_user_routes(app):
             fecha_inicio = request.args.get("fecha_inicio", "").strip() or None
             fecha_fin = request.args.get("fecha_fin", "").strip() or None
             
-            def build_category_condition(alias):
-                if not categoria:
-                    return None, []
-                if categoria.isdigit():
-                    return f'{alias}."ID_CATEGORIA" = %s', [int(categoria)]
-                return f'c."NOMBRE" ILIKE %s', [f"%{categoria}%"]
-
             db = conectar_db()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
-
-            # Construir condiciones para PERDIDOS
-            conditions_p = ['r."ID_USUARIO" = %s']
-            params_p = [id_usuario]
-            
-            # Construir condiciones para ENCONTRADOS
-            conditions_e = ['r."ID_USUARIO" = %s']
-            params_e = [id_usuario]
-
-            category_condition, category_params = build_category_condition('o')
-            if category_condition:
-                conditions_p.append(category_condition)
-                conditions_e.append(category_condition)
-                params_p.extend(category_params)
-                params_e.extend(category_params)
-
-            if fecha_inicio:
-                conditions_p.append('r."FECHA" >= %s::DATE')
-                conditions_e.append('r."FECHA" >= %s::DATE')
-                params_p.append(fecha_inicio)
-                params_e.append(fecha_inicio)
-            
-            if fecha_fin:
-                conditions_p.append('r."FECHA" <= %s::DATE')
-                conditions_e.append('r."FECHA" <= %s::DATE')
-                params_p.append(fecha_fin)
-                params_e.append(fecha_fin)
-
-            if tipo == 'perdido':
-                conditions_e.append('FALSE')
-            elif tipo == 'encontrado':
-                conditions_p.append('FALSE')
-
-            # Combinar todos los parámetros en el orden correcto
-            params = params_p + params_e
-            
-            where_p = ' AND '.join(conditions_p)
-            where_e = ' AND '.join(conditions_e)
-            
-            query = f"""
-                SELECT r."ID_REPORTE" as id_reporte, 'perdido' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_perdidos" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where_p}
-                UNION ALL
-                SELECT r."ID_REPORTE_ENC" as id_reporte, 'encontrado' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_encontrados" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where_e}
-                ORDER BY "FECHA" DESC
-            """
-
-            cursor.execute(query, params)
-            reportes = cursor.fetchall()
+            cursor = db.cursor()
+            reportes = reportes_de_usuario(cursor, id_usuario, categoria, tipo, fecha_inicio, fecha_fin)
             cursor.close()
             db.close()
 
-            return jsonify({"ok": True, "datos": reportes})
+            # jsonify y no respuesta_json: mis_reportes.html espera FECHA en el formato HTTP de Flask (GMT)
+            return jsonify({"ok": True, "datos": [r.a_dict() for r in reportes]})
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -1205,51 +1173,9 @@ def init_user_routes(app):
 
     @app.route('/api/reportes_recientes', methods=['GET'])
     def api_reportes_recientes():
+        """Últimos reportes para la portada, servidos desde el feed precalculado."""
         try:
-            print('[API_REPORTES_RECIENTES] llamada recibida')
-            db = conectar_db()
-            if db is None:
-                error_msg = 'Error de conexión a la base de datos'
-                print(f'[API_REPORTES_RECIENTES] {error_msg}')
-                return jsonify({'ok': False, 'error': error_msg}), 500
-
-            cursor = db.cursor(cursor_factory=RealDictCursor)
-            query = '''
-                SELECT o."NOMBRE", o."ID_OBJETO", o."COLOR", o."IMAGEN",
-                       o."ID_CATEGORIA" AS CATEGORIA, c."NOMBRE" AS nombre_categoria,
-                       o."LUGAR_ENCONTRADO" AS "LUGAR", r."FECHA", 'perdido' AS tipo, r."ID_REPORTE" AS id_reporte,
-                       COALESCE(u."NOMBRE", 'Usuario') AS NOMBRE_USUARIO
-                FROM "Reportes_perdidos" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                LEFT JOIN "Usuarios" u ON r."ID_USUARIO" = u."ID_USUARIO"
-                UNION ALL
-                SELECT o."NOMBRE", o."ID_OBJETO", o."COLOR", o."IMAGEN",
-                       o."ID_CATEGORIA" AS CATEGORIA, c."NOMBRE" AS nombre_categoria,
-                       o."LUGAR_ENCONTRADO" AS "LUGAR", r."FECHA", 'encontrado' AS tipo, r."ID_REPORTE_ENC" AS id_reporte,
-                       COALESCE(u."NOMBRE", 'Usuario') AS NOMBRE_USUARIO
-                FROM "Reportes_encontrados" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                LEFT JOIN "Usuarios" u ON r."ID_USUARIO" = u."ID_USUARIO"
-                ORDER BY "FECHA" DESC
-            '''
-            print(f'[API_REPORTES_RECIENTES] SQL: {query.strip()}')
-            cursor.execute(query)
-            reportes = cursor.fetchall()
-            print(f'[API_REPORTES_RECIENTES] resultados={len(reportes)}')
-            cursor.close()
-            db.close()
-
-            for reporte in reportes:
-                fecha_val = reporte.get("FECHA")
-                if fecha_val is not None and not isinstance(fecha_val, str):
-                    try:
-                        reporte["FECHA"] = fecha_val.isoformat()
-                    except Exception:
-                        reporte["FECHA"] = str(fecha_val)
-
-            return jsonify({"ok": True, "datos": reportes})
+            return respuesta_json(feed_serializado(conectar_db))
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -1287,88 +1213,39 @@ def init_user_routes(app):
             busqueda = (payload.get("busqueda") or "").strip() or None
                         
             db = conectar_db()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
-
-            # Construir condiciones para PERDIDOS
-            conditions_p = ['r."ID_USUARIO" = %s']
-            params_p = [id_usuario]
-            
-            if categoria:
-                conditions_p.append('o."ID_CATEGORIA" = %s')
-                params_p.append(categoria)
-
-            if busqueda:
-                conditions_p.append('(LOWER(o."NOMBRE") LIKE LOWER(%s) OR LOWER(o."COLOR") LIKE LOWER(%s))')
-                params_p.extend([f"%{busqueda}%", f"%{busqueda}%"])
-
-            if fecha_inicio:
-                conditions_p.append('r."FECHA" >= %s::DATE')
-                params_p.append(fecha_inicio)
-            
-            if fecha_fin:
-                conditions_p.append('r."FECHA" <= %s::DATE')
-                params_p.append(fecha_fin)
-            
-            # Construir condiciones para ENCONTRADOS
-            conditions_e = ['r."ID_USUARIO" = %s']
-            params_e = [id_usuario]
-            
-            if categoria:
-                conditions_e.append('o."ID_CATEGORIA" = %s')
-                params_e.append(categoria)
-            
-            if fecha_inicio:
-                conditions_e.append('r."FECHA" >= %s::DATE')
-                params_e.append(fecha_inicio)
-            
-            if fecha_fin:
-                conditions_e.append('r."FECHA" <= %s::DATE')
-                params_e.append(fecha_fin)
-            
-            params = params_p + params_e
-            where_p = ' AND '.join(conditions_p)
-            where_e = ' AND '.join(conditions_e)
-            
-            query = f"""
-                SELECT r."ID_REPORTE" as id_reporte, 'perdido' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_perdidos" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where_p}
-                UNION ALL
-                SELECT r."ID_REPORTE_ENC" as id_reporte, 'encontrado' as tipo, o."ID_OBJETO", o."NOMBRE", o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", o."ID_CATEGORIA" as categoria, c."NOMBRE" as nombre_categoria
-                FROM "Reportes_encontrados" r
-                JOIN "Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
-                LEFT JOIN "Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
-                WHERE {where_e}
-                ORDER BY "FECHA" DESC
-            """
-
-            cursor.execute(query, params)
-            reportes = cursor.fetchall()
+            cursor = db.cursor()
+            reportes = (
+                ConsultaReportes()
+                .del_usuario(id_usuario)
+                .solo_tipo(tipo)
+                .categoria(categoria)
+                .texto(busqueda)
+                .rango_fechas(fecha_inicio, fecha_fin)
+                .modelos(cursor)
+            )
             cursor.close()
             db.close()
 
             # Generar HTML para el PDF
             filas_tabla = ""
             for idx, r in enumerate(reportes, 1):
-                fecha = r.get('FECHA')
-                if isinstance(fecha, datetime):
+                fecha = r.fecha
+                if isinstance(fecha, (datetime, date)):
                     fecha_str = fecha.strftime('%d/%m/%Y')
                 else:
                     fecha_str = str(fecha) if fecha else 'N/A'
                 
-                tipoLabel = 'Perdido' if r['tipo'] == 'perdido' else 'Encontrado'
+                tipoLabel = 'Perdido' if r.tipo == 'perdido' else 'Encontrado'
                 
                 filas_tabla += f"""
                 <tr>
                     <td>{idx}</td>
-                    <td>{r.get('NOMBRE', 'N/A')}</td>
-                    <td>{r.get('COLOR', 'N/A')}</td>
-                    <td>{r.get('nombre_categoria', 'N/A')}</td>
+                    <td>{r.nombre or 'N/A'}</td>
+                    <td>{r.color or 'N/A'}</td>
+                    <td>{r.nombre_categoria or 'N/A'}</td>
                     <td>{tipoLabel}</td>
                     <td>{fecha_str}</td>
-                    <td>{(r.get('OBSERVACIONES') or '')[:100]}</td>
+                    <td>{(r.observaciones or '')[:100]}</td>
                 </tr>
                 """
 
@@ -1613,8 +1490,11 @@ def init_user_routes(app):
 
                 cursor.execute('DELETE FROM "Reportes_encontrados" WHERE "ID_REPORTE_ENC" = %s', (id_reporte,))
 
-            db.commit()
             afectadas = cursor.rowcount if hasattr(cursor, 'rowcount') else None
+            quitar_reportes(cursor, tipo, [id_reporte])
+
+            db.commit()
+            invalidar_reportes()
             cursor.close()
             db.close()
 
@@ -1747,7 +1627,7 @@ def init_user_routes(app):
                 return jsonify({"ok": False, "error": "Usuario no encontrado"}), 404
 
             # Verificar contraseña actual
-            if not check_password_hash(usuario["CONTRASENA"], contrasena_actual):
+            if not verificar(usuario["CONTRASENA"], contrasena_actual):
                 cursor.close()
                 db.close()
                 return (
@@ -1756,7 +1636,7 @@ def init_user_routes(app):
                 )
 
             # Actualizar contraseña
-            nueva_hash = generate_password_hash(contrasena_nueva)
+            nueva_hash = hashear(contrasena_nueva)
             cursor.execute(
                 'UPDATE "Usuarios" SET "CONTRASENA" = %s WHERE "ID_USUARIO" = %s',
                 (nueva_hash, id_usuario),
@@ -1768,6 +1648,8 @@ def init_user_routes(app):
             return jsonify(
                 {"ok": True, "mensaje": "Contraseña actualizada correctamente"}
             )
+        except HashSaturado:
+            return jsonify({"ok": False, "error": "Servidor ocupado, intenta de nuevo"}), 503
         except Exception as e:
             return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -1828,20 +1710,15 @@ def init_user_routes(app):
             db = conectar_db()
             cursor = db.cursor(cursor_factory=RealDictCursor)
 
-            # Reportes totales (suma de encontrados y perdidos)
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_encontrados"')
-            encontrados = cursor.fetchone()["total"]
+            # Reportes totales (encontrados y perdidos)
+            cursor.execute('SELECT COUNT(*) as total FROM "Reportes"')
+            reportes_totales = cursor.fetchone()["total"]
 
-            cursor.execute('SELECT COUNT(*) as total FROM "Reportes_perdidos"')
-            perdidos = cursor.fetchone()["total"]
-
-            reportes_totales = encontrados + perdidos
-
-            # Recuperados: objetos que fueron perdidos Y encontrados
+            # Recuperados: coincidencias perdido/encontrado confirmadas por un admin
             cursor.execute("""
-                SELECT COUNT(DISTINCT rp."ID_OBJETO") as recuperados
-                FROM "Reportes_perdidos" rp
-                INNER JOIN "Reportes_encontrados" re ON rp."ID_OBJETO" = re."ID_OBJETO"
+                SELECT COUNT(*) as recuperados
+                FROM "Coincidencias"
+                WHERE "ESTADO" = 'confirmada'
             """)
             recuperados = cursor.fetchone()["recuperados"]
 
@@ -1857,11 +1734,7 @@ def init_user_routes(app):
 
             # Usuarios activos (usuarios únicos que han reportado algo)
             cursor.execute("""
-                SELECT COUNT(DISTINCT id_usuario) as activos FROM (
-                    SELECT "ID_USUARIO" as id_usuario FROM "Reportes_encontrados"
-                    UNION
-                    SELECT "ID_USUARIO" as id_usuario FROM "Reportes_perdidos"
-                ) usuarios_unicos
+                SELECT COUNT(DISTINCT "ID_USUARIO") as activos FROM "Reportes"
             """)
             usuarios_activos = cursor.fetchone()["activos"]
 
@@ -1897,37 +1770,38 @@ def init_user_routes(app):
         try:
             id_usuario = session.get("id_usuario")
             db = conectar_db()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
+            cursor = db.cursor()
 
             # traer los últimos 10 eventos del usuario (perdidos o encontrados)
-            cursor.execute(
-                """
-                SELECT 'perdido' AS tipo, rp."FECHA" as fecha, o."NOMBRE" as nombre
-                FROM "Reportes_perdidos" rp
-                JOIN "Objetos" o ON rp."ID_OBJETO" = o."ID_OBJETO"
-                WHERE rp."ID_USUARIO" = %s
-                UNION ALL
-                SELECT 'encontrado' AS tipo, re."FECHA" as fecha, o."NOMBRE" as nombre
-                FROM "Reportes_encontrados" re
-                JOIN "Objetos" o ON re."ID_OBJETO" = o."ID_OBJETO"
-                WHERE re."ID_USUARIO" = %s
-                ORDER BY fecha DESC
-                LIMIT 10
-            """,
-                (id_usuario, id_usuario),
+            eventos = (
+                ConsultaReportes(("tipo", ("fecha", "FECHA"), ("nombre", "NOMBRE")))
+                .del_usuario(id_usuario)
+                .limitar(10)
+                .dicts(cursor)
             )
-            eventos = cursor.fetchall()
             cursor.close()
             db.close()
-            # convertir fecha a string ISO para JS
-            for ev in eventos:
-                if isinstance(ev.get("fecha"), datetime):
-                    ev["fecha"] = ev["fecha"].isoformat()
-            return jsonify({"eventos": eventos})
+            return respuesta_json({"eventos": eventos})
         except Exception as e:
             print(f"Error en actividad: {e}")
             return jsonify({"eventos": []}), 500
 
+    @app.route("/api/mis_coincidencias")
+    @login_required
+    def api_mis_coincidencias():
+        """Posibles coincidencias de los reportes del usuario, mejores primero"""
+        try:
+            id_usuario = session.get("id_usuario")
+            db = conectar_db()
+            cursor = db.cursor(cursor_factory=RealDictCursor)
+            coincidencias = listar_coincidencias_usuario(cursor, id_usuario)
+            cursor.close()
+            db.close()
+            return jsonify({"ok": True, "coincidencias": coincidencias})
+        except Exception as e:
+            print(f"Error en coincidencias: {e}")
+            return jsonify({"ok": False, "coincidencias": []}), 500
+
 
 # -------------------------------------
 # RUTA PARA PAGO SIMULADO
@@ -2088,43 +1962,28 @@ def init_user_routes(app):
         return "", 0
 
     def _build_conversations(cursor, id_usuario):
-        cursor.execute(
-            '''
-            SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO", m."ASUNTO", m."CUERPO", m."FECHA", m."LEIDO",
-            o."NOMBRE" as OBJETO_NOMBRE, o."IMAGEN" as OBJETO_IMAGEN,
-            pr."NOMBRE" as REMITENTE_NOMBRE,
-            pd."NOMBRE" as DESTINATARIO_NOMBRE
-            FROM public."Mensajes" m
-            LEFT JOIN public."Objetos" o ON m."ID_OBJETO" = o."ID_OBJETO"
-            LEFT JOIN public."Perfiles" pr ON m."ID_REMITENTE" = pr."ID_USUARIO"
-            LEFT JOIN public."Perfiles" pd ON m."ID_DESTINATARIO" = pd."ID_USUARIO"
-            WHERE m."ID_REMITENTE" = %s OR m."ID_DESTINATARIO" = %s
-            ORDER BY m."FECHA" DESC
-            ''',
-            (id_usuario, id_usuario),
-        )
-        mensajes = cursor.fetchall()
+        mensajes = mensajes_de_usuario(cursor, id_usuario)
         threads = {}
         for m in mensajes:
-            remitente = m.get("ID_REMITENTE")
-            destinatario = m.get("ID_DESTINATARIO")
+            remitente = m.id_remitente
+            destinatario = m.id_destinatario
             other_user = destinatario if remitente == id_usuario else remitente
             other_name = (
-                m.get("DESTINATARIO_NOMBRE")
+                m.destinatario_nombre
                 if remitente == id_usuario
-                else m.get("REMITENTE_NOMBRE")
+                else m.remitente_nombre
             ) or other_user
-            fecha_str, fecha_ts = _format_fecha_mensaje(m.get("FECHA"))
+            fecha_str, fecha_ts = _format_fecha_mensaje(m.fecha)
             if other_user not in threads:
                 threads[other_user] = {
                     "contacto_id": other_user,
                     "destinatario": other_user,
                     "nombre": other_name,
                     "id_objeto": "0",
-                    "objeto_nombre": m.get("OBJETO_NOMBRE") or "Chat general",
-                    "objeto_imagen": m.get("OBJETO_IMAGEN") or None,
-                    "ultimo_mensaje": m.get("CUERPO") or "",
-                    "ultimo_asunto": m.get("ASUNTO") or "",
+                    "objeto_nombre": m.objeto_nombre or "Chat general",
+                    "objeto_imagen": m.objeto_imagen or None,
+                    "ultimo_mensaje": m.cuerpo or "",
+                    "ultimo_asunto": m.asunto or "",
                     "ultima_fecha": fecha_str,
                     "ultima_fecha_ts": fecha_ts,
                     "sent": remitente == id_usuario,
@@ -2133,16 +1992,16 @@ def init_user_routes(app):
             elif fecha_ts > (threads[other_user].get("ultima_fecha_ts") or 0):
                 threads[other_user].update(
                     {
-                        "objeto_nombre": m.get("OBJETO_NOMBRE") or "Chat general",
-                        "objeto_imagen": m.get("OBJETO_IMAGEN") or None,
-                        "ultimo_mensaje": m.get("CUERPO") or "",
-                        "ultimo_asunto": m.get("ASUNTO") or "",
+                        "objeto_nombre": m.objeto_nombre or "Chat general",
+                        "objeto_imagen": m.objeto_imagen or None,
+                        "ultimo_mensaje": m.cuerpo or "",
+                        "ultimo_asunto": m.asunto or "",
                         "ultima_fecha": fecha_str,
                         "ultima_fecha_ts": fecha_ts,
                         "sent": remitente == id_usuario,
                     }
                 )
-            if destinatario == id_usuario and not m.get("LEIDO"):
+            if destinatario == id_usuario and not m.leido:
                 threads[other_user]["unread"] += 1
         thread_list = sorted(
             threads.values(), key=lambda x: x.get("ultima_fecha_ts", 0), reverse=True
@@ -2191,7 +2050,7 @@ def init_user_routes(app):
             db = conectar_db()
             if not db:
                 raise RuntimeError("Sin conexión a la base de datos")
-            cursor = db.cursor(cursor_factory=RealDictCursor)
+            cursor = db.cursor()
             conversaciones = _build_conversations(cursor, id_usuario)
             unread_count = sum(t.get("unread", 0) for t in conversaciones)
             cursor.close()
@@ -2210,21 +2069,23 @@ def init_user_routes(app):
     # -----------------------------
     # API MENSAJERÍA
     # -----------------------------
-    def usuario_tiene_reportes(cursor, id_usuario):
+    def usuarios_con_reportes(cursor, *ids_usuario):
+        """Cuáles de los usuarios tienen al menos un reporte publicado, en una consulta."""
         cursor.execute(
             '''
-            SELECT 1 FROM public."Reportes_perdidos" WHERE "ID_USUARIO" = %s
-            UNION ALL
-            SELECT 1 FROM public."Reportes_encontrados" WHERE "ID_USUARIO" = %s
-            LIMIT 1
+            SELECT u."ID_USUARIO" FROM unnest(%s::text[]) AS u("ID_USUARIO")
+            WHERE EXISTS (SELECT 1 FROM public."Reportes" r WHERE r."ID_USUARIO" = u."ID_USUARIO")
             ''',
-            (id_usuario, id_usuario),
+            (list(ids_usuario),),
         )
-        return cursor.fetchone() is not None
+        return {fila["ID_USUARIO"] if isinstance(fila, dict) else fila[0] for fila in cursor.fetchall()}
 
     @app.route('/api/mensajes/enviar', methods=['POST'])
     @login_required
+    @presupuesto_consultas(12)  # 10 con subidas + la del tema en la primera petición de la sesión + la del rol si no está en caché
     def api_enviar_mensaje():
+        recibidos = []
+        subidas = []
         try:
             remitente = session.get('id_usuario')
             destinatario = request.form.get('destinatario') or request.form.get('to')
@@ -2239,20 +2100,39 @@ def init_user_routes(app):
             db = conectar_db()
             cursor = db.cursor()
 
-            # verificar que el destinatario exista
-            cursor.execute('SELECT 1 FROM public."Usuarios" WHERE "ID_USUARIO"=%s', (destinatario,))
+            # adjuntos (también los subidos por partes) a temporales con su hash
+            # antes de abrir la transacción del mensaje
+            ids_subidas = request.form.getlist('subidas')
+            archivos = request.files.getlist('adjuntos') or request.files.getlist('files')
+            try:
+                subidas = subidas_completas(cursor, app.config['SUBIDAS_FOLDER'], ids_subidas, remitente)
+                db.commit()
+                archivos += [como_archivo(*subida) for subida in subidas]
+                recibidos = recibir(archivos, app.config['ADJUNTOS_FOLDER'])
+            except (AdjuntoRechazado, SubidaInvalida) as e:
+                db.rollback()
+                cursor.close()
+                db.close()
+                return jsonify({'ok': False, 'error': e.mensaje}), e.estado
+            finally:
+                for archivo in archivos:
+                    archivo.close()
+
+            # verificar que el destinatario exista y no esté eliminado
+            cursor.execute('SELECT 1 FROM public."Usuarios" WHERE "ID_USUARIO"=%s AND "ELIMINADO_EN" IS NULL', (destinatario,))
             if not cursor.fetchone():
                 cursor.close()
                 db.close()
                 return jsonify({'ok': False, 'error': 'Usuario destinatario no existe'}), 404
 
             # ambos usuarios deben haber publicado al menos un reporte
-            if not usuario_tiene_reportes(cursor, destinatario):
+            con_reportes = usuarios_con_reportes(cursor, destinatario, remitente)
+            if destinatario not in con_reportes:
                 cursor.close()
                 db.close()
                 return jsonify({'ok': False, 'error': 'El destinatario no tiene reportes publicados'}), 403
 
-            if not usuario_tiene_reportes(cursor, remitente):
+            if remitente not in con_reportes:
                 cursor.close()
                 db.close()
                 return jsonify({'ok': False, 'error': 'Debes tener al menos un reporte publicado para enviar mensajes'}), 403
@@ -2296,20 +2176,15 @@ def init_user_routes(app):
             )
             id_mensaje = cursor.fetchone()[0]
 
-            # manejar archivos adjuntos
-            adjuntos = request.files.getlist('adjuntos') or request.files.getlist('files')
-            for f in adjuntos:
-                if f and f.filename:
-                    filename = secure_filename(f.filename)
-                    unique = f"{uuid.uuid4()}_{filename}"
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    save_path = os.path.join(app.config['UPLOAD_FOLDER'], unique)
-                    f.save(save_path)
-                    ruta_rel = f"/uploads/{unique}"
-                    cursor.execute(
-                        'INSERT INTO public."Adjuntos_mensajes" ("ID_MENSAJE","RUTA","NOMBRE_ORIGINAL","TIPO") VALUES (%s,%s,%s,%s)',
-                        (id_mensaje, ruta_rel, filename, f.mimetype),
-                    )
+            # contenidos y filas de adjuntos; los archivos se colocan después del commit
+            registrar(cursor, id_mensaje, recibidos)
+            try:
+                usar_subidas(cursor, ids_subidas, remitente)
+            except SubidaInvalida as e:
+                db.rollback()
+                cursor.close()
+                db.close()
+                return jsonify({'ok': False, 'error': e.mensaje}), e.estado
 
             # crear notificación interna para el destinatario
             notif_text = f"Nuevo mensaje de {remitente}: {asunto or '(sin asunto)'}"
@@ -2323,11 +2198,18 @@ def init_user_routes(app):
             db.commit()
             cursor.close()
             db.close()
+            colocar(app.config['ADJUNTOS_FOLDER'], recibidos)
+            # las subidas ya se copiaron a adjuntos
+            for ruta_subida, _, _ in subidas:
+                os.remove(ruta_subida)
 
             return jsonify({'ok': True, 'id_mensaje': id_mensaje})
         except Exception as e:
             print(f"Error enviando mensaje: {e}")
             return jsonify({'ok': False, 'error': str(e)}), 500
+        finally:
+            # lo que no llegó a colocarse (rechazo o error) no queda en tmp
+            descartar(recibidos)
 
 
     @app.route('/chat/<destinatario_id>/<id_objeto>')
@@ -2351,12 +2233,13 @@ def init_user_routes(app):
             return redirect('/buzon')
 
         # comprobar que el destinatario y el usuario actual tienen reportes publicados
-        if not usuario_tiene_reportes(cursor, destinatario_id):
+        con_reportes = usuarios_con_reportes(cursor, destinatario_id, id_usuario)
+        if destinatario_id not in con_reportes:
             cursor.close()
             db.close()
             return render_template('chat.html', error='El usuario no tiene reportes publicados.', destinatario=None, mensajes=[])
 
-        if not usuario_tiene_reportes(cursor, id_usuario):
+        if id_usuario not in con_reportes:
             cursor.close()
             db.close()
             return render_template('chat.html', error='Debes tener un reporte publicado para chatear.', destinatario=None, mensajes=[])
@@ -2439,23 +2322,11 @@ def init_user_routes(app):
             db = conectar_db()
             if not db:
                 return jsonify({'ok': False, 'error': 'Sin conexión a la base de datos'}), 500
-            cursor = db.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(
-                '''
-                SELECT m."ID_MENSAJE", m."ID_REMITENTE", p."NOMBRE" as REMITENTE_NOMBRE,
-                       m."ASUNTO", m."CUERPO", m."FECHA", m."LEIDO"
-                FROM public."Mensajes" m
-                LEFT JOIN public."Perfiles" p ON m."ID_REMITENTE" = p."ID_USUARIO"
-                WHERE m."ID_DESTINATARIO" = %s
-                ORDER BY m."FECHA" DESC
-                LIMIT 200
-                ''',
-                (id_usuario,)
-            )
-            mensajes = [_serialize_mensaje_row(m) for m in cursor.fetchall()]
+            cursor = db.cursor()
+            mensajes = mensajes_recibidos(cursor, id_usuario)
             cursor.close()
             db.close()
-            return jsonify(mensajes)
+            return respuesta_json(mensajes)
         except Exception as e:
             print(f"Error listando mensajes: {e}")
             return jsonify([]), 500
@@ -2491,7 +2362,7 @@ def init_user_routes(app):
             db = conectar_db()
             if not db:
                 return jsonify({'ok': False, 'error': 'Sin conexión a la base de datos'}), 500
-            cursor = db.cursor(cursor_factory=RealDictCursor)
+            cursor = db.cursor()
             thread_list = _build_conversations(cursor, id_usuario)
             cursor.close()
             db.close()
@@ -2509,7 +2380,8 @@ def init_user_routes(app):
             db = conectar_db()
             if not db:
                 return jsonify({'ok': False, 'error': 'Sin conexión a la base de datos'}), 500
-            cursor = db.cursor(cursor_factory=RealDictCursor)
+            # tuplas: fecha y LEIDO ya vienen formateados desde el SQL
+            cursor = db.cursor()
             cursor.execute('SELECT "ID_USUARIO" FROM public."Usuarios" WHERE "ID_USUARIO"=%s', (destinatario_id,))
             if not cursor.fetchone():
                 cursor.close()
@@ -2522,7 +2394,8 @@ def init_user_routes(app):
             if id_objeto:
                 cursor.execute(
                     '''
-                    SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO", m."ID_RESPUESTA", m."ASUNTO", m."CUERPO", m."FECHA", m."LEIDO",
+                    SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO", m."ID_RESPUESTA", m."ASUNTO", m."CUERPO",
+                           to_char(m."FECHA", 'DD/MM/YYYY HH24:MI') AS "FECHA", COALESCE(m."LEIDO", FALSE) AS "LEIDO",
                            pr."NOMBRE" as REMITENTE_NOMBRE, pd."NOMBRE" as DESTINATARIO_NOMBRE,
                            o."NOMBRE" as OBJETO_NOMBRE,
                            rm."CUERPO" as RESPUESTA_CUERPO, rm."ID_REMITENTE" as RESPUESTA_REMITENTE
@@ -2541,7 +2414,8 @@ def init_user_routes(app):
             else:
                 cursor.execute(
                     '''
-                    SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO", m."ID_RESPUESTA", m."ASUNTO", m."CUERPO", m."FECHA", m."LEIDO",
+                    SELECT m."ID_MENSAJE", m."ID_REMITENTE", m."ID_DESTINATARIO", m."ID_OBJETO", m."ID_RESPUESTA", m."ASUNTO", m."CUERPO",
+                           to_char(m."FECHA", 'DD/MM/YYYY HH24:MI') AS "FECHA", COALESCE(m."LEIDO", FALSE) AS "LEIDO",
                            pr."NOMBRE" as REMITENTE_NOMBRE, pd."NOMBRE" as DESTINATARIO_NOMBRE,
                            o."NOMBRE" as OBJETO_NOMBRE,
                            rm."CUERPO" as RESPUESTA_CUERPO, rm."ID_REMITENTE" as RESPUESTA_REMITENTE
@@ -2556,14 +2430,14 @@ def init_user_routes(app):
                     ''',
                     (id_usuario, destinatario_id, destinatario_id, id_usuario),
                 )
-            mensajes = [_serialize_mensaje_row(m) for m in cursor.fetchall()]
+            mensajes = filas_como_dicts(cursor)
 
             _marcar_mensajes_leidos(db, id_usuario, destinatario_id, id_objeto)
 
             cursor.close()
             db.close()
 
-            return jsonify({'ok': True, 'mensajes': mensajes})
+            return respuesta_json({'ok': True, 'mensajes': mensajes})
         except Exception as e:
             print(f"Error obteniendo conversación: {e}")
             return jsonify({'ok': False, 'error': str(e)}), 500
@@ -2612,23 +2486,137 @@ def init_user_routes(app):
     @login_required
     def descargar_adjunto(id_adjunto):
         try:
+            id_usuario = session.get('id_usuario')
             db = conectar_db()
             cursor = db.cursor()
-            cursor.execute('SELECT "RUTA" FROM public."Adjuntos_mensajes" WHERE "ID_ADJUNTO"=%s', (id_adjunto,))
+            # solo remitente o destinatario; a los demás se les responde como si no existiera
+            cursor.execute(
+                """
+                SELECT a."RUTA", a."HASH", a."NOMBRE_ORIGINAL", a."TIPO"
+                FROM public."Adjuntos_mensajes" a
+                JOIN public."Mensajes" m ON m."ID_MENSAJE" = a."ID_MENSAJE"
+                WHERE a."ID_ADJUNTO" = %s AND %s IN (m."ID_REMITENTE", m."ID_DESTINATARIO")
+                """,
+                (id_adjunto, id_usuario),
+            )
             row = cursor.fetchone()
             cursor.close()
             db.close()
             if not row:
                 return 'Adjunto no encontrado', 404
-            ruta = row[0]
-            # ruta esperada: /uploads/filename
-            filename = ruta.split('/')[-1]
-            return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+            return enviar_adjunto(row)
         except Exception as e:
             print(f"Error descargando adjunto: {e}")
             return 'Error', 500
 
 
+    # -----------------------------
+    # SUBIDAS POR PARTES (ver subidas.py)
+    # -----------------------------
+    def _respuesta_subida(estado, codigo=200):
+        respuesta = jsonify({'ok': True, **estado})
+        respuesta.status_code = codigo
+        respuesta.headers['Upload-Offset'] = str(estado['recibido'])
+        respuesta.headers['Upload-Length'] = str(estado['tamano'])
+        respuesta.headers['Cache-Control'] = 'no-store'
+        return respuesta
+
+    def _error_subida(e):
+        respuesta = jsonify({'ok': False, 'error': e.mensaje})
+        respuesta.status_code = e.estado
+        if e.recibido is not None:
+            respuesta.headers['Upload-Offset'] = str(e.recibido)
+        return respuesta
+
+    @app.route('/api/subidas', methods=['POST'])
+    @login_required
+    def api_crear_subida():
+        # también con las cabeceras de tus (Upload-Filename, Upload-Length)
+        datos = request.get_json(silent=True) or {}
+        nombre = secure_filename(datos.get('nombre') or request.headers.get('Upload-Filename') or '')
+        try:
+            tamano = int(datos.get('tamano') or request.headers.get('Upload-Length') or 0)
+        except (TypeError, ValueError):
+            return jsonify({'ok': False, 'error': 'Tamaño inválido'}), 400
+
+        db = conectar_db()
+        cursor = db.cursor()
+        try:
+            id_subida = crear_subida(
+                cursor, app.config['SUBIDAS_FOLDER'], session['id_usuario'], nombre, tamano,
+                app.config['SUBIDAS_MAX_BYTES'], app.config['SUBIDAS_MAX_ABIERTAS'],
+            )
+            db.commit()
+        except SubidaInvalida as e:
+            db.rollback()
+            return _error_subida(e)
+        finally:
+            cursor.close()
+            db.close()
+
+        respuesta = _respuesta_subida(
+            {'id_subida': id_subida, 'nombre': nombre, 'tamano': tamano, 'recibido': 0, 'completa': False, 'tipo': None},
+            201,
+        )
+        respuesta.headers['Location'] = url_for('api_estado_subida', id_subida=id_subida)
+        return respuesta
+
+    @app.route('/api/subidas/<id_subida>', methods=['GET'])
+    @login_required
+    def api_estado_subida(id_subida):
+        """También responde HEAD: el cliente lo usa para saber desde dónde retomar."""
+        db = conectar_db()
+        cursor = db.cursor()
+        try:
+            estado = estado_subida(cursor, app.config['SUBIDAS_FOLDER'], id_subida, session['id_usuario'])
+        except SubidaInvalida as e:
+            return _error_subida(e)
+        finally:
+            cursor.close()
+            db.close()
+        if not estado:
+            return jsonify({'ok': False, 'error': 'Subida no encontrada'}), 404
+        return _respuesta_subida(estado)
+
+    @app.route('/api/subidas/<id_subida>', methods=['PATCH'])
+    @login_required
+    def api_trozo_subida(id_subida):
+        if request.mimetype != 'application/offset+octet-stream':
+            return jsonify({'ok': False, 'error': 'Se espera application/offset+octet-stream'}), 415
+        try:
+            desde = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'ok': False, 'error': 'Falta Upload-Offset'}), 400
+
+        db = conectar_db()
+        try:
+            recibido = recibir_trozo(
+                db, app.config['SUBIDAS_FOLDER'], id_subida, session['id_usuario'], desde, request.stream
+            )
+        except SubidaInvalida as e:
+            return _error_subida(e)
+        finally:
+            db.close()
+        return '', 204, {'Upload-Offset': str(recibido), 'Cache-Control': 'no-store'}
+
+    @app.route('/api/subidas/<id_subida>', methods=['DELETE'])
+    @login_required
+    def api_cancelar_subida(id_subida):
+        db = conectar_db()
+        cursor = db.cursor()
+        try:
+            existia = cancelar_subida(cursor, app.config['SUBIDAS_FOLDER'], id_subida, session['id_usuario'])
+            db.commit()
+        except SubidaInvalida as e:
+            return _error_subida(e)
+        finally:
+            cursor.close()
+            db.close()
+        if not existia:
+            return jsonify({'ok': False, 'error': 'Subida no encontrada'}), 404
+        return '', 204
+
+
     # -----------------------------
     # NOTIFICACIONES
     # -----------------------------
@@ -2638,7 +2626,7 @@ def init_user_routes(app):
         try:
             id_usuario = session.get('id_usuario')
             db = conectar_db()
-            cursor = db.cursor(cursor_factory=RealDictCursor)
+            cursor = db.cursor()
             cursor.execute(
                 '''
                 SELECT
@@ -2646,13 +2634,13 @@ def init_user_routes(app):
                     m."ID_REMITENTE" AS id_remitente,
                     m."ID_DESTINATARIO" AS id_destinatario,
                     m."ID_OBJETO" AS id_objeto,
-                    m."CUERPO" AS cuerpo,
-                    m."FECHA" AS fecha,
-                    m."LEIDO" AS leido,
-                    o."NOMBRE" AS objeto_nombre,
+                    COALESCE(m."CUERPO", '') AS cuerpo,
+                    to_char(m."FECHA", 'YYYY-MM-DD HH24:MI:SS') AS fecha,
+                    COALESCE(m."LEIDO", FALSE) AS leido,
+                    COALESCE(NULLIF(o."NOMBRE", ''), 'Reporte') AS objeto_nombre,
                     o."IMAGEN" AS objeto_imagen,
-                    pr."NOMBRE" AS remitente_nombre,
-                    pd."NOMBRE" AS destinatario_nombre
+                    COALESCE(NULLIF(pr."NOMBRE", ''), m."ID_REMITENTE") AS remitente_nombre,
+                    COALESCE(NULLIF(pd."NOMBRE", ''), m."ID_DESTINATARIO") AS destinatario_nombre
                 FROM public."Mensajes" m
                 LEFT JOIN public."Objetos" o ON m."ID_OBJETO" = o."ID_OBJETO"
                 LEFT JOIN public."Perfiles" pr ON m."ID_REMITENTE" = pr."ID_USUARIO"
@@ -2663,28 +2651,10 @@ def init_user_routes(app):
                 ''',
                 (id_usuario,),
             )
-            rows = cursor.fetchall()
-            notifs = []
-            for row in rows:
-                fecha_val = row.get('fecha')
-                if isinstance(fecha_val, datetime):
-                    fecha_val = fecha_val.strftime('%Y-%m-%d %H:%M:%S')
-                notifs.append({
-                    'id_mensaje': row.get('id_mensaje'),
-                    'id_remitente': row.get('id_remitente'),
-                    'id_destinatario': row.get('id_destinatario'),
-                    'id_objeto': row.get('id_objeto'),
-                    'cuerpo': row.get('cuerpo') or '',
-                    'fecha': fecha_val,
-                    'leido': bool(row.get('leido')),
-                    'objeto_nombre': row.get('objeto_nombre') or 'Reporte',
-                    'objeto_imagen': row.get('objeto_imagen'),
-                    'remitente_nombre': row.get('remitente_nombre') or row.get('id_remitente'),
-                    'destinatario_nombre': row.get('destinatario_nombre') or row.get('id_destinatario'),
-                })
+            notifs = filas_como_dicts(cursor)
             cursor.close()
             db.close()
-            return jsonify(notifs)
+            return respuesta_json(notifs)
         except Exception as e:
             print(f"Error listando notificaciones: {e}")
             return jsonify([]), 500
@@ -0,0 +1,17 @@
+"""
+Pruebas de carga reproducibles contra una base sembrada.
+
+- postgres.py: levanta un PostgreSQL desechable (cluster temporal con
+  initdb/pg_ctl o contenedor de Docker) o usa la base de .env.
+- sembrar.py: llena la base con usuarios, objetos, reportes y mensajes en
+  los volúmenes pedidos, con semilla fija.
+- escenarios.py: lo que hace cada usuario virtual contra la app real
+  (login, búsqueda, enviar reporte, revisar el buzón, exportar PDF).
+- resultados.py: percentiles y throughput por endpoint, JSON y
+  comparación con una corrida anterior.
+
+Uso:
+    python -m benchmarks.carga [--postgres temporal|docker|env] [--usuarios 200]
+        [--reportes 5000] [--mensajes 5000] [--virtuales 8] [--duracion 30]
+        [--salida carga.json] [--comparar base.json]
+"""
@@ -0,0 +1,91 @@
+"""Punto de entrada: python -m benchmarks.carga (ver benchmarks/carga/__init__.py)."""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from . import postgres, resultados
+from .escenarios import PESOS
+
+
+def _pesos(texto):
+    """busqueda=50,buzon=30 -> dict; los escenarios omitidos quedan en 0."""
+    pesos = {nombre: 0 for nombre in PESOS}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in pesos:
+            raise argparse.ArgumentTypeError(f"escenario desconocido: {nombre}")
+        pesos[nombre] = int(peso)
+    return pesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de carga contra una base sembrada")
+    parser.add_argument("--postgres", choices=sorted(postgres.MODOS), default="temporal")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--reportes", type=int, default=5000)
+    parser.add_argument("--mensajes", type=int, default=5000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--sin-sembrar", action="store_true", help="usa los datos que ya tenga la base")
+    parser.add_argument("--virtuales", type=int, default=8, help="usuarios virtuales concurrentes")
+    parser.add_argument("--duracion", type=float, default=30, help="segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=5, help="segundos descartados al inicio")
+    parser.add_argument("--pesos", type=_pesos, help="p. ej. busqueda=70,buzon=30")
+    parser.add_argument("--salida", help="JSON de resultados (por defecto carga-<commit>.json)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="empeoramiento de p95 aceptado")
+    parser.add_argument("--ver-logs", action="store_true", help="no silencia los print de la app")
+    args = parser.parse_args()
+
+    load_dotenv()
+    with postgres.MODOS[args.postgres]() as config:
+        postgres.exportar_entorno(config)
+        os.environ.setdefault("SECRET_KEY", "carga")
+        # todos los usuarios virtuales llegan desde la misma IP
+        os.environ.setdefault("LIMITES_ACTIVOS", "0")
+
+        # app se importa aquí: DB_CONFIG se arma al importar app.database
+        from app import create_app
+        from app.database import conectar_db
+        from .escenarios import correr
+        from .sembrar import sembrar
+
+        with open(os.devnull, "w") as nulo, (
+            contextlib.nullcontext() if args.ver_logs else contextlib.redirect_stdout(nulo)
+        ):
+            app = create_app()
+            volumenes = None
+            if not args.sin_sembrar:
+                conexion = conectar_db()
+                volumenes = sembrar(conexion, args.usuarios, args.reportes, args.mensajes, args.semilla)
+                conexion.close()
+            muestras, segundos = correr(
+                app, args.virtuales, args.usuarios, args.duracion, args.calentamiento, args.pesos, args.semilla
+            )
+
+    endpoints = resultados.resumir(muestras, segundos)
+    configuracion = {
+        k: v for k, v in vars(args).items() if k not in ("salida", "comparar", "ver_logs")
+    }
+    doc = resultados.documento(endpoints, configuracion, volumenes)
+    salida = args.salida or f"carga-{doc['commit'] or 'sin-commit'}.json"
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+
+    print(f"{volumenes or 'datos existentes'}, {args.virtuales} usuarios virtuales, {segundos:.0f} s\n")
+    resultados.imprimir(endpoints)
+    print(f"\nResultados en {salida}")
+
+    if args.comparar:
+        regresiones = resultados.comparar(endpoints, args.comparar, args.tolerancia)
+        if regresiones:
+            print(f"\np95 empeoró más de {args.tolerancia:.0%} en: {', '.join(regresiones)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Escenarios de los usuarios virtuales.
+
+Cada usuario virtual tiene su propio cliente de pruebas de Flask (su
+propia sesión) y su propio random.Random, así que la secuencia de
+peticiones es la misma en cada corrida. Un escenario hace una o más
+peticiones y las anota con registrar(endpoint, segundos, estado).
+"""
+
+import random
+import threading
+import time
+
+from .sembrar import CONTRASENA, OBJETOS, LUGARES, id_usuario
+
+# escenario -> peso por defecto
+PESOS = {
+    "busqueda": 50,
+    "buzon": 30,
+    "enviar_reporte": 10,
+    "exportar_pdf": 5,
+    "login": 5,
+}
+
+_PALABRAS = sorted({p.split()[0].lower() for nombres in OBJETOS.values() for p in nombres})
+
+
+def _pedir(cliente, registrar, endpoint, metodo, url, **kwargs):
+    inicio = time.perf_counter()
+    respuesta = cliente.open(url, method=metodo, **kwargs)
+    respuesta.get_data()  # incluye en el tiempo la generación del cuerpo
+    registrar(endpoint, time.perf_counter() - inicio, respuesta.status_code)
+    return respuesta
+
+
+def login(cliente, rng, registrar, usuario):
+    # /inicio es solo para invitados: cerrar la sesión actual sin medirla
+    cliente.get("/logout")
+    _pedir(
+        cliente, registrar, "POST /inicio", "POST", "/inicio",
+        data={"id_usuario": usuario, "contrasena": CONTRASENA},
+    )
+
+
+def busqueda(cliente, rng, registrar, usuario):
+    params = {"q": rng.choice(_PALABRAS)}
+    if rng.random() < 0.5:
+        params["facetas"] = "1"
+    if rng.random() < 0.3:
+        params["tipo"] = rng.choice(("perdido", "encontrado"))
+    _pedir(cliente, registrar, "GET /busquedas", "GET", "/busquedas", query_string=params)
+
+
+def buzon(cliente, rng, registrar, usuario):
+    # el front consulta el contador y, si cambió, la lista
+    _pedir(cliente, registrar, "GET /api/mensajes/no-leidos", "GET", "/api/mensajes/no-leidos")
+    if rng.random() < 0.3:
+        _pedir(cliente, registrar, "GET /api/mensajes", "GET", "/api/mensajes")
+
+
+def enviar_reporte(cliente, rng, registrar, usuario):
+    categoria = rng.choice(list(OBJETOS))
+    _pedir(
+        cliente, registrar, "POST /submit_reporte", "POST", "/submit_reporte",
+        data={
+            "tipo_reporte": rng.choice(("perdido", "encontrado")),
+            "nombre_objeto": rng.choice(OBJETOS[categoria]),
+            "estado": "Bueno",
+            "color_dominante": rng.choice(("Negro", "Azul", "Rojo", "Gris")),
+            "lugar": rng.choice(LUGARES),
+            "fecha": time.strftime("%Y-%m-%d"),
+            "categoria": categoria,
+            "comentario": "Prueba de carga",
+        },
+    )
+
+
+def exportar_pdf(cliente, rng, registrar, usuario):
+    _pedir(
+        cliente, registrar, "POST /api/descargar_reportes", "POST", "/api/descargar_reportes",
+        json={"tipo": rng.choice(("", "perdido", "encontrado"))},
+    )
+
+
+ESCENARIOS = {
+    "busqueda": busqueda,
+    "buzon": buzon,
+    "enviar_reporte": enviar_reporte,
+    "exportar_pdf": exportar_pdf,
+    "login": login,
+}
+
+
+def correr(app, virtuales, usuarios, duracion, calentamiento=0, pesos=None, semilla=42):
+    """
+    Corre `virtuales` hilos con escenarios elegidos por peso durante
+    `calentamiento` + `duracion` segundos.
+
+    Returns:
+        tuple: (muestras [(endpoint, segundos, estado)], segundos medidos)
+    """
+    pesos = pesos or PESOS
+    nombres = list(pesos)
+    valores_pesos = [pesos[nombre] for nombre in nombres]
+    muestras = []
+    lock = threading.Lock()
+    inicio_medicion = time.monotonic() + calentamiento
+    fin = inicio_medicion + duracion
+
+    def usuario_virtual(n):
+        rng = random.Random(semilla * 1000 + n)
+        usuario = id_usuario(n % usuarios)
+        propias = []
+
+        def registrar(endpoint, segundos, estado):
+            if time.monotonic() >= inicio_medicion:
+                propias.append((endpoint, segundos, estado))
+
+        with app.test_client() as cliente:
+            login(cliente, rng, lambda *a: None, usuario)
+            while time.monotonic() < fin:
+                escenario = rng.choices(nombres, weights=valores_pesos)[0]
+                ESCENARIOS[escenario](cliente, rng, registrar, usuario)
+        with lock:
+            muestras.extend(propias)
+
+    hilos = [threading.Thread(target=usuario_virtual, args=(n,), daemon=True) for n in range(virtuales)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    # las últimas peticiones terminan después de `fin`
+    return muestras, time.monotonic() - inicio_medicion
@@ -0,0 +1,155 @@
+"""
+PostgreSQL desechable para las pruebas de carga.
+
+Cada clase es un context manager que al entrar deja la base lista y
+devuelve el diccionario de conexión (mismas claves que DB_CONFIG) y al
+salir la destruye. BaseExistente usa la de .env sin tocarla.
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import uuid
+
+import psycopg2
+
+NOMBRE_BASE = "orio_carga"
+IMAGEN_DOCKER = "postgres:16"
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar(config, segundos=60):
+    """Reintenta la conexión hasta que el servidor acepte."""
+    limite = time.monotonic() + segundos
+    while True:
+        try:
+            psycopg2.connect(**config).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.5)
+
+
+def _crear_base(config):
+    conexion = psycopg2.connect(**{**config, "database": "postgres"})
+    conexion.autocommit = True
+    with conexion.cursor() as cursor:
+        cursor.execute(f'CREATE DATABASE "{config["database"]}"')
+    conexion.close()
+
+
+class ClusterTemporal:
+    """Cluster nuevo con initdb en un directorio temporal, detenido con pg_ctl al salir."""
+
+    def __init__(self, bin_dir=None):
+        self.bin_dir = bin_dir or os.getenv("PG_BIN", "")
+        self.directorio = None
+
+    def _programa(self, nombre):
+        ruta = os.path.join(self.bin_dir, nombre) if self.bin_dir else shutil.which(nombre)
+        if not ruta:
+            raise SystemExit(f"No se encontró {nombre}; define PG_BIN o usa --postgres docker")
+        return ruta
+
+    def __enter__(self):
+        self.directorio = tempfile.mkdtemp(prefix="orio_pg_")
+        datos = os.path.join(self.directorio, "datos")
+        puerto = _puerto_libre()
+        subprocess.run(
+            [self._programa("initdb"), "-D", datos, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            [
+                self._programa("pg_ctl"), "-D", datos, "-w", "-l", os.path.join(self.directorio, "log"),
+                "-o", f"-p {puerto} -k {self.directorio} -c fsync=off", "start",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        config = {
+            "host": "127.0.0.1", "port": str(puerto), "user": "postgres",
+            "password": "", "database": NOMBRE_BASE,
+        }
+        _esperar({**config, "database": "postgres"})
+        _crear_base(config)
+        return config
+
+    def __exit__(self, *exc):
+        subprocess.run(
+            [self._programa("pg_ctl"), "-D", os.path.join(self.directorio, "datos"), "-m", "fast", "stop"],
+            stdout=subprocess.DEVNULL,
+        )
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        return False
+
+
+class ContenedorDocker:
+    """Contenedor postgres:16 con --rm, detenido al salir."""
+
+    def __init__(self, imagen=IMAGEN_DOCKER):
+        self.imagen = imagen
+        self.nombre = f"orio_carga_{uuid.uuid4().hex[:8]}"
+
+    def __enter__(self):
+        puerto = _puerto_libre()
+        contrasena = uuid.uuid4().hex
+        subprocess.run(
+            [
+                "docker", "run", "--rm", "-d", "--name", self.nombre,
+                "-e", f"POSTGRES_PASSWORD={contrasena}", "-e", f"POSTGRES_DB={NOMBRE_BASE}",
+                "-p", f"127.0.0.1:{puerto}:5432", self.imagen, "-c", "fsync=off",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        config = {
+            "host": "127.0.0.1", "port": str(puerto), "user": "postgres",
+            "password": contrasena, "database": NOMBRE_BASE,
+        }
+        _esperar(config)
+        return config
+
+    def __exit__(self, *exc):
+        subprocess.run(["docker", "stop", self.nombre], stdout=subprocess.DEVNULL)
+        return False
+
+
+class BaseExistente:
+    """La base configurada en .env (DB_HOST, DB_NAME, ...)."""
+
+    def __enter__(self):
+        return {
+            "host": os.getenv("DB_HOST"), "port": os.getenv("DB_PORT"), "user": os.getenv("DB_USER"),
+            "password": os.getenv("DB_PASSWORD"), "database": os.getenv("DB_NAME"),
+        }
+
+    def __exit__(self, *exc):
+        return False
+
+
+MODOS = {"temporal": ClusterTemporal, "docker": ContenedorDocker, "env": BaseExistente}
+
+
+def exportar_entorno(config):
+    """
+    Deja la conexión en las variables que lee app.database. Hay que llamarla
+    antes de importar app: DB_CONFIG se arma al importar el módulo.
+    """
+    os.environ.update({
+        "DB_HOST": config["host"] or "",
+        "DB_PORT": config["port"] or "",
+        "DB_USER": config["user"] or "",
+        "DB_PASSWORD": config["password"] or "",
+        "DB_NAME": config["database"] or "",
+    })
@@ -0,0 +1,112 @@
+"""
+Resumen de una corrida: percentiles, throughput, JSON y comparación.
+"""
+
+import json
+import math
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not valores_ordenados:
+        return None
+    rango = max(math.ceil(p / 100 * len(valores_ordenados)), 1)
+    return valores_ordenados[rango - 1]
+
+
+def _resumir(tiempos, errores, segundos):
+    tiempos = sorted(tiempos)
+    resumen = {
+        "peticiones": len(tiempos),
+        "errores": errores,
+        "rps": round(len(tiempos) / segundos, 2) if segundos else None,
+        "media_ms": round(sum(tiempos) / len(tiempos) * 1000, 2) if tiempos else None,
+    }
+    for p in PERCENTILES:
+        valor = percentil(tiempos, p)
+        resumen[f"p{p}_ms"] = round(valor * 1000, 2) if valor is not None else None
+    return resumen
+
+
+def resumir(muestras, segundos):
+    """
+    Args:
+        muestras (list): (endpoint, segundos, estado HTTP)
+        segundos (float): Duración medida
+
+    Returns:
+        dict: endpoint -> resumen, más "total"
+    """
+    tiempos = defaultdict(list)
+    errores = defaultdict(int)
+    for endpoint, duracion, estado in muestras:
+        tiempos[endpoint].append(duracion)
+        if estado >= 500:
+            errores[endpoint] += 1
+
+    endpoints = {e: _resumir(tiempos[e], errores[e], segundos) for e in sorted(tiempos)}
+    endpoints["total"] = _resumir([m[1] for m in muestras], sum(errores.values()), segundos)
+    return endpoints
+
+
+def _commit():
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def documento(endpoints, configuracion, volumenes):
+    """Lo que se guarda en el JSON de la corrida."""
+    return {
+        "commit": _commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "configuracion": configuracion,
+        "volumenes": volumenes,
+        "endpoints": endpoints,
+    }
+
+
+def imprimir(endpoints):
+    print(f"{'endpoint':<34}{'pet.':>7}{'err.':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, r in endpoints.items():
+        print(
+            f"{endpoint:<34}{r['peticiones']:>7}{r['errores']:>6}{r['rps'] or 0:>9.1f}"
+            f"{r['p50_ms'] or 0:>9.1f}{r['p95_ms'] or 0:>9.1f}{r['p99_ms'] or 0:>9.1f}"
+        )
+
+
+def comparar(actual, ruta_base, tolerancia):
+    """
+    Compara p95 y rps con una corrida anterior guardada en JSON.
+
+    Returns:
+        list[str]: Endpoints cuyo p95 empeoró más que `tolerancia` (0.1 = 10 %)
+    """
+    with open(ruta_base, encoding="utf-8") as f:
+        base = json.load(f)
+    print(f"\nComparación con {ruta_base} (commit {base.get('commit')}):")
+    print(f"{'endpoint':<34}{'p95 antes':>11}{'p95 ahora':>11}{'cambio':>9}{'rps antes':>11}{'rps ahora':>11}")
+
+    regresiones = []
+    for endpoint, r in actual.items():
+        anterior = base["endpoints"].get(endpoint)
+        if not anterior or not anterior.get("p95_ms") or r["p95_ms"] is None:
+            continue
+        cambio = r["p95_ms"] / anterior["p95_ms"] - 1
+        marca = " <-" if cambio > tolerancia else ""
+        print(
+            f"{endpoint:<34}{anterior['p95_ms']:>11.1f}{r['p95_ms']:>11.1f}{cambio * 100:>8.0f}%"
+            f"{anterior['rps'] or 0:>11.1f}{r['rps'] or 0:>11.1f}{marca}"
+        )
+        if cambio > tolerancia and endpoint != "total":
+            regresiones.append(endpoint)
+    return regresiones
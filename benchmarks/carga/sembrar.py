@@ -0,0 +1,35 @@
+"""
+Datos de prueba para las pruebas de carga.
+
+Usa benchmarks.generador con un prefijo y una contraseña propios: los
+usuarios se llaman carga_0000000, carga_0000001, ... y todos entran con
+CONTRASENA. La misma semilla y los mismos volúmenes dan la misma base.
+
+Requiere que crear_tablas() y aplicar_migraciones() ya hayan corrido
+(create_app() lo hace).
+"""
+
+from benchmarks import generador
+from benchmarks.generador import LUGARES, OBJETOS
+
+CONTRASENA = "carga1234"
+PREFIJO = "carga_"
+
+__all__ = ["CONTRASENA", "LUGARES", "OBJETOS", "PREFIJO", "id_usuario", "sembrar"]
+
+
+def id_usuario(i):
+    return generador.id_usuario(i, PREFIJO)
+
+
+def sembrar(conexion, usuarios=200, reportes=5000, mensajes=5000, semilla=42):
+    """
+    Inserta los datos con COPY y confirma.
+
+    Returns:
+        dict: Filas insertadas por tabla
+    """
+    return generador.generar(
+        conexion, usuarios, reportes, mensajes, semilla=semilla, prefijo=PREFIJO, contrasena=CONTRASENA,
+        progreso=None,
+    )
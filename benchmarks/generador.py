@@ -0,0 +1,467 @@
+"""
+Generador de datos sintéticos grandes con COPY.
+
+Arma usuarios con perfil, objetos y reportes (nombres y colores en
+español por categoría de CATEGORIAS_DEFAULT, lugares, fechas repartidas en
+los últimos meses), conversaciones sobre un ID_OBJETO entre el dueño del
+reporte y otro usuario, y facturas contra Planes, Paises y Metodos_pago.
+
+- Las filas se generan de a una y se mandan con COPY FROM STDIN desde un
+  objeto tipo archivo (FlujoCopy), así que la memoria no crece con el
+  volumen: 10M reportes usan lo mismo que 10k.
+- Cada tabla tiene su propio random.Random derivado de la semilla; la misma
+  semilla y volúmenes dan exactamente los mismos datos, y cambiar el número
+  de mensajes no cambia los reportes.
+- Las referencias se calculan, no se guardan: el objeto i es el del
+  reporte i y su dueño es dueno(i).
+- Con --imagenes N crea N imágenes de relleno en UPLOAD_FOLDER (requiere
+  Pillow) y los objetos las usan en rotación.
+
+Todos los IDs llevan el prefijo, así que borrar_generados() los quita sin
+tocar datos reales. COPY no admite ON CONFLICT: generar dos veces con el
+mismo prefijo falla por llave duplicada.
+
+Uso:
+    python -m benchmarks.generador --escala 1m [--semilla 42] [--prefijo gen_]
+        [--usuarios N] [--reportes N] [--mensajes N] [--facturas N] [--imagenes 50]
+    python -m benchmarks.generador --borrar [--prefijo gen_]
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app.colores import PALETA
+from app.database import CATEGORIAS_DEFAULT, ESTADOS_DEFAULT, PAISES_DEFAULT, PLANES_DEFAULT
+from app.feed import reconstruir_feed
+from app.particiones import LLAVE_MANTENIMIENTO, crear_particion
+
+# ========================
+# VOLÚMENES
+# ========================
+
+# escala -> reportes; usuarios, mensajes y facturas salen de ESCALAS_PROPORCION
+ESCALAS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+ESCALAS_PROPORCION = {"usuarios": 1 / 50, "mensajes": 1, "facturas": 1 / 20}
+
+MESES_HISTORIA = 24
+CONTRASENA_DEFECTO = "generado1234"
+
+# ========================
+# VOCABULARIO
+# ========================
+
+OBJETOS = {
+    "Documentos": ["Cédula", "Pasaporte", "Licencia de conducción", "Carné estudiantil", "Tarjeta débito",
+                   "Tarjeta de crédito", "Registro civil", "Libreta militar"],
+    "Tecnología": ["Celular", "Audífonos", "Cargador", "Portátil", "Memoria USB", "Tablet", "Calculadora",
+                   "Mouse", "Power bank", "Reloj inteligente"],
+    "Accesorios": ["Billetera", "Reloj", "Gafas", "Anillo", "Sombrilla", "Bolso", "Pulsera", "Cartuchera",
+                   "Morral", "Collar"],
+    "Ropa": ["Chaqueta", "Buzo", "Gorra", "Bufanda", "Saco", "Camiseta", "Chaleco", "Guantes"],
+    "Llaves": ["Llavero", "Llave de carro", "Llaves de casa", "Tarjeta de acceso", "Llave de moto", "Candado"],
+    "Otros": ["Cuaderno", "Termo", "Libro", "Estuche", "Balón", "Lonchera", "Agenda", "Botella"],
+}
+MARCAS = ["", "", "", "Samsung", "Xiaomi", "Apple", "Lenovo", "Adidas", "Nike", "Totto", "Casio", "Ray-Ban"]
+LUGARES = [
+    "Biblioteca", "Cafetería", "Bloque A", "Bloque B", "Bloque C", "Parqueadero", "Gimnasio", "Auditorio",
+    "Laboratorio de química", "Sala de cómputo", "Baños del primer piso", "Cancha", "Entrada principal",
+    "Estación de buses", "Plazoleta", "Coliseo",
+]
+NOMBRES = [
+    "María", "José", "Luis", "Ana", "Carlos", "Laura", "Andrés", "Valentina", "Juan", "Camila", "Santiago",
+    "Daniela", "Sebastián", "Paula", "Felipe", "Natalia", "Diego", "Sofía", "Alejandro", "Isabella",
+]
+APELLIDOS = [
+    "García", "Rodríguez", "Martínez", "López", "González", "Hernández", "Pérez", "Sánchez", "Ramírez",
+    "Torres", "Flórez", "Rivera", "Gómez", "Díaz", "Moreno", "Vargas", "Castro", "Rojas", "Ortiz", "Suárez",
+]
+CIUDADES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Bucaramanga", "Cartagena", "Pereira", "Manizales"]
+OBSERVACIONES = [
+    "Lo dejé en una mesa", "Tiene una calcomanía", "Estaba dentro de un estuche", "Se cayó del morral",
+    "Lo encontré en el piso", "Tiene las iniciales marcadas", "Está un poco rayado", None,
+]
+MENSAJES = [
+    "Hola, creo que encontré tu objeto.", "¿Me puedes describir alguna marca que tenga?",
+    "Sí, tiene una calcomanía en la parte de atrás.", "Perfecto, ¿dónde nos vemos para entregártelo?",
+    "Mañana en la biblioteca a las 10.", "¡Muchas gracias!", "Creo que ese es el mío, ¿de qué color es?",
+]
+
+_COLORES = [(nombre, id_color) for id_color, (nombre, _) in PALETA.items()]
+
+
+def id_usuario(i, prefijo):
+    return f"{prefijo}{i:07d}"
+
+
+def id_objeto(i, prefijo):
+    return f"{prefijo}o{i:08d}"
+
+
+def dueno(i, usuarios, semilla):
+    """Índice del usuario dueño del reporte i, sin guardar nada en memoria."""
+    return (i * 2654435761 + semilla) % usuarios
+
+
+def _mes_atras(hoy, n):
+    anios, indice = divmod(hoy.year * 12 + hoy.month - 1 - n, 12)
+    return date(anios, indice + 1, 1)
+
+
+# ========================
+# COPY
+# ========================
+
+
+def _campo(valor):
+    """Valor en el formato de texto de COPY."""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ")
+    texto = str(valor)
+    if "\\" in texto or "\t" in texto or "\n" in texto or "\r" in texto:
+        texto = texto.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return texto
+
+
+class FlujoCopy:
+    """
+    Objeto tipo archivo que arma las líneas de COPY a medida que
+    copy_expert() las lee.
+    """
+
+    def __init__(self, filas):
+        self._filas = iter(filas)
+        self._pendiente = b""
+        self.filas = 0
+
+    def read(self, tamano=-1):
+        partes = [self._pendiente]
+        total = len(self._pendiente)
+        while tamano < 0 or total < tamano:
+            fila = next(self._filas, None)
+            if fila is None:
+                break
+            linea = ("\t".join(_campo(v) for v in fila) + "\n").encode("utf-8")
+            partes.append(linea)
+            total += len(linea)
+            self.filas += 1
+        datos = b"".join(partes)
+        if tamano < 0 or len(datos) <= tamano:
+            self._pendiente = b""
+            return datos
+        self._pendiente = datos[tamano:]
+        return datos[:tamano]
+
+
+def copiar(cursor, tabla, columnas, filas, progreso=None):
+    """
+    COPY de un iterable de tuplas.
+
+    Returns:
+        int: Filas copiadas
+    """
+    flujo = FlujoCopy(filas)
+    inicio = time.perf_counter()
+    lista = ", ".join(f'"{c}"' for c in columnas)
+    cursor.copy_expert(f'COPY public."{tabla}" ({lista}) FROM STDIN', flujo, size=1 << 16)
+    if progreso:
+        segundos = time.perf_counter() - inicio
+        progreso(f"✓ {tabla}: {flujo.filas} filas en {segundos:.1f} s ({flujo.filas / max(segundos, 1e-9):,.0f}/s)")
+    return flujo.filas
+
+
+# ========================
+# FILAS
+# ========================
+
+
+def _persona(i, semilla):
+    """Nombre, apellido, género y teléfono del usuario i (iguales en Usuarios y Perfiles)."""
+    rng = random.Random(f"{semilla}:persona:{i}")
+    return (
+        rng.choice(NOMBRES), rng.choice(APELLIDOS), rng.choice(("masculino", "femenino", "otro")),
+        f"3{rng.randrange(10**9):09d}",
+    )
+
+
+def _usuarios(n, prefijo, hash_contrasena, semilla, inicio):
+    rng = random.Random(f"{semilla}:usuarios")
+    for i in range(n):
+        nombre, apellido, genero, telefono = _persona(i, semilla)
+        yield (
+            id_usuario(i, prefijo), f"{nombre} {apellido}", genero, hash_contrasena,
+            "¿Nombre de tu primera mascota?", "¿Ciudad donde naciste?", hash_contrasena, hash_contrasena,
+            1, telefono, inicio - timedelta(days=rng.randrange(365)),
+        )
+
+
+def _perfiles(n, prefijo, semilla):
+    for i in range(n):
+        nombre, apellido, _, telefono = _persona(i, semilla)
+        yield (id_usuario(i, prefijo), nombre, apellido, telefono, f"{id_usuario(i, prefijo)}@example.com")
+
+
+def _objetos_y_reportes(n, usuarios, prefijo, semilla, inicio, segundos, imagenes):
+    """Genera pares (fila de Objetos, fila de Reportes) con la misma secuencia."""
+    rng = random.Random(f"{semilla}:reportes")
+    for i in range(n):
+        categoria = rng.choice(CATEGORIAS_DEFAULT)
+        color, id_color = rng.choice(_COLORES)
+        marca = rng.choice(MARCAS)
+        nombre = f"{rng.choice(OBJETOS.get(categoria, OBJETOS['Otros']))} {marca} {color.lower()}".replace("  ", " ")
+        imagen = f"/uploads/{imagenes[i % len(imagenes)]}" if imagenes else None
+        objeto = (
+            id_objeto(i, prefijo), nombre, color, rng.choice(ESTADOS_DEFAULT), rng.choice(LUGARES),
+            categoria, imagen, id_color,
+        )
+        reporte = (
+            rng.choice(("perdido", "encontrado")), f"{prefijo}r{i:08d}",
+            inicio + timedelta(seconds=rng.randrange(segundos)), rng.choice(OBSERVACIONES),
+            id_objeto(i, prefijo), id_usuario(dueno(i, usuarios, semilla), prefijo), categoria,
+            rng.choices(("pendiente", "encontrado", "falso"), weights=(80, 15, 5))[0],
+        )
+        yield objeto, reporte
+
+
+def _mensajes(n, usuarios, reportes, prefijo, semilla, inicio, segundos, primer_id):
+    """Conversaciones de 1 a 6 mensajes sobre el objeto de un reporte."""
+    rng = random.Random(f"{semilla}:mensajes")
+    id_mensaje = primer_id
+    generados = 0
+    while generados < n:
+        i = rng.randrange(reportes)
+        propietario = dueno(i, usuarios, semilla)
+        otro = (propietario + 1 + rng.randrange(usuarios - 1)) % usuarios
+        participantes = (id_usuario(otro, prefijo), id_usuario(propietario, prefijo))
+        fecha = inicio + timedelta(seconds=rng.randrange(segundos))
+        anterior = None
+        for k in range(min(rng.randint(1, 6), n - generados)):
+            remitente, destinatario = participantes[k % 2], participantes[(k + 1) % 2]
+            fecha += timedelta(minutes=rng.randint(1, 600))
+            yield (
+                id_mensaje, remitente, destinatario, id_objeto(i, prefijo), anterior,
+                "Sobre tu reporte" if k == 0 else None, rng.choice(MENSAJES), fecha, rng.random() < 0.8,
+            )
+            anterior = id_mensaje
+            id_mensaje += 1
+            generados += 1
+
+
+def _facturas(n, prefijo, semilla, metodos):
+    rng = random.Random(f"{semilla}:facturas")
+    paises = [id_pais for id_pais, _ in PAISES_DEFAULT]
+    planes = [id_plan for id_plan, _, _ in PLANES_DEFAULT]
+    for i in range(n):
+        yield (
+            f"{prefijo}f{i:08d}@example.com", rng.choice(NOMBRES), rng.choice(APELLIDOS),
+            f"Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}",
+            rng.randint(10000, 999999), rng.choice(CIUDADES), rng.choice(paises), rng.choice(metodos),
+            rng.choice(planes),
+        )
+
+
+# ========================
+# IMÁGENES
+# ========================
+
+
+def generar_imagenes(carpeta, n, semilla, prefijo):
+    """
+    Crea n JPEG de 320x240 con un fondo y un rectángulo de colores de la
+    paleta. Devuelve los nombres de archivo, o [] si Pillow no está.
+    """
+    try:
+        from PIL import Image, ImageDraw
+    except Exception as e:
+        print(f"Pillow no disponible, no se generan imágenes: {e}")
+        return []
+
+    rng = random.Random(f"{semilla}:imagenes")
+    rgb = [valor for _, valor in PALETA.values() if valor]
+    os.makedirs(carpeta, exist_ok=True)
+    nombres = []
+    for k in range(n):
+        nombre = f"{prefijo}relleno_{k:04d}.jpg"
+        imagen = Image.new("RGB", (320, 240), rng.choice(rgb))
+        x, y = rng.randint(0, 200), rng.randint(0, 140)
+        ImageDraw.Draw(imagen).rectangle((x, y, x + rng.randint(60, 120), y + rng.randint(40, 100)), fill=rng.choice(rgb))
+        imagen.save(os.path.join(carpeta, nombre), quality=80)
+        nombres.append(nombre)
+    return nombres
+
+
+# ========================
+# GENERACIÓN
+# ========================
+
+
+def generar(
+    conexion, usuarios, reportes, mensajes=0, facturas=0, semilla=42, prefijo="gen_",
+    contrasena=CONTRASENA_DEFECTO, imagenes=0, carpeta_imagenes=None, hoy=None, progreso=print,
+):
+    """
+    Genera y copia todos los datos en una transacción y confirma.
+
+    Requiere que crear_tablas() y aplicar_migraciones() ya hayan corrido.
+
+    Returns:
+        dict: Filas copiadas por tabla
+    """
+    if usuarios < 2:
+        raise ValueError("se necesitan al menos 2 usuarios para las conversaciones")
+    hoy = hoy or date.today()
+    inicio = datetime.combine(_mes_atras(hoy, MESES_HISTORIA - 1), datetime.min.time())
+    segundos = int((datetime.combine(hoy, datetime.min.time()) - inicio).total_seconds())
+    cursor = conexion.cursor()
+
+    # el hilo de mantenimiento también crea particiones
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LLAVE_MANTENIMIENTO,))
+    for n in range(MESES_HISTORIA):
+        for tabla in ("Reportes_tipo_perdido", "Reportes_tipo_encontrado"):
+            crear_particion(cursor, tabla, _mes_atras(hoy, n))
+
+    archivos = []
+    if imagenes and carpeta_imagenes:
+        archivos = generar_imagenes(carpeta_imagenes, imagenes, semilla, prefijo)
+
+    conteos = {}
+    conteos["Usuarios"] = copiar(
+        cursor, "Usuarios",
+        ("ID_USUARIO", "NOMBRE", "GENERO", "CONTRASENA", "PREGUNTA_1", "PREGUNTA_2", "RESPUESTA_1",
+         "RESPUESTA_2", "ID_ROL", "TELEFONO", "FECHA"),
+        _usuarios(usuarios, prefijo, generate_password_hash(contrasena), semilla, inicio), progreso,
+    )
+    conteos["Perfiles"] = copiar(
+        cursor, "Perfiles", ("ID_USUARIO", "NOMBRE", "APELLIDO", "TELEFONO", "CORREO"),
+        _perfiles(usuarios, prefijo, semilla), progreso,
+    )
+    # objetos y reportes salen de la misma secuencia; se recorre dos veces
+    def pares():
+        return _objetos_y_reportes(reportes, usuarios, prefijo, semilla, inicio, segundos, archivos)
+
+    conteos["Objetos"] = copiar(
+        cursor, "Objetos",
+        ("ID_OBJETO", "NOMBRE", "COLOR", "ID_ESTADO", "LUGAR_ENCONTRADO", "ID_CATEGORIA", "IMAGEN", "ID_COLOR"),
+        (objeto for objeto, _ in pares()), progreso,
+    )
+    conteos["Reportes"] = copiar(
+        cursor, "Reportes",
+        ("TIPO", "ID_REPORTE", "FECHA", "OBSERVACIONES", "ID_OBJETO", "ID_USUARIO", "ID_CATEGORIA", "STATUS"),
+        (reporte for _, reporte in pares()), progreso,
+    )
+
+    if mensajes and reportes:
+        # IDs explícitos para que ID_RESPUESTA apunte al mensaje anterior
+        cursor.execute('LOCK TABLE public."Mensajes" IN EXCLUSIVE MODE')
+        cursor.execute('SELECT COALESCE(MAX("ID_MENSAJE"), 0) + 1 FROM public."Mensajes"')
+        primer_id = cursor.fetchone()[0]
+        conteos["Mensajes"] = copiar(
+            cursor, "Mensajes",
+            ("ID_MENSAJE", "ID_REMITENTE", "ID_DESTINATARIO", "ID_OBJETO", "ID_RESPUESTA", "ASUNTO", "CUERPO",
+             "FECHA", "LEIDO"),
+            _mensajes(mensajes, usuarios, reportes, prefijo, semilla, inicio, segundos, primer_id), progreso,
+        )
+        cursor.execute(
+            """SELECT setval(pg_get_serial_sequence('public."Mensajes"', 'ID_MENSAJE'), %s, false)""",
+            (primer_id + conteos["Mensajes"],),
+        )
+
+    if facturas:
+        cursor.execute('SELECT "ID_METODO" FROM public."Metodos_pago" ORDER BY 1')
+        metodos = [fila[0] for fila in cursor.fetchall()]
+        conteos["Facturas"] = copiar(
+            cursor, "Facturas",
+            ("EMAIL", "NOMBRES", "APELLIDOS", "DIRECCION", "CODIGO_POSTAL", "CIUDAD", "ID_PAIS", "ID_METODO",
+             "ID_PLAN"),
+            _facturas(facturas, prefijo, semilla, metodos), progreso,
+        )
+
+    reconstruir_feed(cursor)
+    conexion.commit()
+    cursor.execute("ANALYZE")
+    conexion.commit()
+    cursor.close()
+    return conteos
+
+
+def borrar_generados(conexion, prefijo):
+    """
+    Borra todo lo generado con `prefijo` y confirma.
+
+    Returns:
+        dict: Filas borradas por tabla
+    """
+    patron = prefijo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    cursor = conexion.cursor()
+    conteos = {}
+    for tabla, condicion in (
+        ("Mensajes", '"ID_REMITENTE" LIKE %s'),
+        ("Reportes", '"ID_USUARIO" LIKE %s'),
+        ("Objetos", '"ID_OBJETO" LIKE %s'),
+        ("Facturas", '"EMAIL" LIKE %s'),
+        ("Usuarios", '"ID_USUARIO" LIKE %s'),
+    ):
+        cursor.execute(f'DELETE FROM public."{tabla}" WHERE {condicion}', (patron,))
+        conteos[tabla] = cursor.rowcount
+    reconstruir_feed(cursor)
+    conexion.commit()
+    cursor.close()
+    return conteos
+
+
+def volumenes_de_escala(escala):
+    reportes = ESCALAS[escala]
+    volumenes = {"reportes": reportes}
+    for tabla, proporcion in ESCALAS_PROPORCION.items():
+        volumenes[tabla] = max(int(reportes * proporcion), 2)
+    return volumenes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos con COPY")
+    parser.add_argument("--escala", choices=sorted(ESCALAS, key=ESCALAS.get), default="10k")
+    parser.add_argument("--usuarios", type=int)
+    parser.add_argument("--reportes", type=int)
+    parser.add_argument("--mensajes", type=int)
+    parser.add_argument("--facturas", type=int)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--prefijo", default="gen_")
+    parser.add_argument("--imagenes", type=int, default=0, help="imágenes de relleno en UPLOAD_FOLDER")
+    parser.add_argument("--borrar", action="store_true", help="borra lo generado con el prefijo y termina")
+    args = parser.parse_args()
+
+    from app.database import conectar_db
+
+    conexion = conectar_db()
+    if conexion is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    try:
+        if args.borrar:
+            print(borrar_generados(conexion, args.prefijo))
+            return
+
+        volumenes = volumenes_de_escala(args.escala)
+        for clave in volumenes:
+            if getattr(args, clave) is not None:
+                volumenes[clave] = getattr(args, clave)
+        carpeta = os.path.join(os.path.dirname(__file__), "..", "app", os.getenv("UPLOAD_FOLDER", "uploads"))
+        inicio = time.perf_counter()
+        conteos = generar(
+            conexion, semilla=args.semilla, prefijo=args.prefijo, imagenes=args.imagenes,
+            carpeta_imagenes=os.path.normpath(carpeta), **volumenes,
+        )
+        print(f"\n{sum(conteos.values()):,} filas en {time.perf_counter() - inicio:.1f} s: {conteos}")
+    finally:
+        conexion.close()
+
+
+if __name__ == "__main__":
+    main()
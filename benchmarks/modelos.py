@@ -0,0 +1,115 @@
+"""
+Benchmark de memoria y velocidad: RealDictRow contra modelos con __slots__.
+
+Arma N filas de reportes y de mensajes con la forma que devuelven las
+consultas del repositorio y compara:
+
+- RealDictRow: lo que entrega cursor_factory=RealDictCursor,
+- tupla: la fila cruda de un cursor normal,
+- modelo: Reporte / Mensaje de app.modelos.
+
+Mide memoria retenida (tracemalloc), tiempo de construcción y tiempo de
+un recorrido que lee tres campos por fila. psycopg2 crea las tuplas en
+los tres casos, así que la columna "tupla" solo cuenta la lista; los
+tiempos de construcción incluyen el costo de tracemalloc.
+
+Uso:
+    python -m benchmarks.modelos [--filas 50000]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from psycopg2.extras import RealDictRow
+
+from app.modelos import Mensaje, Reporte
+
+
+def _filas_reportes(n):
+    columnas = ["tipo", "id_reporte", "ID_OBJETO", "NOMBRE", "COLOR", "IMAGEN",
+                "FECHA", "OBSERVACIONES", "categoria", "nombre_categoria"]
+    filas = [
+        ("perdido", f"R{i}", f"OBJ{i}", f"Objeto {i}", "Negro", f"/uploads/{i}.jpg",
+         date(2025, 1, 1) + timedelta(days=i % 365), "Sin observaciones", "CAT1", "Tecnología")
+        for i in range(n)
+    ]
+    return columnas, filas, Reporte, ("nombre", "fecha", "tipo")
+
+
+def _filas_mensajes(n):
+    columnas = ["ID_MENSAJE", "ID_REMITENTE", "ID_DESTINATARIO", "ID_OBJETO", "ASUNTO",
+                "CUERPO", "FECHA", "LEIDO", "remitente_nombre", "destinatario_nombre",
+                "objeto_nombre", "objeto_imagen"]
+    filas = [
+        (i, f"U{i % 40}", "U0", f"OBJ{i % 90}", "Contacto", f"Mensaje {i}",
+         datetime(2025, 1, 1) + timedelta(minutes=i), i % 2 == 0, "Ana", "Luis", "Billetera", None)
+        for i in range(n)
+    ]
+    return columnas, filas, Mensaje, ("id_remitente", "fecha", "leido")
+
+
+def _construir(forma, columnas, filas, modelo):
+    if forma == "RealDictRow":
+        return [RealDictRow(zip(columnas, fila)) for fila in filas]
+    if forma == "tupla":
+        return list(filas)
+    return modelo.desde_filas(filas)
+
+
+def _recorrer(forma, datos, columnas, campos):
+    if forma == "RealDictRow":
+        claves = [columnas[indice] for indice in campos[1]]
+        for fila in datos:
+            for clave in claves:
+                fila[clave]
+    elif forma == "tupla":
+        for fila in datos:
+            for indice in campos[1]:
+                fila[indice]
+    else:
+        for fila in datos:
+            for campo in campos[0]:
+                getattr(fila, campo)
+
+
+def _medir(forma, columnas, filas, modelo, atributos):
+    indices = [modelo.__slots__.index(a) for a in atributos]
+    # las filas crudas ya existen en memoria: medir solo lo que se agrega encima
+    filas_copia = [tuple(f) for f in filas] if forma == "tupla" else filas
+
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    datos = _construir(forma, columnas, filas_copia, modelo)
+    construccion = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    inicio = time.perf_counter()
+    _recorrer(forma, datos, columnas, (atributos, indices))
+    recorrido = time.perf_counter() - inicio
+    return memoria, construccion, recorrido
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RealDictRow contra modelos con __slots__")
+    parser.add_argument("--filas", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{args.filas} filas\n")
+    print(f"{'entidad':<10}{'forma':<13}{'bytes/fila':>12}{'construir ms':>14}{'recorrer ms':>13}")
+    for nombre, preparar in (("Reporte", _filas_reportes), ("Mensaje", _filas_mensajes)):
+        columnas, filas, modelo, atributos = preparar(args.filas)
+        for forma in ("RealDictRow", "tupla", "modelo"):
+            memoria, construccion, recorrido = _medir(forma, columnas, filas, modelo, atributos)
+            print(
+                f"{nombre:<10}{forma:<13}{memoria / args.filas:>12,.0f}"
+                f"{construccion * 1000:>14,.1f}{recorrido * 1000:>13,.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de los listados de reportes antes y después de unificar las tablas.
+
+Corre contra la base configurada en .env y solo lee. Compara:
+
+- antes: UNION ALL de Reportes_perdidos y Reportes_encontrados (hoy vistas
+  sobre cada partición, con los mismos índices) con orden y LIMIT dentro de
+  cada rama, como se armaba la consulta con dos tablas,
+- ahora: una sola consulta sobre Reportes armada por ConsultaReportes.
+
+Listados: recientes (portada), segunda página del panel de administración,
+mis reportes del usuario con más reportes y búsqueda de texto pública.
+
+Uso:
+    python -m benchmarks.reportes [--repeticiones 50] [--limite 20] [--explain]
+"""
+
+import argparse
+import time
+
+from app.consulta_reportes import COLUMNAS_ADMIN, COLUMNAS_BUSQUEDA, ConsultaReportes
+from app.database import conectar_db
+
+_RAMAS_ANTERIORES = (
+    ("perdido", "Reportes_perdidos", "ID_REPORTE"),
+    ("encontrado", "Reportes_encontrados", "ID_REPORTE_ENC"),
+)
+
+
+def _union(condicion, params_rama, limite, llave=None):
+    """Consulta de dos ramas ordenada por fecha, como antes de Reportes."""
+    ramas = []
+    params = []
+    for tipo, tabla, id_col in _RAMAS_ANTERIORES:
+        where = condicion
+        valores = list(params_rama)
+        if llave:
+            where += f' AND (r."FECHA", r."{id_col}", %s::text) < (%s::timestamp, %s, %s)'
+            valores += [tipo] + list(llave)
+        ramas.append(
+            f"""(
+            SELECT '{tipo}'::text AS tipo, r."{id_col}" AS id_reporte, o."ID_OBJETO", o."NOMBRE",
+                   o."COLOR", o."IMAGEN", r."FECHA", r."OBSERVACIONES", r."STATUS",
+                   o."ID_CATEGORIA" AS categoria, c."NOMBRE" AS nombre_categoria
+            FROM public."{tabla}" r
+            JOIN public."Objetos" o ON r."ID_OBJETO" = o."ID_OBJETO"
+            LEFT JOIN public."Categorias" c ON o."ID_CATEGORIA" = c."ID_CATEGORIA"
+            WHERE {where}
+            ORDER BY r."FECHA" DESC NULLS LAST, r."{id_col}" DESC
+            LIMIT %s
+            )"""
+        )
+        params += valores + [limite]
+    sql = " UNION ALL ".join(ramas)
+    sql += ' ORDER BY "FECHA" DESC NULLS LAST, id_reporte DESC, tipo DESC LIMIT %s'
+    return sql, params + [limite]
+
+
+def _listados(cursor, limite):
+    """nombre -> (sql antes, sql ahora), cada uno como (sql, params)."""
+    cursor.execute(
+        'SELECT "ID_USUARIO" FROM public."Reportes" GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1'
+    )
+    fila = cursor.fetchone()
+    id_usuario = fila[0] if fila else ""
+
+    primera = ConsultaReportes(COLUMNAS_ADMIN).limitar(limite)
+    filas = primera.dicts(cursor)
+    llave = primera.llave_de(filas[-1]) if filas else None
+
+    texto = "%a%"
+    publico = (
+        """r."STATUS" <> 'falso' AND NOT EXISTS (SELECT 1 FROM public."Usuarios" ue """
+        """WHERE ue."ID_USUARIO" = r."ID_USUARIO" AND ue."ELIMINADO_EN" IS NOT NULL)"""
+    )
+    return {
+        "recientes": (
+            _union("TRUE", [], limite),
+            ConsultaReportes().limitar(limite).sql(),
+        ),
+        "admin, página 2": (
+            _union("TRUE", [], limite, llave),
+            ConsultaReportes(COLUMNAS_ADMIN).ordenar("fecha_desc", llave).limitar(limite).sql(),
+        ),
+        "mis reportes": (
+            _union('r."ID_USUARIO" = %s', [id_usuario], limite),
+            ConsultaReportes().del_usuario(id_usuario).limitar(limite).sql(),
+        ),
+        "búsqueda 'a'": (
+            _union(
+                f'{publico} AND (o."NOMBRE" ILIKE %s OR o."COLOR" ILIKE %s OR c."NOMBRE" ILIKE %s)',
+                [texto] * 3,
+                limite,
+            ),
+            ConsultaReportes(COLUMNAS_BUSQUEDA).publicos().texto("a").limitar(limite).sql(),
+        ),
+    }
+
+
+def _medir(cursor, consulta, repeticiones):
+    sql, params = consulta
+    cursor.execute(sql, params)  # calentamiento
+    cursor.fetchall()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        cursor.execute(sql, params)
+        cursor.fetchall()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def _plan(cursor, consulta):
+    sql, params = consulta
+    cursor.execute("EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF) " + sql, params)
+    return "\n".join("    " + fila[0] for fila in cursor.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--limite", type=int, default=20)
+    parser.add_argument("--explain", action="store_true", help="muestra los planes de cada consulta")
+    args = parser.parse_args()
+
+    conexion = conectar_db()
+    if conexion is None:
+        raise SystemExit("No se pudo conectar a la base de datos")
+    conexion.set_session(readonly=True)
+    cursor = conexion.cursor()
+    try:
+        cursor.execute('SELECT COUNT(*) FROM public."Reportes"')
+        print(f"{cursor.fetchone()[0]} reportes, {args.repeticiones} repeticiones, LIMIT {args.limite}\n")
+        print(f"{'listado':<20}{'antes ms':>11}{'ahora ms':>11}{'mejora':>9}")
+
+        for nombre, (antes, ahora) in _listados(cursor, args.limite).items():
+            t_antes = _medir(cursor, antes, args.repeticiones)
+            t_ahora = _medir(cursor, ahora, args.repeticiones)
+            print(f"{nombre:<20}{t_antes * 1000:>11.2f}{t_ahora * 1000:>11.2f}{t_antes / t_ahora:>8.1f}x")
+            if args.explain:
+                print(f"  antes:\n{_plan(cursor, antes)}\n  ahora:\n{_plan(cursor, ahora)}\n")
+    finally:
+        cursor.close()
+        conexion.close()
+
+
+if __name__ == "__main__":
+    main()
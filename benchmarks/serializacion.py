@@ -0,0 +1,204 @@
+"""
+Benchmark de serialización de los listados grandes del API.
+
+Compara, con filas sintéticas con la forma de cada endpoint:
+
+- antes: filas tipo RealDictCursor, fechas convertidas en un bucle de
+  Python y json.dumps (lo que hace jsonify),
+- ahora: filas en tuplas, dicts armados con zip() y serializar()
+  (orjson si está instalado).
+
+Uso:
+    python -m benchmarks.serializacion [--filas 5000] [--repeticiones 20]
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app.serializacion import filas_como_dicts, orjson, serializar
+
+
+class CursorSintetico:
+    """Cursor de tuplas en memoria: description + fetchall()."""
+
+    def __init__(self, nombres, filas):
+        self.description = [(nombre,) for nombre in nombres]
+        self._filas = filas
+
+    def fetchall(self):
+        return list(self._filas)
+
+
+def _fecha(i):
+    return datetime(2025, 1, 1) + timedelta(minutes=37 * i)
+
+
+# ========================
+# ENDPOINTS
+# ========================
+
+
+def _busqueda(n):
+    nombres = ["NOMBRE", "ID_OBJETO", "COLOR", "ID_COLOR", "IMAGEN", "categoria",
+               "nombre_categoria", "LUGAR", "FECHA", "STATUS", "tipo", "id_reporte"]
+    filas = [
+        (f"Objeto {i}", f"OBJ{i}", "Negro", "negro", f"/uploads/{i}.jpg", "CAT1",
+         "Tecnología", "Bloque A", _fecha(i).date(), "pendiente",
+         random.choice(("perdido", "encontrado")), f"R{i}")
+        for i in range(n)
+    ]
+
+    def antes():
+        objetos = [OrderedDict(zip(nombres, f)) for f in filas]
+        for objeto in objetos:
+            fecha_val = objeto.get("FECHA")
+            if fecha_val is not None and not isinstance(fecha_val, str):
+                objeto["FECHA"] = fecha_val.isoformat()
+        return json.dumps({"ok": True, "datos": objetos}).encode("utf-8")
+
+    def ahora():
+        objetos = filas_como_dicts(CursorSintetico(nombres, filas))
+        return serializar({"ok": True, "datos": objetos})
+
+    return antes, ahora
+
+
+def _recientes(n):
+    nombres = ["NOMBRE", "ID_OBJETO", "COLOR", "IMAGEN", "categoria", "nombre_categoria",
+               "LUGAR", "FECHA", "tipo", "id_reporte", "nombre_usuario"]
+    filas = [
+        (f"Objeto {i}", f"OBJ{i}", "Rojo", f"/uploads/{i}.jpg", "CAT2", "Accesorios",
+         "Biblioteca", _fecha(i), "perdido", f"R{i}", f"Usuario {i % 300}")
+        for i in range(n)
+    ]
+
+    def antes():
+        reportes = [OrderedDict(zip(nombres, f)) for f in filas]
+        for reporte in reportes:
+            reporte["FECHA"] = reporte["FECHA"].isoformat()
+        return json.dumps({"ok": True, "datos": reportes}).encode("utf-8")
+
+    # el feed llega ya serializado desde Postgres; esto mide armar el mismo cuerpo
+    def ahora():
+        return serializar({"ok": True, "datos": filas_como_dicts(CursorSintetico(nombres, filas))})
+
+    return antes, ahora
+
+
+def _notificaciones(n):
+    nombres = ["id_mensaje", "id_remitente", "id_destinatario", "id_objeto", "cuerpo",
+               "fecha", "leido", "objeto_nombre", "objeto_imagen",
+               "remitente_nombre", "destinatario_nombre"]
+    crudas = [
+        (i, f"U{i % 50}", "U0", f"OBJ{i}", "¿Es este tu objeto?", _fecha(i), i % 2 == 0,
+         None if i % 7 == 0 else f"Objeto {i}", None, None if i % 5 == 0 else f"Nombre {i}", "Yo")
+        for i in range(n)
+    ]
+    # en la versión nueva fecha y valores por defecto salen del SQL
+    formateadas = [
+        (f[0], f[1], f[2], f[3], f[4], f[5].strftime("%Y-%m-%d %H:%M:%S"), f[6],
+         f[7] or "Reporte", f[8], f[9] or f[1], f[10] or f[2])
+        for f in crudas
+    ]
+
+    def antes():
+        notifs = []
+        for row in (OrderedDict(zip(nombres, f)) for f in crudas):
+            fecha_val = row.get("fecha")
+            if isinstance(fecha_val, datetime):
+                fecha_val = fecha_val.strftime("%Y-%m-%d %H:%M:%S")
+            notifs.append({
+                "id_mensaje": row.get("id_mensaje"),
+                "id_remitente": row.get("id_remitente"),
+                "id_destinatario": row.get("id_destinatario"),
+                "id_objeto": row.get("id_objeto"),
+                "cuerpo": row.get("cuerpo") or "",
+                "fecha": fecha_val,
+                "leido": bool(row.get("leido")),
+                "objeto_nombre": row.get("objeto_nombre") or "Reporte",
+                "objeto_imagen": row.get("objeto_imagen"),
+                "remitente_nombre": row.get("remitente_nombre") or row.get("id_remitente"),
+                "destinatario_nombre": row.get("destinatario_nombre") or row.get("id_destinatario"),
+            })
+        return json.dumps(notifs).encode("utf-8")
+
+    def ahora():
+        return serializar(filas_como_dicts(CursorSintetico(nombres, formateadas)))
+
+    return antes, ahora
+
+
+def _conversacion(n):
+    nombres = ["ID_MENSAJE", "ID_REMITENTE", "ID_DESTINATARIO", "ID_OBJETO", "ID_RESPUESTA",
+               "ASUNTO", "CUERPO", "FECHA", "LEIDO", "remitente_nombre",
+               "destinatario_nombre", "objeto_nombre", "respuesta_cuerpo", "respuesta_remitente"]
+    crudas = [
+        (i, "U1" if i % 2 else "U2", "U2" if i % 2 else "U1", "OBJ1", None, "Contacto",
+         f"Mensaje número {i}", _fecha(i), None if i % 3 == 0 else True, "Ana", "Luis",
+         "Billetera", None, None)
+        for i in range(n)
+    ]
+    formateadas = [
+        f[:7] + (f[7].strftime("%d/%m/%Y %H:%M"), bool(f[8])) + f[9:] for f in crudas
+    ]
+
+    def antes():
+        mensajes = []
+        for m in (OrderedDict(zip(nombres, f)) for f in crudas):
+            row = dict(m)
+            if isinstance(row.get("FECHA"), datetime):
+                row["FECHA"] = row["FECHA"].strftime("%d/%m/%Y %H:%M")
+            if row.get("LEIDO") is None:
+                row["LEIDO"] = False
+            mensajes.append(row)
+        return json.dumps({"ok": True, "mensajes": mensajes}).encode("utf-8")
+
+    def ahora():
+        return serializar({"ok": True, "mensajes": filas_como_dicts(CursorSintetico(nombres, formateadas))})
+
+    return antes, ahora
+
+
+ENDPOINTS = {
+    "buscar": _busqueda,
+    "api_reportes_recientes": _recientes,
+    "api_listar_notificaciones": _notificaciones,
+    "api_conversacion": _conversacion,
+}
+
+
+def _medir(funcion, repeticiones):
+    funcion()  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filas", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"codificador: {'orjson' if orjson is not None else 'json (orjson no instalado)'}")
+    print(f"{args.filas} filas, {args.repeticiones} repeticiones\n")
+    print(f"{'endpoint':<28}{'antes filas/s':>16}{'ahora filas/s':>16}{'mejora':>9}")
+
+    for nombre, preparar in ENDPOINTS.items():
+        antes, ahora = preparar(args.filas)
+        t_antes = _medir(antes, args.repeticiones)
+        t_ahora = _medir(ahora, args.repeticiones)
+        print(
+            f"{nombre:<28}{args.filas / t_antes:>16,.0f}{args.filas / t_ahora:>16,.0f}"
+            f"{t_antes / t_ahora:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()